@@ -0,0 +1,219 @@
+"""
+Slab storage for the chunks of a grid.
+
+All cells live in one (capacity, CHUNK_SIZE, CHUNK_SIZE) int8 array and all
+states in one uint8 array, a chunk is a slot of both. Positions map to slots
+through a dict keyed by one int per position. The slab grows by whole blocks
+and the slots of released chunks are reused, oldest first.
+
+`Chunk` objects are small views of a slot; views of a released slot must not
+be used any more, the slot may belong to another chunk by then.
+
+Every slot also has a summary, filled in when its chunk becomes PREVIEW
+(whose terrain is final already) and again when it becomes GENERATED:
+the number of cells of every (terrain, biome) pair and a bit per terrain
+value present. Spatial queries of the grid skip whole chunks by them.
+"""
+
+from collections import deque
+from collections.abc import Iterator, Mapping
+
+import numpy as np
+
+from .chunk import CHUNK_SIZE, STATE_CODES, Chunk, ChunkStates, Phases, random_cells
+from .evolution import DEFAULT_ENGINE, Engine, get_engine
+
+"""state code of a free slot"""
+FREE = 0
+
+BLOCK_SIZE = 1024
+
+"""the state codes of the chunks with a summary"""
+SUMMARISED = (STATE_CODES[ChunkStates.PREVIEW], STATE_CODES[ChunkStates.GENERATED])
+
+
+def terrain_bits(terrains) -> int:
+    """the summary flags of the given terrain values"""
+    return sum(1 << int(terrain) for terrain in set(terrains))
+
+
+def key(x: int, y: int) -> int:
+    """one int for a position, unique for coordinates that fit in 32 bits"""
+    return (x << 32) | (y & 0xFFFFFFFF)
+
+
+class ChunkArena(Mapping[tuple[int, int], Chunk]):
+    """
+    The chunks of one world: cells, states and positions by slot.
+    Reads like a mapping from positions to chunks
+    """
+
+    def __init__(
+        self,
+        density: float,
+        engine: str = DEFAULT_ENGINE,
+        seed: int = 0,
+        block_size: int = BLOCK_SIZE,
+    ) -> None:
+        self.density = density
+        self.engine: Engine = get_engine(engine)
+        self.seed = seed
+        self.block_size = block_size
+
+        self.cells = np.zeros((0, CHUNK_SIZE, CHUNK_SIZE), dtype=np.int8)
+        self.states = np.zeros(0, dtype=np.uint8)
+        self.positions = np.zeros((0, 2), dtype=np.int64)
+        """when each slot was last used, see Grid's LRU eviction"""
+        self.last_used = np.zeros(0, dtype=np.uint64)
+        self._init_summaries(0)
+
+        self.__index: dict[int, int] = dict()
+        self.__views: list[Chunk | None] = []
+        self.__free: deque[int] = deque()
+
+    @property
+    def capacity(self) -> int:
+        return len(self.states)
+
+    def _grow(self) -> None:
+        """adds whole blocks, at least half the current capacity"""
+        blocks = max(1, -(-self.capacity // 2) // self.block_size)
+        extra = blocks * self.block_size
+        start = self.capacity
+
+        def extend(array: np.ndarray) -> np.ndarray:
+            bigger = np.zeros((len(array) + extra,) + array.shape[1:], dtype=array.dtype)
+            bigger[: len(array)] = array
+            return bigger
+
+        self.cells = extend(self.cells)
+        self.states = extend(self.states)
+        self.positions = extend(self.positions)
+        self.last_used = extend(self.last_used)
+        self.summaries = extend(self.summaries)
+        self.flags = extend(self.flags)
+        self._add_slots(start, extra)
+
+    def _init_summaries(self, capacity: int) -> None:
+        """cells per (terrain, biome) pair and the terrain bits present, by slot"""
+        self.summaries = np.zeros((capacity, 4, 4), dtype=np.uint16)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+
+    def _add_slots(self, start: int, count: int) -> None:
+        """makes the slots start .. start + count - 1 available"""
+        self.__views += [None] * count
+        self.__free.extend(range(start, start + count))
+
+    def write_cells(self, slot: int, cells: np.ndarray) -> None:
+        self.cells[slot] = cells
+
+    def write_state(self, slot: int, code: int) -> None:
+        self.states[slot] = code
+        if code in SUMMARISED:
+            self._summarise(slot)
+
+    def _summarise(self, slot: int) -> None:
+        low_bits = self.cells[slot].reshape(-1).view(np.uint8) & 0b1111
+        counts = np.bincount(low_bits, minlength=16)
+        # bits 0-1 are the terrain, bits 2-3 the biome
+        self.summaries[slot] = counts.reshape(4, 4).T
+        self.flags[slot] = np.packbits(self.summaries[slot].any(axis=1), bitorder="little")[0]
+
+    def create(self, pos: tuple[int, int]) -> Chunk:
+        """a NOT_GENERATED chunk at pos with its initial random cells"""
+        chunk = self.allocate(pos)
+        chunk.cells = random_cells(self.density, chunk.rng(Phases.CREATE))
+        chunk.state = ChunkStates.NOT_GENERATED
+        return chunk
+
+    def allocate(self, pos: tuple[int, int]) -> Chunk:
+        """a slot for pos; its cells and state are set by the caller"""
+        if key(*pos) in self.__index:
+            raise KeyError(f"{pos} already has a chunk")
+        if not self.__free:
+            self._grow()
+        slot = self.__free.popleft()
+
+        self.__index[key(*pos)] = slot
+        self.positions[slot] = pos
+        self.last_used[slot] = 0
+        view = self.__views[slot] = Chunk(self, slot, pos)
+        return view
+
+    def release(self, pos: tuple[int, int]) -> Chunk:
+        """frees the slot of the chunk at pos"""
+        slot = self.__index.pop(key(*pos))
+        view = self.__views[slot]
+        self.__views[slot] = None
+        self.states[slot] = FREE
+        self.__free.append(slot)
+        return view
+
+    def get(self, pos: tuple[int, int], default=None) -> Chunk | None:
+        slot = self.__index.get(key(*pos))
+        return default if slot is None else self.__views[slot]
+
+    def slot(self, pos: tuple[int, int]) -> int:
+        """the slot of pos, -1 if there is no chunk"""
+        return self.__index.get(key(*pos), -1)
+
+    def __getitem__(self, pos: tuple[int, int]) -> Chunk:
+        chunk = self.get(pos)
+        if chunk is None:
+            raise KeyError(pos)
+        return chunk
+
+    def __contains__(self, pos: object) -> bool:
+        return key(*pos) in self.__index
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        for slot in list(self.__index.values()):
+            x, y = self.positions[slot]
+            yield int(x), int(y)
+
+    def __len__(self) -> int:
+        return len(self.__index)
+
+    def close(self) -> None:
+        """frees the storage, nothing to do for a private slab"""
+
+    def occupied(self) -> np.ndarray:
+        """the slots in use"""
+        return np.fromiter(self.__index.values(), dtype=np.int64, count=len(self.__index))
+
+    def gather(self, positions: list[tuple[int, int]], border: int) -> np.ndarray:
+        """
+        The padded cells of the chunks at positions as one (N, h, w) stack,
+        the same as stacking Chunk.padded for each of them.
+
+        The 3x3 neighbourhoods are copied out of the slab with one fancy index;
+        only neighbours whose initial cells have to be rebuilt (border 1) are
+        handled one by one
+        """
+        n = len(positions)
+        # block (r, c) of a neighbourhood is the chunk (x + c - 1, y + 1 - r)
+        slots = np.full((n, 3, 3), -1, dtype=np.int64)
+        for i, (x, y) in enumerate(positions):
+            for r in range(3):
+                for c in range(3):
+                    slots[i, r, c] = self.__index.get(key(x + c - 1, y + 1 - r), -1)
+
+        present = slots >= 0
+        tiles = np.zeros((n, 3, 3, CHUNK_SIZE, CHUNK_SIZE), dtype=np.int8)
+        tiles[present] = self.cells[slots[present]]
+
+        if border == 1:
+            codes = np.where(present, self.states[np.maximum(slots, 0)], FREE)
+            rebuild = present & (codes != STATE_CODES[ChunkStates.NOT_GENERATED])
+            rebuild[:, 1, 1] = False
+            for i, r, c in zip(*np.nonzero(rebuild)):
+                tiles[i, r, c] = self.__views[slots[i, r, c]].initial_cells
+        else:
+            centre = tiles[:, 1, 1].copy()
+            tiles &= 0b11
+            tiles[:, 1, 1] = centre
+
+        side = 3 * CHUNK_SIZE
+        field = tiles.transpose(0, 1, 3, 2, 4).reshape(n, side, side)
+        inner = slice(CHUNK_SIZE - border, 2 * CHUNK_SIZE + border)
+        return np.ascontiguousarray(field[:, inner, inner])
@@ -1,18 +1,21 @@
 """the chunk module"""
 
-from enum import Enum, auto
+import logging
+from enum import Enum, IntEnum, auto
 from typing import TYPE_CHECKING
 
 import numpy as np
-from numpy.typing import ArrayLike
 
 from src.utils import Singleton
-from .evolution import pre_generate_chunk, generate_chunk_biome, textures
+from .evolution import TEXTURE_DENSITY, Engine
 from .cells import MAX_RANGE, CELL_LUT
 
 if TYPE_CHECKING:
+    from .arena import ChunkArena
     from .grid import Grid
 
+logger = logging.getLogger(__name__)
+
 """the size of the side of the chunk"""
 CHUNK_SIZE: int = 16
 
@@ -22,79 +25,194 @@ class ChunkStates(Enum):
     PRE_GENERATED = auto()
     NOT_GENERATED = auto()
     VOID = auto()
+    """
+    generated with only the first tiers of biome passes, see refine.py;
+    last, so the codes of the other states stay the same in stored chunks
+    """
+    PREVIEW = auto()
+
+
+"""uint8 codes of the states, as stored in a ChunkArena"""
+STATE_CODES = {state: state.value for state in ChunkStates}
+CODE_STATES = [None] + list(ChunkStates)
+
+
+class Phases(IntEnum):
+    """the generation steps that draw random numbers"""
+
+    CREATE = 0
+    BIOME = 1
+    TEXTURES = 2
+
+
+def new_seed() -> int:
+    """a fresh random world seed"""
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0])
+
+
+def chunk_rng(seed: int, pos: tuple[int, int], phase: Phases) -> np.random.Generator:
+    """
+    The generator for one phase of the chunk at pos.
+    It depends only on its arguments, never on what was generated before
+    """
+    x, y = pos
+    entropy = [seed, x & 0xFFFFFFFF, y & 0xFFFFFFFF, int(phase)]
+    return np.random.default_rng(np.random.SeedSequence(entropy))
+
+
+def random_cells(density: float, rng: np.random.Generator) -> np.ndarray:
+    """the initial random cells of a chunk"""
+    cells = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.int8)
+    mask: np.ndarray = rng.random((CHUNK_SIZE, CHUNK_SIZE)) < density
+
+    raw = rng.integers(0, MAX_RANGE + 1, size=mask.sum(), dtype=np.int8)
+    cells[mask] = CELL_LUT[raw]
+    return cells
 
 
 class Chunk:
-    def __init__(self, density: float = 0.5) -> None:
-        self.__cells: np.ndarray = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.int8)
-        self.__generate_random(density)
+    """
+    A view of one slot of a ChunkArena (see arena.py):
+    the cells and the state live in the arena's arrays
+    """
 
-        self.state = ChunkStates.NOT_GENERATED
+    __slots__ = ("arena", "slot", "pos")
+
+    def __init__(self, arena: "ChunkArena", slot: int, pos: tuple[int, int]) -> None:
+        self.arena = arena
+        self.slot = slot
+        self.pos = pos
+
+    @property
+    def engine(self) -> Engine:
+        return self.arena.engine
+
+    @property
+    def density(self) -> float:
+        return self.arena.density
+
+    @property
+    def seed(self) -> int:
+        return self.arena.seed
 
     @property
     def cells(self) -> np.ndarray:
-        return self.__cells
+        return self.arena.cells[self.slot]
+
+    @cells.setter
+    def cells(self, cells: np.ndarray) -> None:
+        self.arena.write_cells(self.slot, cells)
 
-    def __generate_random(self, density: float) -> None:
-        mask: np.ndarray = np.random.random((CHUNK_SIZE, CHUNK_SIZE)) < density
+    @property
+    def state(self) -> ChunkStates:
+        return CODE_STATES[self.arena.states[self.slot]]
 
-        raw = np.random.randint(0, MAX_RANGE + 1, size=mask.sum(), dtype=np.int8)
-        self.__cells[mask] = CELL_LUT[raw]
+    @state.setter
+    def state(self, state: ChunkStates) -> None:
+        self.arena.write_state(self.slot, STATE_CODES[state])
 
-    def generate_self(
-        self, grid: "Grid", pos: tuple[int, int], texture_density: float = 0.3
-    ) -> None:
+    def rng(self, phase: Phases) -> np.random.Generator:
+        return chunk_rng(self.seed, self.pos, phase)
+
+    @property
+    def initial_cells(self) -> np.ndarray:
+        """the random cells the chunk was created with"""
+        if self.state == ChunkStates.NOT_GENERATED:
+            return self.cells
+        return random_cells(self.density, self.rng(Phases.CREATE))
+
+    def reset(self) -> None:
+        """goes back to the initial random cells, NOT_GENERATED"""
+        self.cells = self.initial_cells
+        self.state = ChunkStates.NOT_GENERATED
+
+    def padded(
+        self,
+        grid: "Grid",
+        pos: tuple[int, int],
+        border: int,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Returns the cells surrounded by `border` rows and columns
+        taken from the eight neighbouring chunks.
+
+        Pre-generation (border 1) reads the initial cells of the neighbours
+        and generation (border 2) their terrain bits, so the result does not
+        depend on which neighbours were already generated
+        """
         x, y = pos
+        b = border
 
-        padded = np.zeros((CHUNK_SIZE + 4, CHUNK_SIZE + 4), dtype=np.int8)
-        padded[2:-2, 2:-2] = self.__cells
+        def edge(chunk: Chunk) -> np.ndarray:
+            return chunk.initial_cells if b == 1 else chunk.cells & 0b11
 
-        padded[0:2, 2:-2] = grid[x, y + 1].cells[-2:, :]
-        padded[-2:, 2:-2] = grid[x, y - 1].cells[:2, :]
+        if out is None:
+            out = np.zeros((CHUNK_SIZE + 2 * b, CHUNK_SIZE + 2 * b), dtype=np.int8)
+        out[b:-b, b:-b] = self.cells
 
-        padded[2:-2, 0:2] = grid[x - 1, y].cells[:, -2:]
-        padded[2:-2, -2:] = grid[x + 1, y].cells[:, :2]
+        out[:b, b:-b] = edge(grid[x, y + 1])[-b:, :]
+        out[-b:, b:-b] = edge(grid[x, y - 1])[:b, :]
 
-        padded[0:2, 0:2] = grid[x - 1, y + 1].cells[-2:, -2:]
-        padded[0:2, -2:] = grid[x + 1, y + 1].cells[-2:, :2]
-        padded[-2:, 0:2] = grid[x - 1, y - 1].cells[:2, -2:]
-        padded[-2:, -2:] = grid[x + 1, y - 1].cells[:2, :2]
+        out[b:-b, :b] = edge(grid[x - 1, y])[:, -b:]
+        out[b:-b, -b:] = edge(grid[x + 1, y])[:, :b]
 
-        print(f"pre_gen: {self.cells}")
+        out[:b, :b] = edge(grid[x - 1, y + 1])[-b:, -b:]
+        out[:b, -b:] = edge(grid[x + 1, y + 1])[-b:, :b]
+        out[-b:, :b] = edge(grid[x - 1, y - 1])[:b, -b:]
+        out[-b:, -b:] = edge(grid[x + 1, y - 1])[:b, :b]
 
-        self.__cells = generate_chunk_biome(padded)
-        
-        # print(f"biome: {self.cells}")
+        return out
 
-        self.__cells = textures(self.__cells, density=texture_density)
+    def generate_self(
+        self,
+        grid: "Grid",
+        pos: tuple[int, int],
+        texture_density: float = TEXTURE_DENSITY,
+    ) -> None:
+        with grid.metrics.timer("gather"):
+            padded = self.padded(grid, pos, 2)
 
-        # print(f"textures: {self.cells}")
+        logger.debug("pre_gen %s: %s", pos, self.cells)
 
-        self.state = ChunkStates.GENERATED
+        with grid.metrics.timer("biome"):
+            self.cells = self.engine.generate_chunk_biome(
+                padded, self.rng(Phases.BIOME)
+            )
 
-    def pre_generate_self(self, grid: "Grid", pos: tuple[int, int]) -> None:
-        x, y = pos
+        logger.debug("biome %s: %s", pos, self.cells)
+
+        with grid.metrics.timer("textures"):
+            self.cells = self.engine.textures(
+                self.cells, density=texture_density, rng=self.rng(Phases.TEXTURES)
+            )
 
-        padded = np.zeros((CHUNK_SIZE + 2, CHUNK_SIZE + 2), dtype=np.int8)
-        padded[1:-1, 1:-1] = self.__cells
+        logger.debug("textures %s: %s", pos, self.cells)
 
-        padded[0, 1:-1] = grid[x, y + 1].cells[-1, :]
-        padded[-1, 1:-1] = grid[x, y - 1].cells[0, :]
-        padded[1:-1, 0] = grid[x - 1, y].cells[:, -1]
-        padded[1:-1, -1] = grid[x + 1, y].cells[:, 0]
-        padded[0, 0] = grid[x - 1, y + 1].cells[-1, -1]
-        padded[0, -1] = grid[x + 1, y + 1].cells[-1, 0]
-        padded[-1, 0] = grid[x - 1, y - 1].cells[0, -1]
-        padded[-1, -1] = grid[x + 1, y - 1].cells[0, 0]
+        self.state = ChunkStates.GENERATED
 
+    def pre_generate_self(self, grid: "Grid", pos: tuple[int, int]) -> None:
+        with grid.metrics.timer("gather"):
+            padded = self.padded(grid, pos, 1)
 
-        self.__cells = pre_generate_chunk(padded)
+        self.cells = self.engine.pre_generate_chunk(padded)
         self.state = ChunkStates.PRE_GENERATED
 
-        print(f"pre: {self.cells}")
+        logger.debug("pre %s: %s", pos, self.cells)
 
 
 class NoneChunk(Chunk, metaclass=Singleton):
+    """the chunk of every position without one, it has no slot"""
+
+    __slots__ = ()
+
     def __init__(self) -> None:
-        self.__cells: ArrayLike = np.empty((0, 0))
-        self.state = ChunkStates.VOID
+        super().__init__(None, -1, None)
+
+    @property
+    def cells(self) -> np.ndarray:
+        return np.empty((0, 0), dtype=np.int8)
+
+    @property
+    def state(self) -> ChunkStates:
+        return ChunkStates.VOID
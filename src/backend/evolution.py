@@ -1,10 +1,18 @@
+import os
+import sys
+import threading
+import warnings
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import NamedTuple
+
 import numpy as np
-from scipy.signal import convolve2d
 from .cells import CELL_LUT
-from copy import copy
+from .metrics import Metrics
 
 
 NUMBER_OF_ITERATIONS = 10
+BIOME_ITERATIONS = 100
 KERNEL = np.ones((3, 3), dtype=np.int8)
 BIOME_KERNEL = np.full((5, 5), 1 / 25, dtype=np.float32)
 BIOME_KERNEL_GAUSS = np.array(
@@ -18,75 +26,623 @@ BIOME_KERNEL_GAUSS = np.array(
 )
 CHUNK_SIZE = 16
 DENSITY = 0.7
+TEXTURE_DENSITY = 0.3
+
+"""
+Whether the kernels skip work that can not change the result, the default
+of their `adaptive` argument. The terrain automaton stops at its fixed point
+(often after 6-9 of its 10 passes). The numba biome passes skip cells that
+are settled and whose window did not change; so few cells settle that the
+bookkeeping costs more than it saves, hence it is off. Set both to False
+to always run every pass over every cell
+"""
+ADAPTIVE_TERRAIN = True
+ADAPTIVE_BIOME = False
+
+
+_counter = threading.local()
 
 
-def evolve(bigger_chunk: np.ndarray) -> None:
+@contextmanager
+def counting(metrics: Metrics) -> Iterator[Metrics]:
     """
-    Generates terrain
+    The kernels this thread runs inside the block count the work they did
+    and skipped into metrics (see Metrics.savings); outside of one they
+    count nothing
     """
-    convolved = convolve2d(bigger_chunk, KERNEL, mode="valid")
-    bigger_chunk[1:-1, 1:-1] = CELL_LUT[convolved]
+    previous = getattr(_counter, "metrics", None)
+    _counter.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _counter.metrics = previous
+
+
+def _count(terrain_passes: int, terrain_skipped: int, updates: int, skipped: int) -> None:
+    metrics = getattr(_counter, "metrics", None)
+    if metrics is not None:
+        metrics.count(terrain_passes, terrain_skipped, updates, skipped)
+
+
+"""one generator, or one generator per chunk of a (N, h, w) stack"""
+Random = np.random.Generator | Sequence[np.random.Generator]
+
+
+def _generators(rng: Random | None, count: int) -> list[np.random.Generator]:
+    if rng is None:
+        rng = np.random.default_rng()
+    if isinstance(rng, np.random.Generator):
+        return [rng] * count
+    return list(rng)
+
+
+def _uniform(rng: Random, out: np.ndarray) -> np.ndarray:
+    """fills out with uniform floats, each chunk from its own generator"""
+    if isinstance(rng, np.random.Generator):
+        return rng.random(dtype=out.dtype, out=out)
+    for generator, part in zip(rng, out):
+        generator.random(dtype=out.dtype, out=part)
+    return out
+
+
+def _integers(rng: Random, low: int, high: int, shape: tuple[int, ...]) -> np.ndarray:
+    """int8 array of random integers, each chunk from its own generator"""
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(low, high, size=shape, dtype=np.int8)
+    return np.stack(
+        [g.integers(low, high, size=shape[1:], dtype=np.int8) for g in rng]
+    )
+
+
+class TerrainBuffers:
+    """
+    Scratch arrays for evolve, allocated once and reused between passes
+    """
+
+    def __init__(self, shape: tuple[int, ...]):
+        *lead, height, width = shape
+        self.shape = tuple(shape)
+        # 9 cells of at most 3 sum to 27, int8 is enough
+        self.rows = np.empty((*lead, height, width - 2), dtype=np.int8)
+        self.sums = np.empty((*lead, height - 2, width - 2), dtype=np.int8)
+        self.cells = np.empty_like(self.sums)
+        self.changed = np.empty(self.sums.shape, dtype=bool)
+
+
+def _box_sum(bigger_chunk: np.ndarray, b: TerrainBuffers) -> None:
+    """the 3x3 sums of the inner cells into b.sums, one row and one column pass"""
+    np.add(bigger_chunk[..., :-2], bigger_chunk[..., 1:-1], out=b.rows)
+    b.rows += bigger_chunk[..., 2:]
+    np.add(b.rows[..., :-2, :], b.rows[..., 1:-1, :], out=b.sums)
+    b.sums += b.rows[..., 2:, :]
+
+
+def check_terrain(cells: np.ndarray) -> None:
+    """
+    Raises ValueError unless every cell holds terrain bits only. The 3x3
+    sums index CELL_LUT, so biome or texture bits would overflow them into
+    another cell type instead of failing
+    """
+    if cells.size and (cells.min() < 0 or cells.max() > 0b11):
+        raise ValueError("terrain cells must be 0, 2 or 3")
+
+
+def evolve(
+    bigger_chunk: np.ndarray, buffers: TerrainBuffers | None = None, check: bool = True
+) -> None:
+    """
+    Generates terrain, works on a chunk or on a (N, h, w) stack of chunks.
+    The sums go to a separate buffer, so the inner cells are overwritten
+    in place; with `buffers` a pass allocates nothing. `check=False` skips
+    check_terrain for cells already known to be terrain, such as the
+    output of a previous pass
+    """
+    if check:
+        check_terrain(bigger_chunk)
+    b = TerrainBuffers(bigger_chunk.shape) if buffers is None else buffers
+    _box_sum(bigger_chunk, b)
+    # terrain sums to at most 27, so clip never clips ("raise" would buffer out)
+    np.take(CELL_LUT, b.sums, out=bigger_chunk[..., 1:-1, 1:-1], mode="clip")
+
+
+def _changed_pass(stack: np.ndarray, b: TerrainBuffers) -> np.ndarray:
+    """evolves a (N, h, w) stack of checked terrain and returns which of its chunks changed"""
+    _box_sum(stack, b)
+    np.take(CELL_LUT, b.sums, out=b.cells, mode="clip")
+    inner = stack[:, 1:-1, 1:-1]
+    np.not_equal(b.cells, inner, out=b.changed)
+    inner[...] = b.cells
+    return b.changed.any(axis=(1, 2))
 
 
 def pre_generate_chunk(
-    bigger_chunk: np.ndarray, iterations: int = NUMBER_OF_ITERATIONS
+    bigger_chunk: np.ndarray,
+    iterations: int = NUMBER_OF_ITERATIONS,
+    adaptive: bool | None = None,
+    step: Callable[[np.ndarray], None] | None = None,
 ) -> np.ndarray:
-    """Runs evolve a number of times"""
+    """
+    Runs evolve (or another implementation of it, `step`) a number of times.
+    When adaptive, a chunk leaves the stack once a pass does not change it:
+    the automaton is deterministic, so it stays at that fixed point
+    """
+    check_terrain(bigger_chunk)
+    if not (ADAPTIVE_TERRAIN if adaptive is None else adaptive):
+        buffers = TerrainBuffers(bigger_chunk.shape)
+        for _ in range(iterations):
+            if step is None:
+                evolve(bigger_chunk, buffers, check=False)
+            else:
+                step(bigger_chunk)
+        _count(iterations * _stack_size(bigger_chunk), 0, 0, 0)
+        return bigger_chunk[..., 1:-1, 1:-1]
+
+    stack = bigger_chunk if bigger_chunk.ndim == 3 else bigger_chunk[np.newaxis]
+    active = np.arange(len(stack))
+    buffers = TerrainBuffers(stack.shape)
+    passes = 0
     for _ in range(iterations):
-        evolve(bigger_chunk)
-    return bigger_chunk[1:-1, 1:-1]
+        # fancy indexing copies, so the stack is only split once chunks settle
+        whole = len(active) == len(stack)
+        field = stack if whole else stack[active]
+        if step is None:
+            if buffers.shape != field.shape:
+                buffers = TerrainBuffers(field.shape)
+            changed = _changed_pass(field, buffers)
+        else:
+            before = field[:, 1:-1, 1:-1].copy()
+            step(field)
+            changed = (field[:, 1:-1, 1:-1] != before).any(axis=(1, 2))
+        if not whole:
+            stack[active] = field
+        passes += len(active)
+        active = active[changed]
+        if not len(active):
+            break
+    _count(passes, iterations * len(stack) - passes, 0, 0)
+    return bigger_chunk[..., 1:-1, 1:-1]
+
+
+def _stack_size(bigger_chunk: np.ndarray) -> int:
+    return len(bigger_chunk) if bigger_chunk.ndim == 3 else 1
 
 
-def get_biome(terrain: int, value: np.ndarray) -> int:
+def get_biome(
+    terrain: int, value: np.ndarray, rng: np.random.Generator | None = None
+) -> int:
     """
     Generates biome for the cell
     """
+    rng = np.random.default_rng() if rng is None else rng
     probs = value / value.sum()
-    biome = np.random.choice((0, 1, 2, 3), p=probs)
+    biome = rng.choice((0, 1, 2, 3), p=probs)
 
     return (biome << 2) | terrain
 
 
-def biome_evolve(bigger_chunk: np.ndarray) -> None:
+class BiomeBuffers:
+    """
+    Scratch arrays for biome_evolve, allocated once and reused between passes
+    """
+
+    def __init__(self, shape: tuple[int, ...], kernel: np.ndarray = BIOME_KERNEL):
+        *lead, height, width = shape
+        inner = (*lead, height - 4, width - 4)
+
+        self.kernel = np.asarray(kernel, dtype=np.float32)
+        self.total = np.float32(self.kernel.sum())
+        self.codes = np.arange(16, dtype=np.int8).reshape((16,) + (1,) * len(shape))
+        self.biomes = np.arange(4, dtype=np.int8).reshape((4,) + (1,) * len(inner))
+
+        # both biome kernels are outer products, which needs 10 shifts instead of 25
+        u, s, vt = np.linalg.svd(self.kernel.astype(np.float64))
+        self.separable = bool(s[1] <= 1e-6 * s[0])
+        self.columns = (u[:, 0] * s[0]).astype(np.float32)
+        self.rows = vt[0].astype(np.float32)
+
+        self.packed = np.empty(shape, dtype=np.int8)
+        self.onehot = np.empty((16, *shape), dtype=np.float32)
+        self.row_pass = np.empty((16, *lead, height, width - 4), dtype=np.float32)
+        self.row_weighted = np.empty_like(self.row_pass)
+        self.weighted = np.empty((16, *inner), dtype=np.float32)
+        self.histogram = np.empty((16, *inner), dtype=np.float32)
+        self.flat_histogram = self.histogram.reshape(-1)
+
+        # flat histogram index of (terrain 0, biome k) for every inner cell,
+        # a pass only adds terrain * cells to it
+        self.cells = np.intp(np.prod(inner))
+        self.base = (self.biomes.astype(np.intp) << 2) * self.cells
+        self.base = self.base + np.arange(self.cells, dtype=np.intp).reshape(inner)
+        self.terrain = np.empty(inner, dtype=np.int8)
+        self.own_biome = np.empty(inner, dtype=np.int8)
+        self.offset = np.empty(inner, dtype=np.intp)
+        self.index = np.empty((4, *inner), dtype=np.intp)
+        self.probs = np.empty((4, *inner), dtype=np.float32)
+        self.rest = np.empty(inner, dtype=np.float32)
+        self.own = np.empty((4, *inner), dtype=bool)
+        self.own_rest = np.empty((4, *inner), dtype=np.float32)
+        self.above = np.empty((3, *inner), dtype=bool)
+        self.draw = np.empty(inner, dtype=np.float32)
+        self.biome = np.empty(inner, dtype=np.int8)
+
+
+def biome_evolve(
+    bigger_chunk: np.ndarray,
+    rng: Random | None = None,
+    kernel: np.ndarray = BIOME_KERNEL,
+    buffers: BiomeBuffers | None = None,
+    draw: np.ndarray | None = None,
+) -> None:
+    """
+    Convolution-like generation for biome, one pass over a chunk
+    or a (N, h, w) stack of chunks.
+
+    Every inner cell counts the biomes of its 5x5 neighbourhood weighted by
+    kernel; neighbours with a different terrain vote for the cell's own biome.
+    The new biome is sampled from that histogram with one uniform draw per cell.
+    The centre of bigger_chunk is updated in place, the 2-cell border is kept.
+    `draw` may hold the uniform samples instead of drawing them from rng.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    if buffers is None:
+        buffers = BiomeBuffers(bigger_chunk.shape, kernel)
+    b = buffers
+    height, width = bigger_chunk.shape[-2] - 4, bigger_chunk.shape[-1] - 4
+
+    # terrain and biome bits only, textures are not part of the automaton
+    np.bitwise_and(bigger_chunk, 0b1111, out=b.packed)
+    np.equal(b.packed, b.codes, out=b.onehot)
+
+    # weighted count of every (terrain, biome) pair in the 5x5 window
+    b.histogram.fill(0)
+    if b.separable:
+        b.row_pass.fill(0)
+        for m in range(5):
+            np.multiply(b.onehot[..., m : m + width], b.rows[m], out=b.row_weighted)
+            b.row_pass += b.row_weighted
+        for k in range(5):
+            np.multiply(b.row_pass[..., k : k + height, :], b.columns[k], out=b.weighted)
+            b.histogram += b.weighted
+    else:
+        for k in range(5):
+            for m in range(5):
+                window = b.onehot[..., k : k + height, m : m + width]
+                np.multiply(window, b.kernel[k, m], out=b.weighted)
+                b.histogram += b.weighted
+
+    # keep only the pairs with the same terrain as the centre cell
+    centre = b.packed[..., 2:-2, 2:-2]
+    np.bitwise_and(centre, 0b11, out=b.terrain)
+    np.right_shift(centre, 2, out=b.own_biome)
+    np.multiply(b.terrain, b.cells, out=b.offset)
+    np.add(b.base, b.offset, out=b.index)
+    # every index is in range, mode="clip" lets take write straight into out
+    np.take(b.flat_histogram, b.index, out=b.probs, mode="clip")
+
+    # the rest of the window (other terrains) votes for the centre biome
+    np.sum(b.probs, axis=0, out=b.rest)
+    np.subtract(b.total, b.rest, out=b.rest)
+    np.equal(b.own_biome, b.biomes, out=b.own)
+    np.multiply(b.own, b.rest, out=b.own_rest)
+    b.probs += b.own_rest
+
+    # categorical sampling: count the cumulative weights below the draw
+    np.cumsum(b.probs, axis=0, out=b.probs)
+    if draw is None:
+        _uniform(rng, b.draw)
+    else:
+        b.draw[...] = draw
+    b.draw *= b.probs[-1]
+    np.less_equal(b.probs[:-1], b.draw, out=b.above)
+    np.sum(b.above, axis=0, dtype=np.int8, out=b.biome)
+
+    np.left_shift(b.biome, 2, out=b.biome)
+    np.bitwise_or(b.biome, b.terrain, out=bigger_chunk[..., 2:-2, 2:-2])
+
+
+def generate_chunk_biome(
+    bigger_chunk: np.ndarray,
+    rng: Random | None = None,
+    iterations: int = BIOME_ITERATIONS,
+    kernel: np.ndarray = BIOME_KERNEL,
+) -> np.ndarray:
+    """
+    Generates chunk biome.
+    Every pass is vectorised over the whole stack and runs over every cell
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    field = biome_noise(bigger_chunk, rng)
+    biome_passes(field, rng, iterations, kernel)
+    return field[..., 2:-2, 2:-2]
+
+
+def biome_noise(bigger_chunk: np.ndarray, rng: Random | None = None) -> np.ndarray:
+    """the padded terrain with a random biome in every cell, where the passes start"""
+    rng = np.random.default_rng() if rng is None else rng
+    noise = _integers(rng, 0, 4, bigger_chunk.shape)
+    return (noise << 2) | bigger_chunk.astype(np.int8)
+
+
+def biome_passes(
+    field: np.ndarray,
+    rng: Random | None = None,
+    iterations: int = BIOME_ITERATIONS,
+    kernel: np.ndarray = BIOME_KERNEL,
+) -> None:
     """
-    Convolution-like generation for biome
+    Runs biome passes over a field of biome_noise in place. Splitting the
+    passes over several calls with the same generators changes nothing
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    buffers = BiomeBuffers(field.shape, kernel)
+    for _ in range(iterations):
+        biome_evolve(field, rng, buffers=buffers)
+    _count(0, 0, iterations * buffers.draw.size, 0)
+
+
+def textures(
+    chunk: np.ndarray, density: float, rng: Random | None = None
+) -> np.ndarray:
+    """
+    Adds textures
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    mask: np.ndarray = _uniform(rng, np.empty(chunk.shape)) < density
+    textures: np.ndarray = _integers(rng, 1, 4, chunk.shape) << 4
+
+    return chunk | textures * mask
+
+
+def reference_biome_evolve(
+    bigger_chunk: np.ndarray,
+    rng: np.random.Generator | None = None,
+    kernel: np.ndarray = BIOME_KERNEL,
+) -> None:
+    """
+    Cell by cell version of biome_evolve, kept to check the fast engines
     """
-    bigger_chunk = copy(bigger_chunk)
     terrain: np.ndarray = bigger_chunk & 0b11
     biome = (bigger_chunk & 0b1100) >> 2
-    size = CHUNK_SIZE
-    result = np.zeros((size, size), dtype=np.int8)
-    for i in range(size):
-        for j in range(size):
+    height, width = bigger_chunk.shape[0] - 4, bigger_chunk.shape[1] - 4
+    result = np.zeros((height, width), dtype=np.int8)
+    for i in range(height):
+        for j in range(width):
             value = np.zeros(4, dtype=np.float32)
             for k in range(0, 5):
                 for m in range(0, 5):
-                    if terrain[i, j] != terrain[i + k, j + m]:
-                        biome_idx: np.int8 = biome[i, j]
+                    if terrain[i + 2, j + 2] != terrain[i + k, j + m]:
+                        biome_idx: np.int8 = biome[i + 2, j + 2]
                     else:
                         biome_idx: np.int8 = biome[i + k, j + m]
-                    value[biome_idx] += 1 * BIOME_KERNEL[k, m]
-            result[i, j] = get_biome(bigger_chunk[i, j], value)
+                    value[biome_idx] += 1 * kernel[k, m]
+            result[i, j] = get_biome(terrain[i + 2, j + 2], value, rng)
     bigger_chunk[2:-2, 2:-2] = result
 
 
-def generate_chunk_biome(bigger_chunk: np.ndarray) -> np.ndarray:
+def reference_generate_chunk_biome(
+    bigger_chunk: np.ndarray,
+    rng: Random | None = None,
+    iterations: int = BIOME_ITERATIONS,
+    kernel: np.ndarray = BIOME_KERNEL,
+) -> np.ndarray:
     """
-    Generates chunk biome
+    Generates chunk biome with reference_biome_evolve, always in full
     """
-    noise = np.random.randint(0, 4, size=(CHUNK_SIZE+4, CHUNK_SIZE+4))
-    bigger_chunk = (noise << 2) | bigger_chunk
-    for _ in range(100):
-        biome_evolve(bigger_chunk)
-    return bigger_chunk[2:-2, 2:-2]
+    if bigger_chunk.ndim == 3:
+        return np.stack(
+            [
+                reference_generate_chunk_biome(chunk, generator, iterations, kernel)
+                for chunk, generator in zip(
+                    bigger_chunk, _generators(rng, len(bigger_chunk))
+                )
+            ]
+        )
+    rng = np.random.default_rng() if rng is None else rng
+    field = biome_noise(bigger_chunk, rng)
+    reference_biome_passes(field, rng, iterations, kernel)
+    return field[2:-2, 2:-2]
+
+
+def reference_biome_passes(
+    field: np.ndarray,
+    rng: Random | None = None,
+    iterations: int = BIOME_ITERATIONS,
+    kernel: np.ndarray = BIOME_KERNEL,
+) -> None:
+    """biome_passes with reference_biome_evolve"""
+    if field.ndim == 3:
+        for chunk, generator in zip(field, _generators(rng, len(field))):
+            reference_biome_passes(chunk, generator, iterations, kernel)
+        return
+    rng = np.random.default_rng() if rng is None else rng
+    for _ in range(iterations):
+        reference_biome_evolve(field, rng, kernel)
 
-def textures(chunk: np.ndarray, density: float) -> np.ndarray:
+
+class Engine(NamedTuple):
     """
-    Adds textures
+    A set of generation kernels with the same signatures; the biome kernels
+    of numba also take `adaptive` (see ADAPTIVE_BIOME)
     """
-    mask: np.ndarray = np.random.rand(CHUNK_SIZE, CHUNK_SIZE) < density
-    textures: np.ndarray = (
-        np.random.choice((1, 2, 3), size=(CHUNK_SIZE, CHUNK_SIZE)) << 4
+
+    name: str
+    pre_generate_chunk: Callable[..., np.ndarray]
+    generate_chunk_biome: Callable[..., np.ndarray]
+    textures: Callable[..., np.ndarray]
+    """generate_chunk_biome in two steps, so the passes can be split (see refine.py)"""
+    biome_noise: Callable[..., np.ndarray]
+    biome_passes: Callable[..., None]
+
+
+ENGINES = ("numpy", "numba", "memo", "reference")
+DEFAULT_ENGINE = "numpy"
+
+_engines: dict[str, Engine] = {}
+
+
+def _numba_engine() -> Engine:
+    from . import numba_kernels
+
+    def pre_generate(
+        bigger_chunk: np.ndarray,
+        iterations: int = NUMBER_OF_ITERATIONS,
+        adaptive: bool | None = None,
+    ) -> np.ndarray:
+        if bigger_chunk.ndim == 3:
+            for chunk in bigger_chunk:
+                chunk[1:-1, 1:-1] = pre_generate(chunk, iterations, adaptive)
+            return bigger_chunk[:, 1:-1, 1:-1]
+        # the kernel indexes CELL_LUT without bounds checks
+        check_terrain(bigger_chunk)
+        bigger_chunk = np.ascontiguousarray(bigger_chunk, dtype=np.int8)
+        cells, passes = numba_kernels.pre_generate_chunk(
+            bigger_chunk, iterations, ADAPTIVE_TERRAIN if adaptive is None else adaptive
+        )
+        _count(passes, iterations - passes, 0, 0)
+        return cells
+
+    def generate_biome(
+        bigger_chunk: np.ndarray,
+        rng: Random | None = None,
+        iterations: int = BIOME_ITERATIONS,
+        kernel: np.ndarray = BIOME_KERNEL,
+        adaptive: bool | None = None,
+    ) -> np.ndarray:
+        generators = _generators(rng, len(bigger_chunk))
+        if bigger_chunk.ndim == 3:
+            return np.stack(
+                [
+                    generate_biome(chunk, generator, iterations, kernel, adaptive)
+                    for chunk, generator in zip(bigger_chunk, generators)
+                ]
+            )
+        cells, updates = numba_kernels.generate_chunk_biome(
+            np.ascontiguousarray(bigger_chunk, dtype=np.int8),
+            np.asarray(kernel, dtype=np.float32),
+            iterations,
+            generators[0],
+            ADAPTIVE_BIOME if adaptive is None else adaptive,
+        )
+        inner = (bigger_chunk.shape[0] - 4) * (bigger_chunk.shape[1] - 4)
+        _count(0, 0, updates, iterations * inner - updates)
+        return cells
+
+    def noise(bigger_chunk: np.ndarray, rng: Random | None = None) -> np.ndarray:
+        generators = _generators(rng, len(bigger_chunk))
+        if bigger_chunk.ndim == 3:
+            return np.stack(
+                [noise(chunk, generator) for chunk, generator in zip(bigger_chunk, generators)]
+            )
+        return numba_kernels.biome_noise(
+            np.ascontiguousarray(bigger_chunk, dtype=np.int8), generators[0]
+        )
+
+    def passes(
+        field: np.ndarray,
+        rng: Random | None = None,
+        iterations: int = BIOME_ITERATIONS,
+        kernel: np.ndarray = BIOME_KERNEL,
+        adaptive: bool | None = None,
+    ) -> None:
+        generators = _generators(rng, len(field))
+        if field.ndim == 3:
+            for chunk, generator in zip(field, generators):
+                passes(chunk, generator, iterations, kernel, adaptive)
+            return
+        working = np.ascontiguousarray(field, dtype=np.int8)
+        updates = numba_kernels.biome_passes(
+            working,
+            np.asarray(kernel, dtype=np.float32),
+            iterations,
+            generators[0],
+            ADAPTIVE_BIOME if adaptive is None else adaptive,
+        )
+        if working is not field:
+            field[...] = working
+        inner = (field.shape[0] - 4) * (field.shape[1] - 4)
+        _count(0, 0, updates, iterations * inner - updates)
+
+    def add_textures(
+        chunk: np.ndarray, density: float, rng: Random | None = None
+    ) -> np.ndarray:
+        generators = _generators(rng, len(chunk))
+        if chunk.ndim == 3:
+            return np.stack(
+                [
+                    add_textures(single, density, generator)
+                    for single, generator in zip(chunk, generators)
+                ]
+            )
+        chunk = np.ascontiguousarray(chunk, dtype=np.int8)
+        return numba_kernels.textures(chunk, density, generators[0])
+
+    return Engine("numba", pre_generate, generate_biome, add_textures, noise, passes)
+
+
+def _memo_engine() -> Engine:
+    from . import memo
+
+    def pre_generate(
+        bigger_chunk: np.ndarray,
+        iterations: int = NUMBER_OF_ITERATIONS,
+        adaptive: bool | None = None,
+    ) -> np.ndarray:
+        return pre_generate_chunk(bigger_chunk, iterations, adaptive, memo.evolve)
+
+    return Engine(
+        "memo", pre_generate, generate_chunk_biome, textures, biome_noise, biome_passes
     )
 
-    return chunk | textures * mask
\ No newline at end of file
+
+def get_engine(name: str = DEFAULT_ENGINE) -> Engine:
+    """
+    Returns the engine called name.
+    Falls back to numpy (with a warning) when numba can not be imported
+    """
+    if name not in ENGINES:
+        raise ValueError(f"unknown engine {name!r}, expected one of {ENGINES}")
+
+    if name not in _engines:
+        if name == "numba":
+            try:
+                _engines[name] = _numba_engine()
+            except ImportError as error:
+                warnings.warn(f"numba engine unavailable ({error}), using numpy")
+                _engines[name] = get_engine("numpy")
+        elif name == "memo":
+            _engines[name] = _memo_engine()
+        elif name == "reference":
+            _engines[name] = Engine(
+                "reference",
+                pre_generate_chunk,
+                reference_generate_chunk_biome,
+                textures,
+                biome_noise,
+                reference_biome_passes,
+            )
+        else:
+            _engines[name] = Engine(
+                "numpy",
+                pre_generate_chunk,
+                generate_chunk_biome,
+                textures,
+                biome_noise,
+                biome_passes,
+            )
+    return _engines[name]
+
+
+def set_kernel_cache(directory: str | os.PathLike) -> None:
+    """
+    Makes the numba kernels cache their machine code in directory instead
+    of next to numba_kernels.py, e.g. when the package is read-only. The
+    directory is picked when the kernels are loaded, so this has to come
+    before the numba engine is first used; child processes inherit it
+    through NUMBA_CACHE_DIR
+    """
+    if f"{__package__}.numba_kernels" in sys.modules:
+        raise RuntimeError("the numba kernels are loaded already, set their cache first")
+    os.environ["NUMBA_CACHE_DIR"] = os.fspath(directory)
+    numba = sys.modules.get("numba")
+    if numba is not None:
+        numba.config.CACHE_DIR = os.fspath(directory)
@@ -1,56 +1,974 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator
+from typing import TYPE_CHECKING, NamedTuple
 
-from .chunk import ChunkStates, Chunk, NoneChunk
+import numpy as np
+
+from .arena import SUMMARISED, ChunkArena, terrain_bits
+from .cells import CellTypes
+from .chunk import CHUNK_SIZE, CODE_STATES, ChunkStates, Chunk, NoneChunk, Phases, new_seed
+from .evolution import (
+    BIOME_ITERATIONS,
+    DEFAULT_ENGINE,
+    NUMBER_OF_ITERATIONS,
+    TEXTURE_DENSITY,
+    BiomeBuffers,
+    TerrainBuffers,
+    biome_evolve,
+    counting,
+    evolve,
+    get_engine,
+)
+from .metrics import Metrics, PhaseStats
+from .parallel import NEIGHBOURS, Scheduler
+from .refine import Refinement, RefineQueue
+from .store import ChunkStore
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+"""
+how chunks are evolved: one at a time, all eligible chunks as one stack,
+or all eligible chunks as one seamless region
+"""
+MODES = ("chunk", "batch", "region")
+
+"""which chunks are evicted first when the grid is over its budget"""
+EVICTION_POLICIES = ("lru", "distance")
+
+"""bytes of cell data per chunk, used to turn a memory budget into a chunk count"""
+CHUNK_BYTES = CHUNK_SIZE * CHUNK_SIZE
+
+LAND = (CellTypes.LAND, CellTypes.MOUNTAIN)
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    spills: int
+    loads: int
+    size: int
+    max_size: int | None
+
+
+class GridStats(NamedTuple):
+    """the phase timings, the cache counters and the number of chunks per state"""
+
+    phases: dict[str, PhaseStats]
+    cache: CacheInfo
+    states: dict[ChunkStates, int]
+
+
+class Region:
+    """
+    A rectangular block of chunks evolved as a single field.
+
+    The field covers the bounding box of the evolved chunks plus a `halo`
+    of cells copied from the chunks around it. Only the evolved chunks change:
+    every other cell of the field is frozen and restored after each pass,
+    so already finished neighbours keep their cells.
+    The result differs from chunk mode by design, only the pre-generation
+    of a lone chunk is the same
+    """
+
+    def __init__(
+        self,
+        grid: "Grid",
+        chunks: list[tuple[Chunk, tuple[int, int]]],
+        halo: int,
+    ) -> None:
+        xs = [x for _, (x, _) in chunks]
+        ys = [y for _, (_, y) in chunks]
+        self.x0, self.x1 = min(xs), max(xs)
+        self.y0, self.y1 = min(ys), max(ys)
+        self.halo = halo
+        self.grid = grid
+        self.chunks = chunks
+
+        height = (self.y1 - self.y0 + 1) * CHUNK_SIZE + 2 * halo
+        width = (self.x1 - self.x0 + 1) * CHUNK_SIZE + 2 * halo
+        self.field = np.zeros((height, width), dtype=np.int8)
+        self.frozen = np.ones((height, width), dtype=bool)
+        self.finished = np.zeros((height, width), dtype=bool)
+
+        with grid.metrics.timer("gather", len(chunks)):
+            self._gather(grid)
+        for _, pos in chunks:
+            self.frozen[self.box(pos)] = False
+        self.frozen_cells = self.field.copy()
+
+    def box(self, pos: tuple[int, int]) -> tuple[slice, slice]:
+        """the part of the field taken by the chunk at pos"""
+        x, y = pos
+        row = (self.y1 - y) * CHUNK_SIZE + self.halo
+        column = (x - self.x0) * CHUNK_SIZE + self.halo
+        return slice(row, row + CHUNK_SIZE), slice(column, column + CHUNK_SIZE)
+
+    def _overlaps(
+        self, grid: "Grid"
+    ) -> Generator[tuple[Chunk, tuple[int, int], tuple[slice, slice], tuple[slice, slice]]]:
+        """
+        Yields every existing chunk of the block and of the ring around it
+        with the part of the field it covers and the matching part of its cells
+        """
+        height, width = self.field.shape
+        for x in range(self.x0 - 1, self.x1 + 2):
+            for y in range(self.y0 - 1, self.y1 + 2):
+                chunk = grid[x, y]
+                if chunk.state == ChunkStates.VOID:
+                    continue
+                rows, columns = self.box((x, y))
+                top, left = max(rows.start, 0), max(columns.start, 0)
+                bottom, right = min(rows.stop, height), min(columns.stop, width)
+                if top >= bottom or left >= right:
+                    continue
+                yield (
+                    chunk,
+                    (x, y),
+                    (slice(top, bottom), slice(left, right)),
+                    (
+                        slice(top - rows.start, bottom - rows.start),
+                        slice(left - columns.start, right - columns.start),
+                    ),
+                )
+
+    def _gather(self, grid: "Grid") -> None:
+        """copies the block and only the halo-wide strips of the ring around it"""
+        for chunk, _, field_part, cells_part in self._overlaps(grid):
+            self.field[field_part] = chunk.cells[cells_part]
+            if chunk.state == ChunkStates.GENERATED:
+                self.finished[field_part] = True
+
+    def _freeze(self) -> None:
+        np.copyto(self.field, self.frozen_cells, where=self.frozen)
+
+    def _scatter(self, state: ChunkStates) -> None:
+        """copies the evolved chunks back into the arena"""
+        for chunk, pos in self.chunks:
+            chunk.cells = self.field[self.box(pos)]
+            chunk.state = state
+
+    def pre_generate(self, iterations: int = NUMBER_OF_ITERATIONS) -> None:
+        # the terrain automaton only reads the terrain bits of finished neighbours
+        self.field &= 0b11
+        self.frozen_cells = self.field.copy()
+        buffers = TerrainBuffers(self.field.shape)
+        for _ in range(iterations):
+            evolve(self.field, buffers, check=False)
+            self._freeze()
+        self._scatter(ChunkStates.PRE_GENERATED)
+
+    def generate(
+        self,
+        iterations: int = BIOME_ITERATIONS,
+        texture_density: float = TEXTURE_DENSITY,
+    ) -> None:
+        """
+        Every chunk draws its noise and its per-pass samples from its own
+        BIOME generator, so the result depends only on the seed and on
+        which chunks are evolved together
+        """
+        rngs = {pos: chunk.rng(Phases.BIOME) for chunk, pos in self.chunks}
+
+        # finished chunks already carry their biome, the others get noise
+        for chunk, pos, field_part, cells_part in self._overlaps(self.grid):
+            if chunk.state == ChunkStates.GENERATED:
+                continue
+            rng = rngs.get(pos) or chunk.rng(Phases.BIOME)
+            noise = rng.integers(0, 4, size=(CHUNK_SIZE, CHUNK_SIZE), dtype=np.int8)
+            self.field[field_part] |= noise[cells_part] << 2
+        self.frozen_cells = self.field.copy()
+
+        buffers = BiomeBuffers(self.field.shape)
+        draw = np.zeros_like(buffers.draw)
+        chunk_draw = np.empty((CHUNK_SIZE, CHUNK_SIZE), dtype=np.float32)
+        boxes = [
+            tuple(slice(part.start - 2, part.stop - 2) for part in self.box(pos))
+            for _, pos in self.chunks
+        ]
+        metrics = self.grid.metrics
+        with metrics.timer("biome", len(self.chunks)):
+            for _ in range(iterations):
+                for (_, pos), box in zip(self.chunks, boxes):
+                    draw[box] = rngs[pos].random(dtype=np.float32, out=chunk_draw)
+                biome_evolve(self.field, buffers=buffers, draw=draw)
+                self._freeze()
+
+        with metrics.timer("textures", len(self.chunks)):
+            for chunk, pos in self.chunks:
+                box = self.box(pos)
+                self.field[box] = chunk.engine.textures(
+                    self.field[box], texture_density, chunk.rng(Phases.TEXTURES)
+                )
+        self._scatter(ChunkStates.GENERATED)
+
+
+def distance(a: tuple[int, int], b: tuple[int, int]) -> int:
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def ring(pos: tuple[int, int], k: int) -> Generator[tuple[int, int]]:
+    """the positions at manhattan distance exactly k from pos"""
+    x, y = pos
+    if k == 0:
+        yield pos
+        return
+    for i in range(k):
+        yield x + i, y + k - i
+        yield x + k - i, y - i
+        yield x - i, y - k + i
+        yield x - k + i, y + i
+
+
+def diamond(centre: tuple[int, int], radius: int) -> list[tuple[int, int]]:
+    """the positions closer than radius to centre, the area generate_around generates"""
+    return [pos for k in range(radius) for pos in ring(centre, k)]
+
+
+def exposed(
+    old: tuple[int, int] | None, new: tuple[int, int], radius: int
+) -> Generator[tuple[int, int]]:
+    """
+    The positions of the diamond of radius around new that are not
+    in the diamond of the same radius around old. Only the outer
+    `distance(old, new)` rings of the new diamond are enumerated
+    """
+    step = radius if old is None else min(distance(old, new), radius)
+    for k in range(radius - step, radius):
+        for pos in ring(new, k):
+            if old is None or distance(pos, old) >= radius:
+                yield pos
+
+
+def around(positions: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """positions and their eight neighbours, in a fixed order"""
+    seen = dict.fromkeys(positions)
+    for x, y in positions:
+        for dx, dy in NEIGHBOURS:
+            seen.setdefault((x + dx, y + dy))
+    return list(seen)
+
+
+class Frontier:
+    """
+    The chunks one phase still has to process.
+
+    Between two calls the diamond of the phase only gains the ring exposed
+    by the move of the centre; everything else of the old diamond was
+    processed already, except the chunks left over by a cancelled call,
+    which are kept in `pending`
+    """
+
+    def __init__(self) -> None:
+        self.centre: tuple[int, int] | None = None
+        self.radius: int = 0
+        self.pending: set[tuple[int, int]] = set()
+
+    def advance(self, centre: tuple[int, int], radius: int) -> list[tuple[int, int]]:
+        """the newly exposed positions plus the leftovers still inside the diamond"""
+        old = self.centre if radius == self.radius else None
+        candidates = list(exposed(old, centre, radius))
+        candidates += [pos for pos in self.pending if distance(pos, centre) < radius]
+        self.centre, self.radius = centre, radius
+        return candidates
+
+    def forget(self) -> None:
+        """the next call enumerates the whole diamond"""
+        self.centre = None
+        self.pending.clear()
 
 
 class Grid:
-    def __init__(self, density: float) -> None:
-        self.__chunks: dict[tuple[int, int], Chunk] = dict()
+    def __init__(
+        self,
+        density: float,
+        engine: str = DEFAULT_ENGINE,
+        mode: str = "batch",
+        workers: int = 1,
+        seed: int | None = None,
+        max_chunks: int | None = None,
+        max_bytes: int | None = None,
+        eviction: str = "lru",
+        store: ChunkStore | None = None,
+        metrics: Metrics | None = None,
+        shared_capacity: int | None = None,
+        preview_tiers: tuple[int, ...] = (),
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}, expected one of {MODES}")
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(
+                f"unknown eviction {eviction!r}, expected one of {EVICTION_POLICIES}"
+            )
+
+        if list(preview_tiers) != sorted(set(preview_tiers)) or not all(
+            0 < tier < BIOME_ITERATIONS for tier in preview_tiers
+        ):
+            raise ValueError(
+                f"preview tiers must be increasing pass counts below {BIOME_ITERATIONS}"
+            )
+        if preview_tiers and (mode == "region" or workers > 1):
+            raise ValueError("preview tiers need mode 'chunk' or 'batch' and one worker")
+        if mode == "region" and workers > 1:
+            # the Scheduler evolves chunk by chunk, it would be chunk mode in disguise
+            raise ValueError("mode 'region' runs on one worker")
+
+        if max_bytes is not None:
+            by_bytes = max_bytes // CHUNK_BYTES
+            max_chunks = by_bytes if max_chunks is None else min(max_chunks, by_bytes)
+
         self.__density: float = density
+        self.__engine: str = get_engine(engine).name
+        self.__mode: str = mode
+        self.__workers: int = workers
+        self.__executor: "ProcessPoolExecutor | None" = None
+        self.__seed: int = new_seed() if seed is None else seed
+        if store is not None:
+            store.bind(self.world())
+        """other processes attach to a shared arena by `grid.chunks.name`"""
+        if shared_capacity is None:
+            self.__chunks: ChunkArena = ChunkArena(density, self.__engine, self.__seed)
+        else:
+            # imported here, shared memory pulls in multiprocessing
+            from .shared import SharedChunkArena
+
+            self.__chunks = SharedChunkArena(
+                density, self.__engine, self.__seed, shared_capacity
+            )
+        self.__clock: int = 0
+        self.__none: Chunk = NoneChunk()
+
+        """what each phase still has to do: creation, pre-generation, generation"""
+        self.__created = Frontier()
+        self.__pre_generated = Frontier()
+        self.__generated = Frontier()
+
+        self.__max_chunks: int | None = max_chunks
+        self.__shared_capacity: int | None = shared_capacity
+        self.__eviction: str = eviction
+        self.__store: ChunkStore | None = store
+        self.__centre: tuple[int, int] = (0, 0)
+        self.__working_radius: int = 0
+        self.__hits = self.__misses = self.__evictions = 0
+        self.__spills = self.__loads = 0
+
+        """phase timings, disabled unless an enabled Metrics is passed in"""
+        self.metrics: Metrics = Metrics() if metrics is None else metrics
+
+        """biome passes after which a chunk is PREVIEW, then GENERATED"""
+        self.__tiers: tuple[int, ...] = tuple(preview_tiers) + (BIOME_ITERATIONS,)
+        self.__refining = RefineQueue()
 
     def __getitem__(self, item: tuple[int, int]) -> Chunk:
-        return self.__chunks.get(item, NoneChunk())
+        chunk = self.__chunks.get(item)
+        if chunk is None:
+            self.__misses += 1
+            return self.__none
+
+        self.__hits += 1
+        if self.__max_chunks is not None:
+            self.__clock += 1
+            self.__chunks.last_used[chunk.slot] = self.__clock
+        return chunk
 
     @property
-    def chunks(self) -> dict[tuple[int, int], Chunk]:
+    def chunks(self) -> ChunkArena:
+        """every chunk in memory, a read-only mapping from positions to chunks"""
         return self.__chunks
 
-    def generate_around(self, pos: tuple[int, int], generated_radius: int) -> None:
+    @property
+    def density(self) -> float:
+        return self.__density
+
+    @property
+    def engine(self) -> str:
+        """name of the engine actually used (after a possible fallback)"""
+        return self.__engine
+
+    @property
+    def mode(self) -> str:
+        return self.__mode
+
+    @property
+    def seed(self) -> int:
+        return self.__seed
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @property
+    def store(self) -> ChunkStore | None:
+        return self.__store
+
+    @property
+    def preview_tiers(self) -> tuple[int, ...]:
+        return self.__tiers[:-1]
+
+    def world(self) -> dict:
+        """
+        What the chunks depend on besides their position. Two grids with the
+        same world generate the same chunks, so they may share a store
+        """
+        return dict(
+            seed=int(self.__seed),
+            density=float(self.__density),
+            engine=self.__engine,
+            mode="region" if self.__mode == "region" else "chunk",
+        )
+
+    def config(self) -> dict:
+        """
+        The keyword arguments this grid was built with, apart from density
+        and seed: `Grid(density, seed=seed, **grid.config())` is the same
+        kind of grid for another world (max_bytes is part of max_chunks)
+        """
+        return dict(
+            engine=self.__engine,
+            mode=self.__mode,
+            workers=self.__workers,
+            max_chunks=self.__max_chunks,
+            eviction=self.__eviction,
+            store=self.__store,
+            metrics=self.metrics,
+            shared_capacity=self.__shared_capacity,
+            preview_tiers=self.preview_tiers,
+        )
+
+    @property
+    def refinements(self) -> RefineQueue:
+        """the PREVIEW chunks waiting for refinement"""
+        return self.__refining
+
+    def biome_passes(self, pos: tuple[int, int]) -> int:
+        """the biome passes the chunk at pos has had so far"""
+        chunk = self.__chunks.get(pos)
+        if chunk is None:
+            return 0
+        if chunk.state == ChunkStates.GENERATED:
+            return BIOME_ITERATIONS
+        refinement = self.__refining.get(pos)
+        return 0 if refinement is None else refinement.passes
+
+    def cache_info(self) -> CacheInfo:
+        """lookup hits and misses, evictions and store traffic"""
+        return CacheInfo(
+            self.__hits,
+            self.__misses,
+            self.__evictions,
+            self.__spills,
+            self.__loads,
+            len(self.__chunks),
+            self.__max_chunks,
+        )
+
+    def stats(self) -> GridStats:
+        """a snapshot of the phase timings, the cache counters and the chunk states"""
+        codes = np.bincount(
+            self.__chunks.states[self.__chunks.occupied()], minlength=len(CODE_STATES)
+        )
+        return GridStats(
+            self.metrics.snapshot(),
+            self.cache_info(),
+            {
+                state: int(codes[state.value])
+                for state in ChunkStates
+                if state != ChunkStates.VOID
+            },
+        )
+
+    def sample(self, xs, ys, fill: int = -1) -> np.ndarray:
+        """
+        The cells at the world coordinates xs, ys (arrays of any matching
+        shape, floats are floored), `fill` where there is no chunk.
+        The point (x, y) is cell [x - 16 cx, y - 16 cy] of chunk (cx, cy),
+        as the window draws them. Every chunk is looked up once, the cells
+        are read from the slab with one gather
+        """
+        xs, ys = np.broadcast_arrays(
+            np.floor(xs).astype(np.int64), np.floor(ys).astype(np.int64)
+        )
+        cx, cy = xs // CHUNK_SIZE, ys // CHUNK_SIZE
+        keys = (cx << 32) | (cy & 0xFFFFFFFF)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+        chunk_slots = np.array(
+            [
+                self.__chunks.slot((int(x), int(y)))
+                for x, y in zip(cx.flat[first], cy.flat[first])
+            ],
+            dtype=np.int64,
+        )
+        found = chunk_slots >= 0
+        self.__hits += int(np.count_nonzero(found))
+        self.__misses += len(unique) - int(np.count_nonzero(found))
+        if self.__max_chunks is not None and found.any():
+            self.__clock += 1
+            self.__chunks.last_used[chunk_slots[found]] = self.__clock
+
+        slots = chunk_slots[inverse.reshape(xs.shape)]
+        cells = np.full(xs.shape, fill, dtype=np.int8)
+        inside = slots >= 0
+        cells[inside] = self.__chunks.cells[
+            slots[inside],
+            xs[inside] - cx[inside] * CHUNK_SIZE,
+            ys[inside] - cy[inside] * CHUNK_SIZE,
+        ]
+        return cells
+
+    def summary(self, pos: tuple[int, int]) -> np.ndarray | None:
+        """
+        The number of cells of every (terrain, biome) pair of the chunk at pos
+        as a (4, 4) array, None unless it is PREVIEW or GENERATED
+        """
+        slot = self.__chunks.slot(pos)
+        if slot < 0 or self.__chunks.states[slot] not in SUMMARISED:
+            return None
+        return self.__chunks.summaries[slot].copy()
+
+    def _summarised(self, terrains) -> tuple[np.ndarray, np.ndarray]:
+        """the slots and positions of the summarised chunks holding any of terrains"""
+        slots = self.__chunks.occupied()
+        wanted = terrain_bits(terrains)
+        summarised = np.isin(self.__chunks.states[slots], SUMMARISED)
+        slots = slots[summarised & (self.__chunks.flags[slots] & wanted != 0)]
+        return slots, self.__chunks.positions[slots]
+
+    def chunks_with(
+        self,
+        terrains,
+        box: tuple[int, int, int, int] | None = None,
+    ) -> list[tuple[int, int]]:
+        """
+        The positions of the PREVIEW or GENERATED chunks with a cell of
+        any of terrains (CellTypes), inside the chunk box (x0, y0, x1, y1)
+        if one is given. Only the chunk summaries are read
+        """
+        _, positions = self._summarised(terrains)
+        if box is not None:
+            x0, y0, x1, y1 = box
+            x, y = positions[:, 0], positions[:, 1]
+            positions = positions[(x0 <= x) & (x <= x1) & (y0 <= y) & (y <= y1)]
+        return [(int(x), int(y)) for x, y in positions]
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        terrains=LAND,
+        radius: int | None = None,
+    ) -> tuple[int, int] | None:
+        """
+        The world coordinates of the nearest cell of any of terrains among
+        the PREVIEW or GENERATED chunks, None if there is none within radius.
+        Distances are max(|dx|, |dy|), ties go to the smaller dx, then dy.
+        Chunks are visited by their distance and only the ones whose summary
+        has one of terrains; the search ends at the first chunk farther
+        than the best cell found
+        """
+        x, y = int(np.floor(x)), int(np.floor(y))
+        slots, positions = self._summarised(terrains)
+        low = positions * CHUNK_SIZE
+        gap = np.maximum(np.maximum(low - (x, y), (x, y) - (low + CHUNK_SIZE - 1)), 0)
+        distances = gap.max(axis=1)
+        if radius is not None:
+            near = distances <= radius
+            slots, low, distances = slots[near], low[near], distances[near]
+
+        wanted = np.zeros(4, dtype=bool)
+        wanted[list(terrains)] = True
+        best = None
+        for i in np.argsort(distances, kind="stable"):
+            if best is not None and distances[i] > best[0]:
+                break
+            ix, iy = np.nonzero(wanted[self.__chunks.cells[slots[i]] & 0b11])
+            dx, dy = low[i, 0] + ix - x, low[i, 1] + iy - y
+            d = np.maximum(np.abs(dx), np.abs(dy))
+            j = np.lexsort((dy, dx, d))[0]
+            candidate = (int(d[j]), int(dx[j]), int(dy[j]))
+            if radius is not None and candidate[0] > radius:
+                continue
+            if best is None or candidate < best:
+                best = candidate
+        if best is None:
+            return None
+        return x + best[1], y + best[2]
+
+    def close(self, store: bool = True) -> None:
+        """
+        Shuts the worker processes down, closes the store and frees the arena.
+        With store=False the store stays open, for another grid to take it over
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+        if self.__store is not None:
+            if store:
+                self.__store.close()
+            else:
+                self.__store.flush()
+        self.__chunks.close()
+
+    def generate_around(
+        self,
+        pos: tuple[int, int],
+        generated_radius: int,
+        cancelled: Callable[[], bool] | None = None,
+    ) -> None:
+        """
+        Generates the chunks around pos.
+        `cancelled` is checked between the phases of the serial path;
+        when it returns True the remaining phases are skipped
+        """
         if generated_radius <= 1:
             raise ValueError("generated_radius must be at least 2")
 
-        pre_generated_radius = generated_radius + 4
-        noise_radius = pre_generated_radius + 2
+        with self.metrics.timer("generate_around"), counting(self.metrics):
+            pre_generated_radius = generated_radius + 4
+            noise_radius = pre_generated_radius + 2
+
+            self.__centre, self.__working_radius = pos, noise_radius
+
+            self._create_random_chunks(pos, noise_radius)
+            pre_generate = self._eligible(
+                self.__pre_generated, pos, pre_generated_radius, (ChunkStates.NOT_GENERATED,)
+            )
+            if self.__workers > 1:
+                generate = self._eligible(
+                    self.__generated,
+                    pos,
+                    generated_radius,
+                    (ChunkStates.NOT_GENERATED, ChunkStates.PRE_GENERATED),
+                )
+                with self.metrics.timer("parallel", len(pre_generate) + len(generate)):
+                    Scheduler(self, self._executor()).run(pre_generate, generate)
+            elif cancelled is None or not cancelled():
+                self._pre_generate_chunks(pre_generate)
+                generate = self._eligible(
+                    self.__generated, pos, generated_radius, (ChunkStates.PRE_GENERATED,)
+                )
+                if cancelled is None or not cancelled():
+                    self._generate_chunks(generate)
+            else:
+                generate = []
+
+            self.__pre_generated.pending = self._left(pre_generate, ChunkStates.NOT_GENERATED)
+            self.__generated.pending = self._left(generate, ChunkStates.PRE_GENERATED)
+            self._persist(generate)
+            self._evict()
+
+    def generate_chunks(
+        self,
+        positions: list[tuple[int, int]],
+        cancelled: Callable[[], bool] | None = None,
+    ) -> None:
+        """
+        Generates the chunks at positions, an area of any shape.
+        The ring around them is pre-generated and the next ring created,
+        the same chunks generate_around would produce for them.
+        Unlike generate_around it leaves the working area where it is, so
+        it suits work off the player's path such as prefetching. Over a
+        budget, the grid then evicts any chunk but these and the working
+        area. `cancelled` is checked between the phases of the serial path
+        """
+        with counting(self.metrics):
+            pre_generated = around(positions)
+            self._create(around(pre_generated))
 
-        self._create_random_chunks(pos, noise_radius)
-        self._pre_generate_chunks(pos, pre_generated_radius)
-        self._generate_chunks(pos, generated_radius)
+            pre_generate = [
+                (self[pos], pos)
+                for pos in pre_generated
+                if self[pos].state == ChunkStates.NOT_GENERATED
+            ]
+            if self.__workers > 1:
+                generate = [
+                    (self[pos], pos)
+                    for pos in positions
+                    if self[pos].state != ChunkStates.GENERATED
+                ]
+                with self.metrics.timer("parallel", len(pre_generate) + len(generate)):
+                    Scheduler(self, self._executor()).run(pre_generate, generate)
+            else:
+                self._pre_generate_chunks(pre_generate)
+                generate = [
+                    (self[pos], pos)
+                    for pos in positions
+                    if self[pos].state == ChunkStates.PRE_GENERATED
+                ]
+                if cancelled is not None and cancelled():
+                    generate = []
+                self._generate_chunks(generate)
+            self._persist(generate)
+            self._evict(set(positions))
+
+    def focus(
+        self, centre: tuple[int, int], visible: list[tuple[int, int]] | set = ()
+    ) -> None:
+        """refine refines the visible chunks first, then the nearest to centre"""
+        self.__refining.focus(centre, visible)
+
+    def refine(self, count: int = 16) -> list[tuple[int, int]]:
+        """
+        Runs the biome passes up to the next tier for up to count PREVIEW
+        chunks, the most urgent first (see focus). Returns their positions;
+        the ones at the last tier are GENERATED now
+        """
+        items = [(self.__chunks[pos], pos, item) for pos, item in self.__refining.pop(count)]
+        if not items:
+            return []
+        with self.metrics.timer("refine", len(items)), counting(self.metrics):
+            self._persist(self._advance(items))
+        return [pos for _, pos, _ in items]
+
+    def discard(self, positions: list[tuple[int, int]]) -> None:
+        """
+        Drops the chunks at positions without saving them; the next
+        generate_around scans its whole area again
+        """
+        for pos in positions:
+            if pos in self.__chunks:
+                self.__chunks.release(pos)
+                self.__refining.discard(pos)
+        for frontier in (self.__created, self.__pre_generated, self.__generated):
+            frontier.forget()
+
+    def _eligible(
+        self,
+        frontier: Frontier,
+        pos: tuple[int, int],
+        radius: int,
+        states: tuple[ChunkStates, ...],
+    ) -> list[tuple[Chunk, tuple[int, int]]]:
+        """the chunks of the phase's frontier that are in one of states"""
+        eligible = []
+        for pos in frontier.advance(pos, radius):
+            chunk = self[pos]
+            if chunk.state in states:
+                eligible.append((chunk, pos))
+        return eligible
+
+    @staticmethod
+    def _left(
+        chunks: list[tuple[Chunk, tuple[int, int]]], state: ChunkStates
+    ) -> set[tuple[int, int]]:
+        """the positions a phase did not get to, because it was cancelled or skipped"""
+        return {pos for chunk, pos in chunks if chunk.state == state}
+
+    def _persist(self, chunks: list[tuple[Chunk, tuple[int, int]]]) -> None:
+        """queues the chunks generated by this call that the store does not have yet"""
+        if self.__store is None:
+            return
+        for chunk, pos in chunks:
+            if chunk.state == ChunkStates.GENERATED and pos not in self.__store:
+                self.__store.save(pos, chunk.cells, chunk.state)
+
+    def _executor(self) -> "ProcessPoolExecutor":
+        if self.__executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.__executor = ProcessPoolExecutor(self.__workers)
+        return self.__executor
 
     def _create_random_chunks(self, pos: tuple[int, int], radius: int):
-        for chunk, pos in self._get_chunks_in_radius(pos, radius):
-            if chunk is NoneChunk():
-                self.__chunks[pos] = Chunk(self.__density)
-
-    def _pre_generate_chunks(self, pos: tuple[int, int], radius: int):
-        for chunk, pos in self._get_chunks_in_radius(pos, radius):
-            if chunk.state.value == ChunkStates.NOT_GENERATED.value:
-                chunk.pre_generate_self(self, pos)
-
-    def _generate_chunks(self, pos: tuple[int, int], radius: int):
-        for chunk, pos in self._get_chunks_in_radius(pos, radius):
-            if chunk.state.value == ChunkStates.PRE_GENERATED.value:
-                chunk.generate_self(self, pos)
+        """fills the newly exposed ring of the noise diamond"""
+        self._create(self.__created.advance(pos, radius))
+
+    def _create(self, positions: list[tuple[int, int]]) -> None:
+        """creates or loads the missing chunks at positions"""
+        with self.metrics.timer("create") as timer:
+            created = 0
+            for pos in positions:
+                if pos not in self.__chunks and not self._load(pos):
+                    self.__chunks.create(pos)
+                    created += 1
+            timer.count = created
+
+    def _load(self, pos: tuple[int, int]) -> Chunk | None:
+        """puts the chunk at pos back from the store, if it was spilled there"""
+        if self.__store is None:
+            return None
+        saved = self.__store.load(pos)
+        if saved is None:
+            return None
+
+        self.__loads += 1
+        chunk = self.__chunks.allocate(pos)
+        chunk.cells, chunk.state = saved
+        return chunk
 
-    def _get_chunks_in_radius(
-        self, pos: tuple[int, int], radius: int
-    ) -> Generator[tuple[Chunk, tuple[int, int]]]:
-        """get chunks in radius (diamond shape)"""
+    def _in_working_area(self, pos: tuple[int, int]) -> bool:
         x, y = pos
+        cx, cy = self.__centre
+        return abs(x - cx) + abs(y - cy) < self.__working_radius
+
+    def _release(self, pos: tuple[int, int]) -> bool:
+        """
+        Makes the chunk at pos safe to evict.
+
+        A chunk outside the working area may go once no PRE_GENERATED
+        neighbour needs it as padding: PRE_GENERATED neighbours outside
+        the working area are reset to NOT_GENERATED (the seed rebuilds them
+        exactly), the ones inside it keep the chunk alive
+        """
+        if self._in_working_area(pos):
+            return False
+
+        x, y = pos
+        needing = []
+        for dx, dy in NEIGHBOURS:
+            neighbour = self.__chunks.get((x + dx, y + dy))
+            if neighbour is None or neighbour.state != ChunkStates.PRE_GENERATED:
+                continue
+            if self._in_working_area((x + dx, y + dy)):
+                return False
+            needing.append(neighbour)
+
+        for neighbour in needing:
+            neighbour.reset()
+        return True
+
+    def _evict(self, keep: set[tuple[int, int]] = frozenset()) -> None:
+        """drops chunks until the grid fits its budget, never the ones in keep"""
+        if self.__max_chunks is None:
+            return
+        excess = len(self.__chunks) - self.__max_chunks
+        if excess <= 0:
+            return
+
+        slots = self.__chunks.occupied()
+        if self.__eviction == "lru":
+            order = np.argsort(self.__chunks.last_used[slots], kind="stable")
+        else:
+            cx, cy = self.__centre
+            positions = self.__chunks.positions[slots]
+            distance = np.abs(positions[:, 0] - cx) + np.abs(positions[:, 1] - cy)
+            order = np.argsort(-distance, kind="stable")
+        candidates = [
+            (int(x), int(y)) for x, y in self.__chunks.positions[slots[order]]
+        ]
+
+        for pos in candidates:
+            if excess == 0:
+                break
+            if pos in keep or not self._release(pos):
+                continue
+
+            chunk = self.__chunks.release(pos)
+            self.__refining.discard(pos)
+            if (
+                self.__store is not None
+                and chunk.state == ChunkStates.GENERATED
+                and pos not in self.__store
+            ):
+                self.__store.save(pos, chunk.cells, chunk.state)
+                self.__spills += 1
+            self.__evictions += 1
+            excess -= 1
+
+    def _pre_generate_chunks(self, chunks: list[tuple[Chunk, tuple[int, int]]]):
+        if not chunks:
+            return
+        with self.metrics.timer("pre_generate", len(chunks)):
+            if self.__mode == "batch":
+                self._pre_generate_batch(chunks)
+            elif self.__mode == "region":
+                Region(self, chunks, halo=1).pre_generate()
+            else:
+                for chunk, pos in chunks:
+                    chunk.pre_generate_self(self, pos)
+
+    def _generate_chunks(self, chunks: list[tuple[Chunk, tuple[int, int]]]):
+        if not chunks:
+            return
+        if len(self.__tiers) > 1:
+            self._preview(chunks)
+        elif self.__mode == "batch":
+            self._generate_batch(chunks)
+        elif self.__mode == "region":
+            Region(self, chunks, halo=2).generate()
+        else:
+            for chunk, pos in chunks:
+                chunk.generate_self(self, pos)
+
+    def _gather(
+        self, chunks: list[tuple[Chunk, tuple[int, int]]], border: int
+    ) -> np.ndarray:
+        """stacks the padded cells of chunks into one (N, h, w) array"""
+        with self.metrics.timer("gather", len(chunks)):
+            return self.__chunks.gather([pos for _, pos in chunks], border)
+
+    def _pre_generate_batch(self, chunks: list[tuple[Chunk, tuple[int, int]]]):
+        """pre-generates the chunks in one stack"""
+        engine = get_engine(self.__engine)
+        result = engine.pre_generate_chunk(self._gather(chunks, 1))
+        for (chunk, _), cells in zip(chunks, result):
+            chunk.cells = cells
+            chunk.state = ChunkStates.PRE_GENERATED
+
+    def _preview(self, chunks: list[tuple[Chunk, tuple[int, int]]]):
+        """generates the chunks up to the first tier, in one stack in both modes"""
+        engine = get_engine(self.__engine)
+        padded = self._gather(chunks, 2)
+        rngs = [chunk.rng(Phases.BIOME) for chunk, _ in chunks]
+        with self.metrics.timer("biome", len(chunks)):
+            fields = engine.biome_noise(padded, rngs)
+        self._advance(
+            [
+                (chunk, pos, Refinement(field, rng))
+                for (chunk, pos), field, rng in zip(chunks, fields, rngs)
+            ]
+        )
+
+    def _advance(
+        self, items: list[tuple[Chunk, tuple[int, int], Refinement]]
+    ) -> list[tuple[Chunk, tuple[int, int]]]:
+        """
+        Runs the passes up to the next tier; chunks at the last tier become
+        GENERATED and are returned, the others PREVIEW and go back to the queue
+        """
+        engine = get_engine(self.__engine)
+        by_passes: dict[int, list[tuple[Chunk, tuple[int, int], Refinement]]] = dict()
+        for item in items:
+            by_passes.setdefault(item[2].passes, []).append(item)
+
+        generated = []
+        for passes, group in by_passes.items():
+            tier = next(tier for tier in self.__tiers if tier > passes)
+            fields = np.stack([item.field for _, _, item in group])
+            with self.metrics.timer("biome", len(group)):
+                engine.biome_passes(fields, [item.rng for _, _, item in group], tier - passes)
+            with self.metrics.timer("textures", len(group)):
+                result = engine.textures(
+                    fields[:, 2:-2, 2:-2],
+                    TEXTURE_DENSITY,
+                    [chunk.rng(Phases.TEXTURES) for chunk, _, _ in group],
+                )
 
-        for i in range(1, radius):
-            for j in range(-radius + i + 1, radius - i):
-                yield self[x - i, y + j], (x - i, y + j)
+            for (chunk, pos, item), field, cells in zip(group, fields, result):
+                chunk.cells = cells
+                if tier == BIOME_ITERATIONS:
+                    chunk.state = ChunkStates.GENERATED
+                    generated.append((chunk, pos))
+                else:
+                    item.field, item.passes = field, tier
+                    chunk.state = ChunkStates.PREVIEW
+                    self.__refining.push(pos, item)
+        return generated
 
-        for i in range(radius):
-            for j in range(-radius + i + 1, radius - i):
-                yield self[x + i, y + j], (x + i, y + j)
+    def _generate_batch(self, chunks: list[tuple[Chunk, tuple[int, int]]]):
+        """generates the chunks in one stack"""
+        engine = get_engine(self.__engine)
+        padded = self._gather(chunks, 2)
+        with self.metrics.timer("biome", len(chunks)):
+            result = engine.generate_chunk_biome(
+                padded, [chunk.rng(Phases.BIOME) for chunk, _ in chunks]
+            )
+        with self.metrics.timer("textures", len(chunks)):
+            result = engine.textures(
+                result, TEXTURE_DENSITY, [chunk.rng(Phases.TEXTURES) for chunk, _ in chunks]
+            )
+        for (chunk, _), cells in zip(chunks, result):
+            chunk.cells = cells
+            chunk.state = ChunkStates.GENERATED
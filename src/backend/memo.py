@@ -0,0 +1,153 @@
+"""
+Memoised terrain automaton.
+
+`evolve` is a totalistic 3x3 rule over three cell values (0, 2, 3), so one
+step of a 4x4 block is fully determined by the block: it maps to the 2x2
+block at its centre. This engine tiles the field with such blocks, encodes
+each as a base-3 number and looks the step up in a bounded transition cache;
+only the blocks never seen before are computed from the rule.
+
+Hashlife goes further and stores multi-step results of bigger blocks.
+That relies on the rule being the same everywhere, but pre-generation holds
+the padding (and Region the frozen cells) fixed on every pass, so a block's
+future also depends on where the fixed cells are. Only the one-step level
+is exact here.
+
+This is a slow path: the int8 box filter of evolution.evolve recomputes a
+pass faster than the lookups take, so the "memo" engine is kept to compare
+against and for the benchmarks. The cache is shared by the threads of a
+process and locked around every lookup.
+"""
+
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .cells import CELL_LUT
+
+"""base-3 digit of the cell values 0, 2 and 3 by their byte, 255 for any other value"""
+TRITS = np.full(256, 255, dtype=np.uint8)
+TRITS[[0, 2, 3]] = [0, 1, 2]
+VALUES = np.array([0, 2, 3], dtype=np.int8)
+
+POWERS = (3 ** np.arange(16, dtype=np.int64)).reshape(4, 4)
+"""a 2x2 result is stored as a base-3 code below RESULTS"""
+RESULTS = 81
+RESULT_POWERS = np.array([[1, 3], [9, 27]], dtype=np.int64)
+
+"""the 2x2 cells of every result code"""
+DECODE = VALUES[(np.arange(RESULTS)[:, None] // 3 ** np.arange(4)) % 3].reshape(RESULTS, 2, 2)
+
+CAPACITY = 1 << 20
+EMPTY = -1
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    capacity: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def step(windows: np.ndarray) -> np.ndarray:
+    """the result codes of (M, 4, 4) blocks of digits after one step of the rule"""
+    windows = VALUES[windows]
+    codes = np.zeros(len(windows), dtype=np.int64)
+    for a in range(2):
+        for b in range(2):
+            sums = windows[:, a : a + 3, b : b + 3].sum(axis=(1, 2), dtype=np.int64)
+            codes += RESULT_POWERS[a, b] * TRITS[CELL_LUT[sums]]
+    return codes
+
+
+class TransitionCache:
+    """
+    A direct-mapped table from 4x4 blocks to their 2x2 result.
+    Every entry packs the block key and the result code into one int64,
+    so a lookup is one gather and a colliding block simply replaces the old one.
+    Lookups, stats and clear hold one lock
+    """
+
+    def __init__(self, capacity: int = CAPACITY) -> None:
+        if capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self.__table = np.full(capacity, EMPTY, dtype=np.int64)
+        self.__hits = self.__misses = self.__evictions = 0
+        self.__lock = threading.Lock()
+
+    def _slots(self, keys: np.ndarray) -> np.ndarray:
+        # Fibonacci hashing, the low bits of the keys repeat a lot
+        return ((keys * 0x9E3779B1) >> 7) & (self.capacity - 1)
+
+    def lookup(self, keys: np.ndarray, windows: np.ndarray) -> np.ndarray:
+        """
+        The result codes of the blocks of digits with the given keys,
+        computing and storing the missing ones
+        """
+        slots = self._slots(keys)
+        with self.__lock:
+            entries = self.__table[slots]
+            codes = entries % RESULTS
+            miss = entries // RESULTS != keys
+
+            missing = int(np.count_nonzero(miss))
+            self.__hits += len(keys) - missing
+            self.__misses += missing
+            if missing:
+                codes[miss] = step(windows[miss])
+                replaced = entries[miss] != EMPTY
+                self.__evictions += int(np.count_nonzero(replaced))
+                self.__table[slots[miss]] = keys[miss] * RESULTS + codes[miss]
+        return codes
+
+    def stats(self) -> CacheStats:
+        with self.__lock:
+            return CacheStats(
+                self.__hits,
+                self.__misses,
+                self.__evictions,
+                int(np.count_nonzero(self.__table != EMPTY)),
+                self.capacity,
+            )
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__table.fill(EMPTY)
+            self.__hits = self.__misses = self.__evictions = 0
+
+
+"""shared by every call, repeated blocks of different chunks hit it too"""
+CACHE = TransitionCache()
+
+
+def evolve(bigger_chunk: np.ndarray, cache: TransitionCache = CACHE) -> None:
+    """
+    The same as evolution.evolve, one step of a chunk or of a (N, h, w) stack,
+    resolved through the transition cache
+    """
+    *lead, height, width = bigger_chunk.shape
+    inner_h, inner_w = height - 2, width - 2
+    # odd sides get a dummy row or column whose results are dropped
+    padded_h, padded_w = inner_h + inner_h % 2, inner_w + inner_w % 2
+    trits = np.zeros((*lead, padded_h + 2, padded_w + 2), dtype=np.uint8)
+    trits[..., :height, :width] = TRITS[bigger_chunk.view(np.uint8)]
+    if (trits == 255).any():
+        raise ValueError("terrain cells must be 0, 2 or 3")
+
+    windows = sliding_window_view(trits, (4, 4), axis=(-2, -1))[..., ::2, ::2, :, :]
+    blocks = windows.shape[:-2]
+    windows = windows.reshape(-1, 4, 4)
+    keys = np.tensordot(windows, POWERS, axes=2)
+
+    cells = DECODE[cache.lookup(keys, windows)].reshape(*blocks, 2, 2)
+    cells = np.moveaxis(cells, -2, -3).reshape(*lead, padded_h, padded_w)
+    bigger_chunk[..., 1:-1, 1:-1] = cells[..., :inner_h, :inner_w]
@@ -0,0 +1,174 @@
+"""
+Wall time and counts of the phases of the generation pipeline.
+
+A `Metrics` is disabled by default; while disabled, `timer` returns one
+shared no-op context manager, so the hooks can stay in the hot paths.
+`timed` is the same hook as a decorator. Only the names in PHASES are
+recorded, anything else is a typo and raises ValueError. Every
+phase keeps the number of calls, the number of chunks they handled, the
+total, minimum and maximum wall time and a histogram of call times in
+power-of-two microsecond buckets. The work the adaptive kernels did and
+skipped is counted whether or not the metrics are enabled.
+"""
+
+import functools
+import math
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+"""
+the phases recorded by Grid; gather is part of pre_generate and biome,
+all of them are part of generate_around
+"""
+PHASES = (
+    "create", "gather", "pre_generate", "biome", "textures", "parallel", "refine",
+    "generate_around",
+)
+
+
+class PhaseStats(NamedTuple):
+    calls: int
+    count: int
+    total: float
+    min: float
+    max: float
+    """calls per bucket, bucket b holds times up to 2**b microseconds"""
+    histogram: dict[int, int]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+class Savings(NamedTuple):
+    """work done and skipped by the adaptive mode since the last reset"""
+
+    terrain_passes: int
+    terrain_skipped: int
+    biome_updates: int
+    biome_skipped: int
+
+
+def bucket(seconds: float) -> int:
+    """the histogram bucket of a duration"""
+    if seconds <= 1e-6:
+        return 0
+    return math.frexp(seconds * 1e6)[1]
+
+
+class _Phase:
+    __slots__ = ("calls", "count", "total", "min", "max", "histogram")
+
+    def __init__(self) -> None:
+        self.calls = self.count = 0
+        self.total = self.max = 0.0
+        self.min = math.inf
+        self.histogram: dict[int, int] = dict()
+
+    def add(self, seconds: float, count: int) -> None:
+        self.calls += 1
+        self.count += count
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        b = bucket(seconds)
+        self.histogram[b] = self.histogram.get(b, 0) + 1
+
+    def stats(self) -> PhaseStats:
+        return PhaseStats(
+            self.calls,
+            self.count,
+            self.total,
+            self.min if self.calls else 0.0,
+            self.max,
+            dict(sorted(self.histogram.items())),
+        )
+
+
+class _Disabled:
+    """the timer of a disabled Metrics, `count` may be set and is ignored"""
+
+    __slots__ = ("count",)
+
+    def __enter__(self) -> "_Disabled":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_DISABLED = _Disabled()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "count", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, count: int) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.count = count
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.record(self.name, time.perf_counter() - self.start, self.count)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.__phases: dict[str, _Phase] = dict()
+        self.__savings = [0, 0, 0, 0]
+
+    def timer(self, name: str, count: int = 1):
+        """
+        A context manager timing one call of the phase `name`
+        that handled `count` chunks; the count can also be set on the
+        object it returns once it is known
+        """
+        if not self.enabled:
+            return _DISABLED
+        return _Timer(self, name, count)
+
+    def timed(self, name: str, count: int = 1) -> Callable[[Callable], Callable]:
+        """a decorator timing every call of the function as one call of `name`"""
+
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, count):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, name: str, seconds: float, count: int = 1) -> None:
+        phase = self.__phases.get(name)
+        if phase is None:
+            if name not in PHASES:
+                raise ValueError(f"unknown phase {name!r}, expected one of {PHASES}")
+            phase = self.__phases[name] = _Phase()
+        phase.add(seconds, count)
+
+    def count(
+        self, terrain_passes: int, terrain_skipped: int, updates: int, skipped: int
+    ) -> None:
+        """adds the work of one kernel call to the savings"""
+        self.__savings[0] += terrain_passes
+        self.__savings[1] += terrain_skipped
+        self.__savings[2] += updates
+        self.__savings[3] += skipped
+
+    def savings(self) -> Savings:
+        return Savings(*self.__savings)
+
+    def snapshot(self) -> dict[str, PhaseStats]:
+        return {name: phase.stats() for name, phase in self.__phases.items()}
+
+    def reset(self) -> None:
+        self.__phases.clear()
+        self.__savings[:] = [0, 0, 0, 0]
@@ -0,0 +1,208 @@
+"""
+numba-compiled versions of the evolution kernels.
+
+Each function fuses all of its passes into one compiled call and takes the
+chunk's np.random.Generator explicitly. Compiled code is cached on disk
+(cache=True), so only the very first run on a machine pays for the JIT;
+`python -m src.backend.warmup` pays it ahead of time, and
+evolution.set_kernel_cache moves the cache out of the package.
+"""
+
+import numpy as np
+from numba import njit, types
+from numba.extending import intrinsic
+
+from .cells import CELL_LUT
+
+
+@njit(cache=True)
+def evolve(bigger_chunk: np.ndarray) -> bool:
+    """
+    Generates terrain, one 3x3 pass; returns whether any cell changed
+    """
+    height, width = bigger_chunk.shape
+    sums = np.empty((height - 2, width - 2), dtype=np.int8)
+    for i in range(height - 2):
+        for j in range(width - 2):
+            total = 0
+            for k in range(3):
+                for m in range(3):
+                    total += bigger_chunk[i + k, j + m]
+            sums[i, j] = total
+    changed = False
+    for i in range(height - 2):
+        for j in range(width - 2):
+            cell = CELL_LUT[sums[i, j]]
+            if cell != bigger_chunk[i + 1, j + 1]:
+                bigger_chunk[i + 1, j + 1] = cell
+                changed = True
+    return changed
+
+
+@njit(cache=True)
+def pre_generate_chunk(
+    bigger_chunk: np.ndarray, iterations: int, adaptive: bool
+) -> tuple[np.ndarray, int]:
+    """
+    Runs evolve a number of times, or until the terrain stops changing
+    when adaptive; returns the cells and the number of passes run
+    """
+    for done in range(iterations):
+        if not evolve(bigger_chunk) and adaptive:
+            return bigger_chunk[1:-1, 1:-1], done + 1
+    return bigger_chunk[1:-1, 1:-1], iterations
+
+
+@njit(cache=True)
+def biome_evolve(
+    bigger_chunk: np.ndarray,
+    kernel: np.ndarray,
+    rng: np.random.Generator,
+    active: np.ndarray,
+    settled: np.ndarray,
+    changed: np.ndarray,
+) -> int:
+    """
+    Convolution-like generation for biome, one pass.
+
+    Cells outside `active` keep their biome and only consume their draw.
+    `settled` marks the cells whose same-terrain neighbours all have the
+    cell's biome (their only possible outcome) and `changed` the cells that
+    got a new biome. Returns the number of cells computed
+    """
+    height, width = bigger_chunk.shape[0] - 4, bigger_chunk.shape[1] - 4
+    result = np.empty((height, width), dtype=np.int8)
+    value = np.empty(4, dtype=np.float32)
+    computed = 0
+    for i in range(height):
+        for j in range(width):
+            centre = bigger_chunk[i + 2, j + 2]
+            terrain = centre & 0b11
+            own_biome = (centre >> 2) & 0b11
+            if not active[i, j]:
+                rng.random()
+                result[i, j] = (own_biome << 2) | terrain
+                continue
+
+            computed += 1
+            value[:] = 0
+            for k in range(5):
+                for m in range(5):
+                    cell = bigger_chunk[i + k, j + m]
+                    if cell & 0b11 == terrain:
+                        value[(cell >> 2) & 0b11] += kernel[k, m]
+                    else:
+                        value[own_biome] += kernel[k, m]
+
+            settled[i, j] = True
+            for other in range(4):
+                if other != own_biome and value[other] != 0:
+                    settled[i, j] = False
+            draw = rng.random() * value.sum()
+            biome = 0
+            cumulative = value[0]
+            while biome < 3 and cumulative <= draw:
+                biome += 1
+                cumulative += value[biome]
+            result[i, j] = (biome << 2) | terrain
+
+    for i in range(height):
+        for j in range(width):
+            changed[i, j] = result[i, j] != bigger_chunk[i + 2, j + 2]
+            bigger_chunk[i + 2, j + 2] = result[i, j]
+    return computed
+
+
+@njit(cache=True)
+def biome_noise(bigger_chunk: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """the padded terrain with a random biome in every cell"""
+    height, width = bigger_chunk.shape
+    working = np.empty((height, width), dtype=np.int8)
+    for i in range(height):
+        for j in range(width):
+            working[i, j] = (rng.integers(0, 4) << 2) | bigger_chunk[i, j]
+    return working
+
+
+@njit(cache=True)
+def biome_passes(
+    working: np.ndarray,
+    kernel: np.ndarray,
+    iterations: int,
+    rng: np.random.Generator,
+    adaptive: bool,
+) -> int:
+    """
+    Runs biome passes over working in place; returns the number of cell updates.
+
+    When adaptive, a pass only computes the cells that were not settled
+    or had a cell of their 5x5 window changed by the previous pass;
+    the others can not change, so the result is the same. The first pass
+    computes every cell, so passes split over several calls match one call
+    """
+    height, width = working.shape
+    inner = (height - 4, width - 4)
+    active = np.ones(inner, dtype=np.bool_)
+    settled = np.zeros(inner, dtype=np.bool_)
+    changed = np.zeros(inner, dtype=np.bool_)
+    computed = 0
+    for _ in range(iterations):
+        computed += biome_evolve(working, kernel, rng, active, settled, changed)
+        if not adaptive:
+            continue
+        for i in range(inner[0]):
+            for j in range(inner[1]):
+                active[i, j] = not settled[i, j]
+        for i in range(inner[0]):
+            for j in range(inner[1]):
+                if changed[i, j]:
+                    active[max(i - 2, 0) : i + 3, max(j - 2, 0) : j + 3] = True
+    return computed
+
+
+@njit(cache=True)
+def generate_chunk_biome(
+    bigger_chunk: np.ndarray,
+    kernel: np.ndarray,
+    iterations: int,
+    rng: np.random.Generator,
+    adaptive: bool,
+) -> tuple[np.ndarray, int]:
+    """Generates chunk biome; returns the cells and the number of cell updates"""
+    working = biome_noise(bigger_chunk, rng)
+    computed = biome_passes(working, kernel, iterations, rng, adaptive)
+    return working[2:-2, 2:-2], computed
+
+
+@njit(cache=True)
+def textures(
+    chunk: np.ndarray, density: float, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Adds textures
+    """
+    height, width = chunk.shape
+    result = chunk.copy()
+    for i in range(height):
+        for j in range(width):
+            if rng.random() < density:
+                result[i, j] |= rng.integers(1, 4) << 4
+    return result
+
+
+@intrinsic
+def _fence(typingctx):
+    def codegen(context, builder, signature, args):
+        builder.fence("seq_cst")
+        return context.get_dummy_value()
+
+    return types.none(), codegen
+
+
+@njit(cache=True)
+def fence() -> None:
+    """
+    A full memory fence: the loads and stores before it become visible
+    before the ones after it, also on weakly ordered CPUs (see shared.py)
+    """
+    _fence()
@@ -0,0 +1,167 @@
+"""
+Parallel generation on a process pool.
+
+Workers never see Grid or Chunk objects: a work item is the chunk's padded
+int8 cells (its own cells plus the edge strips of its neighbours), the name
+of the engine and, for the biome phase, the world seed and chunk position
+its generators are derived from. When the grid keeps its chunks in a
+SharedChunkArena, the generation workers write the cells straight into the
+chunk's slot instead of sending them back. Pre-generated cells are always
+sent back: until the chunk is PRE_GENERATED its slot holds the initial
+cells its neighbours are padded with. Generation keeps the terrain bits,
+the only ones its neighbours read.
+
+concurrent.futures and the shared arena are only imported once they are
+used, so importing the grid does not load multiprocessing.
+"""
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .chunk import Chunk, ChunkStates, Phases, chunk_rng
+from .evolution import TEXTURE_DENSITY, counting, get_engine
+from .metrics import Metrics, Savings
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+    from .grid import Grid
+
+NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+EXISTING = (ChunkStates.NOT_GENERATED, ChunkStates.PRE_GENERATED, ChunkStates.GENERATED)
+PADDING_READY = (ChunkStates.PRE_GENERATED, ChunkStates.GENERATED)
+
+
+def pre_generate_work(padded: np.ndarray, engine: str) -> np.ndarray:
+    """pre-generates one chunk from its (18, 18) padded cells"""
+    return get_engine(engine).pre_generate_chunk(padded).copy()
+
+
+def generate_work(
+    padded: np.ndarray,
+    engine: str,
+    seed: int,
+    pos: tuple[int, int],
+    texture_density: float = TEXTURE_DENSITY,
+) -> np.ndarray:
+    """generates one chunk from its (20, 20) padded cells"""
+    kernels = get_engine(engine)
+    cells = kernels.generate_chunk_biome(padded, chunk_rng(seed, pos, Phases.BIOME))
+    rng = chunk_rng(seed, pos, Phases.TEXTURES)
+    return kernels.textures(cells, texture_density, rng)
+
+
+def shared_work(name: str, slot: int, work: Callable[..., np.ndarray], *args) -> None:
+    """runs work and writes its cells into the slot of the shared arena `name`"""
+    from .shared import attached
+
+    attached(name).write_cells(slot, work(*args))
+
+
+def counted_work(
+    work: Callable[..., np.ndarray | None], *args
+) -> tuple[np.ndarray | None, Savings]:
+    """runs work and returns its result with the work its kernels did and skipped"""
+    with counting(Metrics()) as metrics:
+        result = work(*args)
+    return result, metrics.savings()
+
+
+class Scheduler:
+    """
+    Runs pre-generation and generation of an area on an executor.
+
+    A chunk is pre-generated as soon as its 8 neighbours exist and generated
+    as soon as its 8 neighbours are pre-generated, so both phases overlap
+    and there is no barrier between them.
+    """
+
+    def __init__(self, grid: "Grid", executor: "Executor") -> None:
+        self.grid = grid
+        self.executor = executor
+        self.running: dict["Future", tuple[Chunk, tuple[int, int], ChunkStates]] = {}
+        self.waiting: dict[tuple[int, int], Chunk] = {}
+
+    def run(
+        self,
+        pre_generate: list[tuple[Chunk, tuple[int, int]]],
+        generate: list[tuple[Chunk, tuple[int, int]]],
+    ) -> None:
+        """
+        Pre-generates the first list of chunks and generates the second one
+        (which may contain chunks of the first list)
+        """
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        for chunk, pos in pre_generate:
+            if self._neighbours_in(pos, EXISTING):
+                self._submit_pre_generation(chunk, pos)
+
+        self.waiting = {pos: chunk for chunk, pos in generate}
+        for pos in list(self.waiting):
+            self._try_generate(pos)
+
+        while self.running:
+            done, _ = wait(self.running, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk, pos, state = self.running.pop(future)
+                cells, savings = future.result()
+                self.grid.metrics.count(*savings)
+                if cells is not None:
+                    chunk.cells = cells
+                chunk.state = state
+                if state == ChunkStates.GENERATED:
+                    continue
+
+                x, y = pos
+                for dx, dy in [(0, 0), *NEIGHBOURS]:
+                    self._try_generate((x + dx, y + dy))
+
+    def _neighbours_in(
+        self, pos: tuple[int, int], states: tuple[ChunkStates, ...]
+    ) -> bool:
+        x, y = pos
+        return all(self.grid[x + dx, y + dy].state in states for dx, dy in NEIGHBOURS)
+
+    def _submit_pre_generation(self, chunk: Chunk, pos: tuple[int, int]) -> None:
+        padded = chunk.padded(self.grid, pos, 1)
+        self._submit(
+            chunk, pos, ChunkStates.PRE_GENERATED,
+            pre_generate_work, padded, chunk.engine.name,
+        )
+
+    def _try_generate(self, pos: tuple[int, int]) -> None:
+        chunk = self.waiting.get(pos)
+        if chunk is None or chunk.state != ChunkStates.PRE_GENERATED:
+            return
+        if not self._neighbours_in(pos, PADDING_READY):
+            return
+
+        del self.waiting[pos]
+        padded = chunk.padded(self.grid, pos, 2)
+        self._submit(
+            chunk, pos, ChunkStates.GENERATED,
+            generate_work, padded, chunk.engine.name, chunk.seed, pos,
+        )
+
+    def _submit(
+        self,
+        chunk: Chunk,
+        pos: tuple[int, int],
+        state: ChunkStates,
+        work: Callable[..., np.ndarray],
+        *args,
+    ) -> None:
+        """runs work on the executor, the chunk takes state once it is done"""
+        from .shared import SharedChunkArena
+
+        if state == ChunkStates.GENERATED and isinstance(chunk.arena, SharedChunkArena):
+            future = self.executor.submit(
+                counted_work, shared_work, chunk.arena.name, chunk.slot, work, *args
+            )
+        else:
+            future = self.executor.submit(counted_work, work, *args)
+        self.running[future] = (chunk, pos, state)
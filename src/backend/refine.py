@@ -0,0 +1,91 @@
+"""
+Progressive refinement of the biome phase.
+
+With preview tiers, e.g. (8, 30), a grid first runs only 8 of the
+BIOME_ITERATIONS biome passes of a chunk and makes it PREVIEW: its final
+terrain and textures with a rough biome, ready to be shown. The padded
+field and the BIOME generator of the chunk are kept in a RefineQueue, and
+every later refinement step runs the passes up to the next tier (30, then
+all of them) on that field with that same generator.
+
+The passes of a chunk only read its own padded field and only draw from its
+own generator, so stopping between two passes changes nothing: a refined
+chunk is identical to one generated in a single call.
+"""
+
+import heapq
+from collections.abc import Iterable
+
+import numpy as np
+
+
+class Refinement:
+    """the padded field of a PREVIEW chunk, its BIOME generator and the passes run"""
+
+    __slots__ = ("field", "rng", "passes")
+
+    def __init__(self, field: np.ndarray, rng: np.random.Generator, passes: int = 0) -> None:
+        self.field = field
+        self.rng = rng
+        self.passes = passes
+
+
+class RefineQueue:
+    """
+    The chunks waiting for their next tier, by priority: visible chunks
+    first, then the ones with the fewest passes, then the nearest to the
+    centre of the focus (manhattan distance in chunks)
+    """
+
+    def __init__(self) -> None:
+        self.__items: dict[tuple[int, int], Refinement] = dict()
+        self.__heap: list[tuple[bool, int, int, tuple[int, int]]] = []
+        self.__centre: tuple[int, int] = (0, 0)
+        self.__visible: frozenset[tuple[int, int]] = frozenset()
+
+    def _key(
+        self, pos: tuple[int, int], refinement: Refinement
+    ) -> tuple[bool, int, int, tuple[int, int]]:
+        distance = abs(pos[0] - self.__centre[0]) + abs(pos[1] - self.__centre[1])
+        return pos not in self.__visible, refinement.passes, distance, pos
+
+    def push(self, pos: tuple[int, int], refinement: Refinement) -> None:
+        self.__items[pos] = refinement
+        heapq.heappush(self.__heap, self._key(pos, refinement))
+
+    def focus(
+        self, centre: tuple[int, int], visible: Iterable[tuple[int, int]] = ()
+    ) -> None:
+        """reorders the queue for a new centre and set of visible chunks"""
+        self.__centre = centre
+        self.__visible = frozenset(visible)
+        self.__heap = [self._key(pos, item) for pos, item in self.__items.items()]
+        heapq.heapify(self.__heap)
+
+    def pop(self, count: int) -> list[tuple[tuple[int, int], Refinement]]:
+        """takes up to count chunks off the queue, most urgent first"""
+        popped = []
+        while self.__heap and len(popped) < count:
+            _, passes, _, pos = heapq.heappop(self.__heap)
+            item = self.__items.get(pos)
+            # entries of discarded or already advanced chunks are left behind
+            if item is None or item.passes != passes:
+                continue
+            popped.append((pos, self.__items.pop(pos)))
+        return popped
+
+    def get(self, pos: tuple[int, int]) -> Refinement | None:
+        return self.__items.get(pos)
+
+    def discard(self, pos: tuple[int, int]) -> None:
+        self.__items.pop(pos, None)
+
+    def clear(self) -> None:
+        self.__items.clear()
+        self.__heap.clear()
+
+    def __contains__(self, pos: tuple[int, int]) -> bool:
+        return pos in self.__items
+
+    def __len__(self) -> int:
+        return len(self.__items)
@@ -0,0 +1,314 @@
+"""
+On-disk chunk store made of fixed-size, memory-mapped region files.
+
+A region file holds REGION_SIZE x REGION_SIZE chunks:
+
+    page 0      header (magic, region size, chunk size) and a uint8 state per chunk
+    page 1      a uint32 crc32 of the cells per chunk
+    page 2..    the cells, (REGION_SIZE, REGION_SIZE, CHUNK_SIZE, CHUNK_SIZE) int8
+
+Loading a chunk returns a read-only view into the map, saving one writes
+its 256 bytes of cells and its index entry. Saves are queued and written
+in batches by a background thread; a batch first clears the index entries
+it overwrites, then writes the cells and only then sets the new entries,
+syncing in between, so a crash can lose a chunk but never expose half
+written cells.
+
+The directory also holds world.json, the Grid.world() of its chunks (seed,
+density, engine, mode), written when a grid first binds the store; a grid
+of another world is refused.
+
+Usage:
+    python -m src.backend.region_store verify <directory>
+    python -m src.backend.region_store compact <directory>
+"""
+
+import argparse
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from .chunk import CHUNK_SIZE, STATE_CODES, ChunkStates
+from .store import ChunkStore, mismatch
+
+REGION_SIZE = 32
+MAGIC = b"TGREGN01"
+PAGE = 4096
+
+STATES_OFFSET = 16
+CHECKSUMS_OFFSET = PAGE
+CELLS_OFFSET = 2 * PAGE
+FILE_SIZE = CELLS_OFFSET + REGION_SIZE * REGION_SIZE * CHUNK_SIZE * CHUNK_SIZE
+WORLD = "world.json"
+
+"""state codes in the index, 0 means the slot is empty"""
+EMPTY = 0
+CODE_STATES = {code: state for state, code in STATE_CODES.items()}
+
+
+def checksum(cells: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(cells, dtype=np.int8).tobytes())
+
+
+def sync_directory(directory: Path) -> None:
+    """makes the renames into directory durable, Windows can not open directories"""
+    if os.name != "posix":
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class RegionFile:
+    """one memory-mapped region file"""
+
+    def __init__(self, path: Path, create: bool = False) -> None:
+        self.path = path
+        if create and not path.exists():
+            self._create(path)
+
+        self.map = np.memmap(path, dtype=np.uint8, mode="r+", shape=(FILE_SIZE,))
+        if bytes(self.map[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a region file")
+
+        self.states = self.map[STATES_OFFSET : STATES_OFFSET + REGION_SIZE**2]
+        self.states = self.states.reshape(REGION_SIZE, REGION_SIZE)
+        self.checksums = self.map[CHECKSUMS_OFFSET:CELLS_OFFSET].view(np.uint32)
+        self.checksums = self.checksums.reshape(REGION_SIZE, REGION_SIZE)
+        self.cells = self.map[CELLS_OFFSET:].view(np.int8)
+        self.cells = self.cells.reshape(REGION_SIZE, REGION_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+
+    @staticmethod
+    def _create(path: Path) -> None:
+        """writes an empty region next to path and renames it into place"""
+        header = np.zeros(STATES_OFFSET, dtype=np.uint8)
+        header[: len(MAGIC)] = np.frombuffer(MAGIC, dtype=np.uint8)
+        header[8:16] = np.array([REGION_SIZE, CHUNK_SIZE], dtype=np.int32).view(np.uint8)
+
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "wb") as file:
+            file.write(header.tobytes())
+            file.truncate(FILE_SIZE)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        sync_directory(path.parent)
+
+    def valid(self, local: tuple[int, int]) -> bool:
+        """the slot holds a chunk whose cells match their checksum"""
+        return (
+            self.states[local] != EMPTY
+            and checksum(self.cells[local]) == self.checksums[local]
+        )
+
+    def flush(self) -> None:
+        self.map.flush()
+
+
+class RegionStore(ChunkStore):
+    """
+    Keeps chunks in region files under directory.
+
+    Saves are buffered; the background thread writes them once `batch_size`
+    are pending or every `flush_interval` seconds. The store lock only
+    guards the dicts: a batch is taken from `pending` and kept in `writing`
+    until it is on disk, so loads and saves go on while the regions are
+    written and synced under the flush lock.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.__regions: dict[tuple[int, int], RegionFile] = dict()
+        self.__pending: dict[tuple[int, int], tuple[np.ndarray, ChunkStates]] = dict()
+        self.__writing: dict[tuple[int, int], tuple[np.ndarray, ChunkStates]] = dict()
+        self.__lock = threading.RLock()
+        self.__flushing = threading.Lock()
+        self.__wake = threading.Event()
+        self.__closed = False
+        self.__writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.__writer.start()
+
+    @staticmethod
+    def split(pos: tuple[int, int]) -> tuple[tuple[int, int], tuple[int, int]]:
+        """region coordinates and position inside the region of a chunk"""
+        x, y = pos
+        return (x // REGION_SIZE, y // REGION_SIZE), (x % REGION_SIZE, y % REGION_SIZE)
+
+    def bind(self, world: dict) -> None:
+        path = self.directory / WORLD
+        if path.exists():
+            bound = json.loads(path.read_text())
+            if bound != world:
+                raise ValueError(f"{self.directory}: {mismatch(bound, world)}")
+            return
+
+        temporary = path.with_suffix(".tmp")
+        with open(temporary, "w") as file:
+            json.dump(world, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        sync_directory(self.directory)
+
+    def _region(self, key: tuple[int, int], create: bool = False) -> RegionFile | None:
+        region = self.__regions.get(key)
+        if region is None:
+            path = self.directory / f"r.{key[0]}.{key[1]}.region"
+            if not create and not path.exists():
+                return None
+            region = self.__regions[key] = RegionFile(path, create=create)
+        return region
+
+    def save(self, pos: tuple[int, int], cells: np.ndarray, state: ChunkStates) -> None:
+        with self.__lock:
+            self.__pending[pos] = (np.array(cells, dtype=np.int8), state)
+            if len(self.__pending) >= self.batch_size:
+                self.__wake.set()
+
+    def load(self, pos: tuple[int, int]) -> tuple[np.ndarray, ChunkStates] | None:
+        with self.__lock:
+            saved = self.__pending.get(pos) or self.__writing.get(pos)
+            if saved is not None:
+                cells, state = saved
+                return cells.copy(), state
+
+            key, local = self.split(pos)
+            region = self._region(key)
+            if region is None or not region.valid(local):
+                return None
+            view = region.cells[local]
+            view.flags.writeable = False
+            return view, CODE_STATES[int(region.states[local])]
+
+    def __contains__(self, pos: tuple[int, int]) -> bool:
+        with self.__lock:
+            if pos in self.__pending or pos in self.__writing:
+                return True
+            key, local = self.split(pos)
+            region = self._region(key)
+            return region is not None and region.states[local] != EMPTY
+
+    def flush(self) -> None:
+        """writes every pending save and syncs the touched regions"""
+        with self.__flushing:
+            with self.__lock:
+                pending, self.__pending = self.__pending, dict()
+                if not pending:
+                    return
+                self.__writing = pending
+
+                by_region: dict[tuple[int, int], list] = dict()
+                for pos, (cells, state) in pending.items():
+                    key, local = self.split(pos)
+                    by_region.setdefault(key, []).append((local, cells, state))
+                regions = {key: self._region(key, create=True) for key in by_region}
+
+            for key, entries in by_region.items():
+                region = regions[key]
+                for local, _, _ in entries:
+                    region.states[local] = EMPTY
+                region.flush()
+                for local, cells, _ in entries:
+                    region.cells[local] = cells
+                    region.checksums[local] = checksum(cells)
+                region.flush()
+                for local, _, state in entries:
+                    region.states[local] = STATE_CODES[state]
+                region.flush()
+
+            with self.__lock:
+                self.__writing = dict()
+
+    def _write_loop(self) -> None:
+        while not self.__closed:
+            self.__wake.wait(self.flush_interval)
+            self.__wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        self.__closed = True
+        self.__wake.set()
+        self.__writer.join()
+        self.flush()
+        with self.__lock:
+            self.__regions.clear()
+
+
+def verify(directory: Path, repair: bool = False) -> dict[str, int]:
+    """
+    Checks every region file under directory.
+    With repair, chunks whose cells do not match their checksum are dropped
+    """
+    report = {"regions": 0, "chunks": 0, "corrupted": 0, "bad_files": 0}
+    for path in sorted(directory.glob("r.*.region")):
+        try:
+            region = RegionFile(path)
+        except ValueError:
+            report["bad_files"] += 1
+            continue
+
+        report["regions"] += 1
+        for local in zip(*np.nonzero(region.states)):
+            local = (int(local[0]), int(local[1]))
+            if region.valid(local):
+                report["chunks"] += 1
+                continue
+            report["corrupted"] += 1
+            if repair:
+                region.states[local] = EMPTY
+        region.flush()
+    return report
+
+
+def compact(directory: Path) -> dict[str, int]:
+    """drops corrupted chunks, then removes regions without chunks and stale temporaries"""
+    report = verify(directory, repair=True)
+    report["removed"] = 0
+    for path in sorted(directory.glob("r.*.region")):
+        try:
+            region = RegionFile(path)
+        except ValueError:
+            continue
+        empty = not region.states.any()
+        del region
+        if empty:
+            path.unlink()
+            report["removed"] += 1
+    for path in directory.glob("r.*.tmp"):
+        path.unlink()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="verify or compact a region store")
+    parser.add_argument("command", choices=("verify", "compact"))
+    parser.add_argument("directory", type=Path)
+    parser.add_argument(
+        "--repair", action="store_true", help="drop corrupted chunks while verifying"
+    )
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        report = verify(args.directory, repair=args.repair)
+    else:
+        report = compact(args.directory)
+    print(", ".join(f"{key}: {value}" for key, value in report.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Chunk arena in shared memory, for grids read or written by several processes.
+
+One `multiprocessing.shared_memory` block of fixed capacity holds:
+
+    header      magic, capacity, table size, seed, density and engine name
+    versions    a uint64 per slot, odd while the slot is being written
+    states      a uint8 per slot, FREE for an unused slot
+    positions   an (x, y) int64 pair per slot
+    cells       the (capacity, CHUNK_SIZE, CHUNK_SIZE) int8 slab
+    table       an open-addressing hash table from position keys to slots
+
+The process that creates the arena owns it: only the owner allocates and
+releases slots and updates the table, its Grid works as with a private
+ChunkArena. Other processes attach by name. Readers look positions up in
+the table and see the cells zero-copy. Generator processes (the workers of
+parallel.py) write the cells of the slots the owner handed out to them.
+The chunk summaries (see arena.py) stay in the owner's memory.
+
+Every write to a slot is bracketed by two increments of its version (a
+seqlock). `read` copies a slot and retries until the version was even and
+unchanged around the copy, so it never returns half written cells. The
+state is written after the cells, so a GENERATED state always comes with
+its final cells. A fence separates the version stores from the data stores
+and the version loads from the data loads. x86 keeps the stores, and the
+loads, of a process in program order, so there the fences are no-ops;
+other CPUs take them from numba_kernels.fence, and without numba the
+arena refuses to start. A writer that dies halfway leaves its slot odd;
+`read` gives up on it after a timeout.
+"""
+
+import functools
+import multiprocessing
+import os
+import platform
+import struct
+import time
+from collections.abc import Callable, Iterator
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .arena import FREE, ChunkArena, key
+from .chunk import CHUNK_SIZE, CODE_STATES, Chunk, ChunkStates
+from .evolution import DEFAULT_ENGINE
+
+MAGIC = b"TGSHRD01"
+"""magic, capacity, table size, seed, density, engine name"""
+HEADER = struct.Struct("<8sQQQd16s")
+ALIGN = 64
+
+CAPACITY = 1 << 16
+
+"""table entries that never held a slot, and entries whose chunk was released"""
+EMPTY, DELETED = -1, -2
+
+"""CPUs that keep the stores, and the loads, of one process in program order"""
+ORDERED = platform.machine().lower() in ("x86_64", "amd64", "i386", "i686", "x86")
+
+"""how long `read` waits for a slot to be written, in seconds"""
+READ_TIMEOUT = 1.0
+
+
+def _no_fence() -> None:
+    pass
+
+
+@functools.cache
+def memory_fence() -> Callable[[], None]:
+    """the fence of the seqlock, RuntimeError where it needs numba and there is none"""
+    if ORDERED:
+        return _no_fence
+    try:
+        from .numba_kernels import fence
+    except ImportError:
+        raise RuntimeError(
+            f"the shared arena needs numba for its memory fences on {platform.machine()}"
+        ) from None
+    return fence
+
+
+def _layout(capacity: int) -> tuple[int, dict[str, int], int]:
+    """the table size, the offset of every array and the size of the block"""
+    table = 1 << (2 * capacity - 1).bit_length()
+    sizes = {
+        "versions": 8 * capacity,
+        "states": capacity,
+        "positions": 16 * capacity,
+        "cells": CHUNK_SIZE * CHUNK_SIZE * capacity,
+        "keys": 8 * table,
+        "slots": 8 * table,
+    }
+    offsets = dict()
+    offset = HEADER.size
+    for name, size in sizes.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        offsets[name] = offset
+        offset += size
+    return table, offsets, offset
+
+
+def _open(name: str) -> SharedMemory:
+    """
+    Attaches to the block. A process that multiprocessing did not start
+    runs its own resource tracker, which would unlink the block as soon as
+    the process exits, so it is taken off that tracker again
+    """
+    memory = SharedMemory(name)
+    if os.name == "posix" and multiprocessing.parent_process() is None:
+        resource_tracker.unregister(memory._name, "shared_memory")
+    return memory
+
+
+class SharedChunkArena(ChunkArena):
+    """
+    A ChunkArena whose slab, states and index live in shared memory.
+    It can not grow: allocating more than `capacity` chunks raises MemoryError
+    """
+
+    def __init__(
+        self,
+        density: float,
+        engine: str = DEFAULT_ENGINE,
+        seed: int = 0,
+        capacity: int = CAPACITY,
+        name: str | None = None,
+    ) -> None:
+        memory_fence()
+        super().__init__(density, engine, seed)
+        table, _, size = _layout(capacity)
+        memory = SharedMemory(name, create=True, size=size)
+        HEADER.pack_into(
+            memory.buf, 0, MAGIC, capacity, table, seed, density, self.engine.name.encode()
+        )
+        self._map(memory, capacity, owner=True)
+        self.__slots.fill(EMPTY)
+        self._add_slots(0, capacity)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedChunkArena":
+        """the arena of the block `name`, created by another process"""
+        memory_fence()
+        memory = _open(name)
+        magic, capacity, _, seed, density, engine = HEADER.unpack_from(memory.buf)
+        if magic != MAGIC:
+            memory.close()
+            raise ValueError(f"{name} is not a shared chunk arena")
+
+        arena = cls.__new__(cls)
+        ChunkArena.__init__(arena, density, engine.rstrip(b"\0").decode(), seed)
+        arena._map(memory, capacity, owner=False)
+        return arena
+
+    def _map(self, memory: SharedMemory, capacity: int, owner: bool) -> None:
+        table, offsets, _ = _layout(capacity)
+
+        def array(name: str, dtype: type, shape: tuple[int, ...]) -> np.ndarray:
+            return np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offsets[name])
+
+        self.__memory = memory
+        self.__owner = owner
+        self.__fence = memory_fence()
+        self.__mask = table - 1
+        self.versions = array("versions", np.uint64, (capacity,))
+        self.states = array("states", np.uint8, (capacity,))
+        self.positions = array("positions", np.int64, (capacity, 2))
+        self.cells = array("cells", np.int8, (capacity, CHUNK_SIZE, CHUNK_SIZE))
+        self.__keys = array("keys", np.int64, (table,))
+        self.__slots = array("slots", np.int64, (table,))
+        self.last_used = np.zeros(capacity, dtype=np.uint64)
+        self._init_summaries(capacity)
+
+    @property
+    def name(self) -> str:
+        """what other processes pass to `attach`"""
+        return self.__memory.name
+
+    @property
+    def owner(self) -> bool:
+        return self.__owner
+
+    def _grow(self) -> None:
+        raise MemoryError(f"the shared arena is full ({self.capacity} chunks)")
+
+    def write_cells(self, slot: int, cells: np.ndarray) -> None:
+        self.versions[slot] += 1
+        self.__fence()
+        self.cells[slot] = cells
+        self.__fence()
+        self.versions[slot] += 1
+
+    def write_state(self, slot: int, code: int) -> None:
+        self.versions[slot] += 1
+        self.__fence()
+        super().write_state(slot, code)
+        self.__fence()
+        self.versions[slot] += 1
+
+    def _probe(self, k: int) -> Iterator[int]:
+        """the table entries to look at for key k, in order"""
+        # Fibonacci hashing, the low bits of the keys repeat a lot
+        i = ((k * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 20
+        for _ in range(self.__mask + 1):
+            yield i & self.__mask
+            i += 1
+
+    def _find(self, k: int) -> int:
+        """the table entry of key k, -1 if there is none"""
+        for i in self._probe(k):
+            slot = self.__slots[i]
+            if slot == EMPTY:
+                return -1
+            if slot == DELETED:
+                continue
+            # the key was stored before the slot, load them in that order too
+            self.__fence()
+            if self.__keys[i] == k:
+                return i
+        return -1
+
+    def allocate(self, pos: tuple[int, int]) -> Chunk:
+        if not self.__owner:
+            raise RuntimeError("only the process that created the arena allocates slots")
+        view = super().allocate(pos)
+        k = key(*pos)
+        for i in self._probe(k):
+            if self.__slots[i] < 0:
+                # the slot publishes the entry, the key has to be there first
+                self.__keys[i] = k
+                self.__fence()
+                self.__slots[i] = view.slot
+                break
+        return view
+
+    def release(self, pos: tuple[int, int]) -> Chunk:
+        if not self.__owner:
+            raise RuntimeError("only the process that created the arena releases slots")
+        slot = super().slot(pos)
+        if slot < 0:
+            raise KeyError(pos)
+
+        i = self._find(key(*pos))
+        self.__slots[i] = DELETED
+        # entries before an empty one end no probe, they can be empty too
+        while self.__slots[(i + 1) & self.__mask] == EMPTY and self.__slots[i] == DELETED:
+            self.__slots[i] = EMPTY
+            i = (i - 1) & self.__mask
+
+        self.versions[slot] += 1
+        self.__fence()
+        view = super().release(pos)
+        self.__fence()
+        self.versions[slot] += 1
+        return view
+
+    def slot(self, pos: tuple[int, int]) -> int:
+        if self.__owner:
+            return super().slot(pos)
+        i = self._find(key(*pos))
+        if i < 0:
+            return -1
+        slot = int(self.__slots[i])
+        # the slot may have been released and reused since the lookup
+        if slot < 0 or self.states[slot] == FREE or tuple(self.positions[slot]) != pos:
+            return -1
+        return slot
+
+    def get(self, pos: tuple[int, int], default=None) -> Chunk | None:
+        if self.__owner:
+            return super().get(pos, default)
+        slot = self.slot(pos)
+        return default if slot < 0 else Chunk(self, slot, pos)
+
+    def __contains__(self, pos: object) -> bool:
+        return self.slot(pos) >= 0
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        if self.__owner:
+            yield from super().__iter__()
+            return
+        for slot in self.occupied():
+            x, y = self.positions[slot]
+            yield int(x), int(y)
+
+    def __len__(self) -> int:
+        if self.__owner:
+            return super().__len__()
+        return int(np.count_nonzero(self.states != FREE))
+
+    def occupied(self) -> np.ndarray:
+        if self.__owner:
+            return super().occupied()
+        return np.flatnonzero(self.states != FREE)
+
+    def read(
+        self, pos: tuple[int, int], timeout: float = READ_TIMEOUT
+    ) -> tuple[np.ndarray, ChunkStates] | None:
+        """
+        A consistent copy of the cells and the state of the chunk at pos, or
+        None. TimeoutError when its slot stays mid-write for `timeout`
+        seconds, as it does once a writer died there
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            slot = self.slot(pos)
+            if slot < 0:
+                return None
+            before = int(self.versions[slot])
+            if before & 1:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"the slot of chunk {pos} is stuck mid-write")
+                time.sleep(0)
+                continue
+            self.__fence()
+            cells = self.cells[slot].copy()
+            code = int(self.states[slot])
+            x, y = self.positions[slot]
+            self.__fence()
+            if int(self.versions[slot]) != before:
+                continue
+            if code == FREE or (int(x), int(y)) != pos:
+                return None
+            return cells, CODE_STATES[code]
+
+    def close(self) -> None:
+        """
+        Unmaps the block; the owner also unlinks it, attached processes keep
+        their mapping until they close it too
+        """
+        self.versions = self.states = self.positions = self.cells = None
+        self.__keys = self.__slots = None
+        try:
+            self.__memory.close()
+        except BufferError:
+            # a caller still holds a view of the cells, it keeps the mapping alive
+            pass
+        if self.__owner:
+            if os.name == "posix":
+                # an arena attached in this same process took it off the tracker
+                resource_tracker.register(self.__memory._name, "shared_memory")
+            self.__memory.unlink()
+
+
+"""the arenas this process attached to, by name"""
+_attached: dict[str, SharedChunkArena] = dict()
+
+
+def attached(name: str) -> SharedChunkArena:
+    """the arena `name`, attached once per process"""
+    arena = _attached.get(name)
+    if arena is None:
+        arena = _attached[name] = SharedChunkArena.attach(name)
+    return arena
@@ -0,0 +1,71 @@
+"""
+Stores for chunks evicted from a Grid.
+
+A store keeps the cells and the state of a chunk by position; the grid saves
+GENERATED chunks into it when they are evicted and looks there before
+generating a chunk again. The chunks of a store belong to one world: the
+grid binds it to its Grid.world() and a store of another world is refused.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .chunk import ChunkStates
+
+
+class ChunkStore(ABC):
+    """the interface of a chunk store"""
+
+    @abstractmethod
+    def save(self, pos: tuple[int, int], cells: np.ndarray, state: ChunkStates) -> None:
+        ...
+
+    @abstractmethod
+    def load(self, pos: tuple[int, int]) -> tuple[np.ndarray, ChunkStates] | None:
+        """the saved cells and state of the chunk, or None"""
+
+    def bind(self, world: dict) -> None:
+        """
+        Ties the store to the world its chunks come from (see Grid.world);
+        raises ValueError if it already holds the chunks of another world
+        """
+        bound = getattr(self, "_world", None)
+        if bound is None:
+            self._world = dict(world)
+        elif bound != world:
+            raise ValueError(mismatch(bound, world))
+
+    def __contains__(self, pos: tuple[int, int]) -> bool:
+        return self.load(pos) is not None
+
+    def flush(self) -> None:
+        """writes pending saves, if the store buffers them"""
+
+    def close(self) -> None:
+        self.flush()
+
+
+def mismatch(bound: dict, world: dict) -> str:
+    differences = ", ".join(
+        f"{key} {bound.get(key)!r} != {world.get(key)!r}"
+        for key in sorted(bound.keys() | world.keys())
+        if bound.get(key) != world.get(key)
+    )
+    return f"the store holds the chunks of another world ({differences})"
+
+
+class MemoryStore(ChunkStore):
+    """keeps the chunks in a dict, mostly useful for testing a budget"""
+
+    def __init__(self) -> None:
+        self.__chunks: dict[tuple[int, int], tuple[np.ndarray, ChunkStates]] = dict()
+
+    def save(self, pos: tuple[int, int], cells: np.ndarray, state: ChunkStates) -> None:
+        self.__chunks[pos] = (cells.copy(), state)
+
+    def load(self, pos: tuple[int, int]) -> tuple[np.ndarray, ChunkStates] | None:
+        return self.__chunks.get(pos)
+
+    def __len__(self) -> int:
+        return len(self.__chunks)
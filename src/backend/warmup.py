@@ -0,0 +1,70 @@
+"""
+Ahead-of-time warm-up of the generation kernels.
+
+The numba kernels are compiled on their first call, once per argument
+signature, and cache=True stores the machine code on disk. A fresh machine
+or container would otherwise pay for the JIT in its first chunk, once in
+every worker. Warming up generates a few chunks with every mode the grid
+has, with and without preview tiers, so each signature the pipeline uses is
+compiled and persisted; later processes load it from the cache.
+
+Usage:
+    python -m src.backend.warmup [--cache-dir DIR] [--engines numba numpy]
+
+Run it once per deployment (or at the start of a batch job, before its
+workers start), with the same --cache-dir the job passes to
+evolution.set_kernel_cache or through NUMBA_CACHE_DIR.
+"""
+
+import argparse
+import os
+import time
+
+from .evolution import ENGINES, get_engine, set_kernel_cache
+from .grid import MODES, Grid
+
+
+def warm_up(
+    engines: tuple[str, ...] = ("numba",),
+    cache_dir: str | os.PathLike | None = None,
+) -> dict[str, float]:
+    """
+    Runs the pipeline of every engine once in this process and returns the
+    seconds each took. Engines that are not available (numba falls back to
+    numpy) are skipped
+    """
+    if cache_dir is not None:
+        set_kernel_cache(cache_dir)
+
+    seconds = dict()
+    for name in engines:
+        if get_engine(name).name != name:
+            continue
+        start = time.perf_counter()
+        for mode in MODES:
+            for tiers in ((),) if mode == "region" else ((), (1,)):
+                grid = Grid(0.5, engine=name, mode=mode, seed=0, preview_tiers=tiers)
+                grid.generate_chunks([(0, 0), (1, 0)])
+                while grid.refine():
+                    pass
+                grid.close()
+        seconds[name] = time.perf_counter() - start
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="compile and cache the generation kernels")
+    parser.add_argument("--cache-dir", type=str, default=None, help="numba cache directory")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=["numba"])
+    args = parser.parse_args()
+
+    seconds = warm_up(tuple(args.engines), args.cache_dir)
+    for name in args.engines:
+        if name in seconds:
+            print(f"{name}: {seconds[name]:.2f} s")
+        else:
+            print(f"{name}: unavailable")
+
+
+if __name__ == "__main__":
+    main()
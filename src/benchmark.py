@@ -0,0 +1,416 @@
+"""
+Reproducible benchmarks of the generation pipeline and the renderer.
+
+Usage:
+    python -m src.benchmark run [--out results.json]
+        [--groups kernels chunk grid render startup] [--engines numpy numba] [--quick]
+    python -m src.benchmark compare baseline.json results.json [--threshold 0.15]
+
+Every benchmark uses fixed seeds and runs headless (the renderer on Qt's
+offscreen platform). `--engines` limits the per-engine benchmarks of the
+kernels, chunk and startup groups to the given engines. The startup group
+runs every sample in a fresh interpreter: the import of the grid and the
+latency of its first chunk, for numba with an empty and with a warmed
+kernel cache. `run` writes the median and minimum time in seconds of every
+benchmark, with its extra measurements, to JSON. `compare` prints the ratio
+of the medians and exits with status 1 when any benchmark got slower than
+the baseline by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+import numpy as np
+
+SEED = 1234
+GROUPS = ("kernels", "chunk", "grid", "render", "startup")
+GRID_RADII = (2, 4, 8, 16)
+ZOOMS = (0.1, 0.25, 0.5, 1.0, 2.0)
+STACK = 64
+REGION = 16 * 16 + 2
+
+
+def measure(
+    function: Callable[[], object],
+    repeats: int,
+    setup: Callable[[], object] | None = None,
+) -> dict:
+    """times function after one warm-up call, setup runs untimed before each call"""
+    if setup is not None:
+        setup()
+    function()
+
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"median": statistics.median(times), "min": min(times), "repeats": repeats}
+
+
+def terrain(rng: np.random.Generator, shape: tuple[int, ...]) -> np.ndarray:
+    """random terrain bits (water, land, mountain)"""
+    return rng.choice(np.array([0, 2, 3], dtype=np.int8), size=shape)
+
+
+def bench_kernels(quick: bool, engines: tuple[str, ...]) -> dict[str, dict]:
+    from src.backend.evolution import ENGINES, BiomeBuffers, biome_evolve, evolve, get_engine
+
+    repeats = 20 if quick else 100
+    rng = np.random.default_rng(SEED)
+    results = dict()
+
+    single = terrain(rng, (18, 18))
+    stack = terrain(rng, (STACK, 18, 18))
+    results["kernels.evolve[18x18]"] = measure(lambda: evolve(single.copy()), repeats)
+    results[f"kernels.evolve[{STACK}x18x18]"] = measure(lambda: evolve(stack.copy()), repeats)
+
+    # one pass over a region of 16x16 chunks, the box filter against the transition cache
+    region = terrain(rng, (REGION, REGION))
+    results[f"kernels.evolve[{REGION}x{REGION}]"] = measure(
+        lambda: evolve(region.copy()), repeats // 10 or 1
+    )
+    if "memo" in engines:
+        from src.backend import memo
+
+        memo.CACHE.clear()
+        result = measure(lambda: memo.evolve(region.copy()), repeats // 10 or 1)
+        result["hit_rate"] = memo.CACHE.stats().hit_rate
+        results[f"kernels.memo.evolve[{REGION}x{REGION}]"] = result
+
+    field = terrain(rng, (20, 20)) | (rng.integers(0, 4, (20, 20), dtype=np.int8) << 2)
+    buffers = BiomeBuffers(field.shape)
+    biome_rng = np.random.default_rng(SEED)
+    results["kernels.biome_evolve[20x20]"] = measure(
+        lambda: biome_evolve(field.copy(), biome_rng, buffers=buffers), repeats
+    )
+
+    padded_1, padded_2 = terrain(rng, (18, 18)), terrain(rng, (20, 20))
+    stack_1, stack_2 = terrain(rng, (STACK, 18, 18)), terrain(rng, (STACK, 20, 20))
+    chunk = terrain(rng, (16, 16))
+    chunks = terrain(rng, (STACK, 16, 16))
+
+    # the kernels evolve their input in place: every call gets a fresh copy, untimed
+    inputs = dict()
+
+    def copy_inputs() -> None:
+        inputs.update(
+            padded_1=padded_1.copy(), padded_2=padded_2.copy(),
+            stack_1=stack_1.copy(), stack_2=stack_2.copy(),
+        )
+
+    for name in ENGINES:
+        if name == "reference" or name not in engines:
+            continue
+        engine = get_engine(name)
+        if engine.name != name:
+            continue
+        rngs = [np.random.default_rng(SEED + i) for i in range(STACK)]
+        prefix = f"kernels.{name}"
+        results[f"{prefix}.pre_generate_chunk[1]"] = measure(
+            lambda: engine.pre_generate_chunk(inputs["padded_1"]), repeats, setup=copy_inputs
+        )
+        results[f"{prefix}.pre_generate_chunk[{STACK}]"] = measure(
+            lambda: engine.pre_generate_chunk(inputs["stack_1"]), repeats // 10 or 1,
+            setup=copy_inputs,
+        )
+        results[f"{prefix}.generate_chunk_biome[1]"] = measure(
+            lambda: engine.generate_chunk_biome(inputs["padded_2"], rngs[0]), repeats // 10 or 1,
+            setup=copy_inputs,
+        )
+        results[f"{prefix}.generate_chunk_biome[{STACK}]"] = measure(
+            lambda: engine.generate_chunk_biome(inputs["stack_2"], rngs), 3, setup=copy_inputs
+        )
+        results[f"{prefix}.textures[1]"] = measure(
+            lambda: engine.textures(chunk, 0.3, rngs[0]), repeats
+        )
+        results[f"{prefix}.textures[{STACK}]"] = measure(
+            lambda: engine.textures(chunks, 0.3, rngs), repeats // 10 or 1
+        )
+    return results
+
+
+def bench_chunk(quick: bool, engines: tuple[str, ...]) -> dict[str, dict]:
+    """the latency of pre-generating and generating one chunk in place"""
+    from src.backend.chunk import ChunkStates
+    from src.backend.grid import Grid
+
+    repeats = 5 if quick else 20
+    results = dict()
+    for engine in ("numpy", "numba"):
+        if engine not in engines:
+            continue
+        grid = Grid(0.5, engine=engine, mode="chunk", seed=SEED)
+        if grid.engine != engine:
+            continue
+        grid._create_random_chunks((0, 0), 6)
+        centre = grid[0, 0]
+        initial = centre.cells.copy()
+
+        def reset_centre() -> None:
+            centre.cells = initial
+            centre.state = ChunkStates.NOT_GENERATED
+
+        results[f"chunk.{engine}.pre_generate_self"] = measure(
+            lambda: centre.pre_generate_self(grid, (0, 0)), repeats, setup=reset_centre
+        )
+
+        grid._pre_generate_chunks(
+            [(chunk, pos) for pos, chunk in grid.chunks.items()
+             if abs(pos[0]) + abs(pos[1]) < 3]
+        )
+        pre_generated = centre.cells.copy()
+
+        def restore_centre() -> None:
+            centre.cells = pre_generated
+            centre.state = ChunkStates.PRE_GENERATED
+
+        results[f"chunk.{engine}.generate_self"] = measure(
+            lambda: centre.generate_self(grid, (0, 0)), repeats, setup=restore_centre
+        )
+    return results
+
+
+def bench_grid(quick: bool, engines: tuple[str, ...]) -> dict[str, dict]:
+    """generate_around from an empty grid: time, chunks per second and peak memory"""
+    from src.backend.chunk import ChunkStates
+    from src.backend.grid import Grid
+
+    radii = GRID_RADII[:-1] if quick else GRID_RADII
+    results = dict()
+    for radius in radii:
+        grids = []
+
+        def setup() -> None:
+            grids.append(Grid(0.5, seed=SEED))
+
+        result = measure(
+            lambda: grids[-1].generate_around((0, 0), radius),
+            repeats=1 if radius > 8 else 3,
+            setup=setup,
+        )
+        grid = grids[-1]
+        generated = sum(
+            1 for pos in grid.chunks if grid[pos].state == ChunkStates.GENERATED
+        )
+        result["chunks"] = generated
+        result["chunks_per_second"] = generated / result["median"]
+
+        tracemalloc.start()
+        Grid(0.5, seed=SEED).generate_around((0, 0), radius)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[f"grid.generate_around[r={radius}]"] = result
+
+        # one-chunk moves of a grid that is already generated around the player
+        position = [0]
+
+        def step() -> None:
+            position[0] += 1
+            grid.generate_around((position[0], 0), radius)
+
+        results[f"grid.step[r={radius}]"] = measure(step, repeats=3 if radius > 8 else 10)
+    return results
+
+
+def bench_render(quick: bool, engines: tuple[str, ...]) -> dict[str, dict]:
+    """offscreen GridView paint time per zoom level"""
+    frames = 10 if quick else 30
+    try:
+        from src.ui import render_benchmark
+
+        measured_zooms = render_benchmark.measure(list(ZOOMS), frames, seed=SEED)
+    except ImportError as error:
+        print(f"skipping render benchmarks: {error}", file=sys.stderr)
+        return dict()
+
+    results = dict()
+    for zoom, measured in measured_zooms.items():
+        times = [t / 1000 for t in measured["times"]]
+        warm = times[1:]
+        results[f"render.paint[zoom={zoom}]"] = {
+            "median": statistics.median(warm),
+            "min": min(warm),
+            "repeats": len(warm),
+            "first": times[0],
+            "lod": measured["lod"],
+        }
+    return results
+
+
+"""
+run in a fresh interpreter: prints the seconds the import of the grid and its
+first chunk took, and which heavy modules the import alone loaded
+"""
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from src.backend.grid import Grid
+imported = time.perf_counter()
+loaded = [name for name in ("numba", "PySide6", "multiprocessing") if name in sys.modules]
+Grid(0.5, engine=sys.argv[1], seed=int(sys.argv[2])).generate_chunks([(0, 0)])
+print(json.dumps({
+    "import": imported - start,
+    "first_chunk": time.perf_counter() - imported,
+    "loaded": loaded,
+}))
+"""
+
+
+def probe_startup(engine: str, cache_dir: str) -> dict:
+    """one startup sample in a new interpreter with its numba cache in cache_dir"""
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE, engine, str(SEED)],
+        capture_output=True, text=True, check=True, env=env,
+    ).stdout
+    return json.loads(output)
+
+
+def summarise(samples: list[dict], key: str) -> dict:
+    times = [sample[key] for sample in samples]
+    return {"median": statistics.median(times), "min": min(times), "repeats": len(times)}
+
+
+def bench_startup(quick: bool, engines: tuple[str, ...]) -> dict[str, dict]:
+    """import time of the backend and first-chunk latency, cold and warm"""
+    from src.backend.evolution import get_engine
+
+    repeats = 3 if quick else 7
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        samples = [probe_startup("numpy", directory) for _ in range(repeats)]
+        result = summarise(samples, "import")
+        result["loaded"] = samples[0]["loaded"]
+        results["startup.import[src.backend.grid]"] = result
+        results["startup.numpy.first_chunk"] = summarise(samples, "first_chunk")
+
+        if "numba" in engines and get_engine("numba").name == "numba":
+            # every cold sample compiles into its own empty cache
+            cold = []
+            for i in range(repeats // 2 or 1):
+                cold.append(probe_startup("numba", os.path.join(directory, f"cold{i}")))
+            results["startup.numba.first_chunk[cold]"] = summarise(cold, "first_chunk")
+
+            warm = os.path.join(directory, "cold0")
+            samples = [probe_startup("numba", warm) for _ in range(repeats)]
+            results["startup.numba.first_chunk[warm]"] = summarise(samples, "first_chunk")
+    return results
+
+
+BENCHMARKS: dict[str, Callable[[bool, tuple[str, ...]], dict[str, dict]]] = {
+    "kernels": bench_kernels,
+    "chunk": bench_chunk,
+    "grid": bench_grid,
+    "render": bench_render,
+    "startup": bench_startup,
+}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": SEED,
+    }
+
+
+def run(groups: list[str], quick: bool = False, engines: list[str] | None = None) -> dict:
+    """runs the groups; engines limits the per-engine benchmarks, all engines by default"""
+    from src.backend.evolution import ENGINES
+
+    engines = ENGINES if engines is None else tuple(engines)
+    results = dict()
+    for group in groups:
+        print(f"running {group} benchmarks", file=sys.stderr)
+        results.update(BENCHMARKS[group](quick, engines))
+    return {
+        "environment": environment(), "quick": quick, "engines": list(engines), "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """prints the median ratios and returns the benchmarks slower than 1 + threshold"""
+    regressions = []
+    base, new = baseline["results"], current["results"]
+    for name in sorted(base.keys() & new.keys()):
+        ratio = new[name]["median"] / base[name]["median"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(
+            f"{name:<48} {base[name]['median'] * 1000:>10.3f} ms"
+            f" {new[name]['median'] * 1000:>10.3f} ms {ratio:>6.2f}x{flag}"
+        )
+    for name in sorted(base.keys() - new.keys()):
+        print(f"{name:<48} missing from the current run")
+    return regressions
+
+
+def main() -> None:
+    from src.backend.evolution import ENGINES
+
+    parser = argparse.ArgumentParser(description="run or compare the benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write JSON")
+    run_parser.add_argument("--out", type=str, default="-", help="output file, - for stdout")
+    run_parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    run_parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    run_parser.add_argument("--quick", action="store_true", help="fewer repeats and radii")
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.15,
+        help="allowed slowdown of a median, as a fraction",
+    )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = json.dumps(run(args.groups, args.quick, args.engines), indent=2)
+        if args.out == "-":
+            print(report)
+        else:
+            with open(args.out, "w") as file:
+                file.write(report + "\n")
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
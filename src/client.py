@@ -0,0 +1,185 @@
+"""
+Client of the chunk server and a load generator for it.
+
+Usage:
+    python -m src.client [--host 127.0.0.1] [--port 8765] [--unix PATH]
+        [--clients 16] [--requests 200] [--spread 32] [--region 0]
+        [--encoding raw|rle|zlib]
+
+Every simulated viewer opens its own connection and walks randomly over a
+square of `spread` chunks around the origin, asking for the chunk under it
+(or the (2 * region + 1)^2 rectangle around it) and waiting for the answer
+before the next request. The latencies of all requests are reported as
+percentiles, with the throughput and the server's coalescing counters.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+
+from src import wire
+from src.backend.chunk import ChunkStates
+
+Chunks = dict[tuple[int, int], tuple[np.ndarray, ChunkStates]]
+
+
+class ServerError(Exception):
+    pass
+
+
+class ChunkClient:
+    """
+    One connection to a chunk server. Requests may be issued concurrently,
+    their answers are matched by id
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        encoding: str = "zlib",
+    ) -> None:
+        self.__reader = reader
+        self.__writer = writer
+        self.encoding = wire.ENCODINGS[encoding]
+        self.__ids = itertools.count(1)
+        self.__waiting: dict[int, asyncio.Future] = dict()
+        self.__receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(
+        cls, host: str = "127.0.0.1", port: int = 8765, encoding: str = "zlib"
+    ) -> "ChunkClient":
+        return cls(*await asyncio.open_connection(host, port), encoding)
+
+    @classmethod
+    async def connect_unix(cls, path: str, encoding: str = "zlib") -> "ChunkClient":
+        return cls(*await asyncio.open_unix_connection(path), encoding)
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                payload = await wire.read_message(self.__reader)
+                request, status = wire.RESPONSE.unpack_from(payload)
+                future = self.__waiting.pop(request, None)
+                if future is None or future.done():
+                    continue
+                body = payload[wire.RESPONSE.size :]
+                if status == wire.OK:
+                    future.set_result(body)
+                else:
+                    future.set_exception(ServerError(body.decode()))
+        except (asyncio.IncompleteReadError, ConnectionError) as error:
+            for future in self.__waiting.values():
+                future.set_exception(ConnectionError(f"connection lost: {error}"))
+            self.__waiting.clear()
+
+    async def _request(self, op: int, x0=0, y0=0, x1=0, y1=0) -> bytes:
+        request = next(self.__ids) & 0xFFFFFFFF
+        future = self.__waiting[request] = asyncio.get_running_loop().create_future()
+        self.__writer.write(
+            wire.frame(wire.REQUEST.pack(op, request, self.encoding, x0, y0, x1, y1))
+        )
+        await self.__writer.drain()
+        return await future
+
+    async def get_chunk(self, x: int, y: int) -> tuple[np.ndarray, ChunkStates]:
+        return wire.unpack_chunks(await self._request(wire.GET_CHUNK, x, y))[x, y]
+
+    async def get_region(self, x0: int, y0: int, x1: int, y1: int) -> Chunks:
+        """the chunks of the rectangle x0..x1, y0..y1 (inclusive)"""
+        return wire.unpack_chunks(await self._request(wire.GET_REGION, x0, y0, x1, y1))
+
+    async def stats(self) -> dict:
+        return json.loads(await self._request(wire.STATS))
+
+    async def close(self) -> None:
+        self.__receiver.cancel()
+        self.__writer.close()
+        await self.__writer.wait_closed()
+
+
+async def viewer(
+    client: ChunkClient,
+    requests: int,
+    spread: int,
+    region: int,
+    rng: np.random.Generator,
+    latencies: list[float],
+) -> None:
+    """walks randomly and records the latency of every request"""
+    x, y = (int(v) for v in rng.integers(-spread // 2, spread // 2 + 1, 2))
+    for _ in range(requests):
+        dx, dy = ((1, 0), (-1, 0), (0, 1), (0, -1))[rng.integers(4)]
+        x = min(max(x + dx, -spread // 2), spread // 2)
+        y = min(max(y + dy, -spread // 2), spread // 2)
+
+        start = time.perf_counter()
+        if region:
+            await client.get_region(x - region, y - region, x + region, y + region)
+        else:
+            await client.get_chunk(x, y)
+        latencies.append(time.perf_counter() - start)
+
+
+async def load(args: argparse.Namespace) -> None:
+    async def connect() -> ChunkClient:
+        if args.unix is not None:
+            return await ChunkClient.connect_unix(args.unix, args.encoding)
+        return await ChunkClient.connect(args.host, args.port, args.encoding)
+
+    clients = [await connect() for _ in range(args.clients)]
+    latencies: list[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            viewer(
+                client, args.requests, args.spread, args.region,
+                np.random.default_rng(i), latencies,
+            )
+            for i, client in enumerate(clients)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    stats = await clients[0].stats()
+    for client in clients:
+        await client.close()
+
+    ms = np.array(latencies) * 1000
+    print(
+        f"{len(ms)} requests from {args.clients} clients in {elapsed:.2f} s,"
+        f" {len(ms) / elapsed:.0f} requests/s"
+    )
+    print(
+        f"latency p50 {np.percentile(ms, 50):.2f} ms, p90 {np.percentile(ms, 90):.2f} ms,"
+        f" p99 {np.percentile(ms, 99):.2f} ms, max {ms.max():.2f} ms"
+    )
+    print(f"server {stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="load-test a chunk server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", type=str, default=None, help="Unix socket path")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--spread", type=int, default=32, help="side of the walked square")
+    parser.add_argument("--region", type=int, default=0, help="radius of region requests")
+    parser.add_argument("--encoding", choices=wire.ENCODINGS, default="zlib")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(load(args))
+    except ConnectionError as error:
+        print(f"can not reach the server: {error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""the RGB colours of the cells, shared by the window and the headless export"""
+
+TERRAIN_BASE = {
+    0b00: (0,   0,   128),  # WATER
+    0b10: (34,  139, 34),   # LAND
+    0b11: (139, 137, 137),  # MOUNTAIN
+}
+
+SUBTYPE_COLORS = {
+    0b00: {  # WATER
+        0b00: (0,   0,   100),  # VERYDEEP
+        0b01: (0,   0,   140),  # DEEP
+        0b10: (0,   0,   180),  # MODERATE
+        0b11: (0,   0,   220),  # SHALLOW
+    },
+    0b10: {  # LAND
+        0b00: (194, 178, 128),  # SAND
+        0b01: (34,  139, 34),   # GRASS
+        0b10: (0,   100, 0),    # FOREST
+        0b11: (85,  107, 47),   # HILL
+    },
+    0b11: {  # MOUNTAIN
+        0b00: (160, 160, 160),  # LOW
+        0b01: (130, 130, 130),  # MODERATE
+        0b10: (100, 100, 100),  # HIGH
+        0b11: (255, 250, 250),  # SNOWY
+    },
+}
+
+DEFAULT_COLOR = (50, 50, 50)
+
+
+def color(raw: int) -> tuple[int, int, int]:
+    terrain = raw & 0b11
+    subtype = (raw >> 2) & 0b11
+    return SUBTYPE_COLORS.get(terrain, {}).get(subtype, DEFAULT_COLOR)
+
+
+def terrain_color(raw: int) -> tuple[int, int, int]:
+    return TERRAIN_BASE.get(raw & 0b11, DEFAULT_COLOR)
@@ -0,0 +1,193 @@
+"""
+Headless export of a rectangular area of the world, without Qt.
+
+Usage:
+    python -m src.export OUT --width W --height H [--x0 X] [--y0 Y] [--seed S]
+        [--density 0.5] [--engine numba] [--workers n] [--band 1] [--format npy|raw|png]
+
+The area spans the chunks x0 .. x0 + W - 1 and y0 .. y0 + H - 1. It is
+generated `band` chunk rows at a time, from the top row (the largest y)
+down, and every band is written out as soon as it is finished. Only the
+band and the two chunk rows of halo on each side of it stay in memory,
+so memory grows with the width, never the height.
+
+Rows of the output run from the largest y down and columns from the
+smallest x, the layout of Region. `npy` and `raw` hold the int8 cells,
+`png` is an indexed image in the colours of the window. The format
+defaults to the extension of OUT, raw otherwise.
+"""
+
+import argparse
+import struct
+import sys
+import time
+import zlib
+from collections.abc import Generator
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+from src import colors
+from src.backend.chunk import CHUNK_SIZE
+from src.backend.evolution import DEFAULT_ENGINE
+from src.backend.grid import Grid
+
+FORMATS = ("npy", "raw", "png")
+
+
+def bands(
+    grid: Grid, x0: int, y0: int, width: int, height: int, band: int = 1
+) -> Generator[np.ndarray]:
+    """
+    Yields the cells of the area, `band` chunk rows at a time from the top,
+    each as a (rows * CHUNK_SIZE, width * CHUNK_SIZE) int8 array.
+    Rows above a band are discarded from the grid once the caller asks
+    for the next band, so the grid holds the whole band while it is used
+    """
+    top = y0 + height - 1
+    columns = range(x0, x0 + width)
+    for first in range(top, y0 - 1, -band):
+        rows = range(first, max(first - band, y0 - 1), -1)
+        grid.generate_chunks([(x, y) for y in rows for x in columns])
+
+        cells = np.empty((len(rows) * CHUNK_SIZE, width * CHUNK_SIZE), dtype=np.int8)
+        for i, y in enumerate(rows):
+            for j, x in enumerate(columns):
+                cells[
+                    i * CHUNK_SIZE : (i + 1) * CHUNK_SIZE,
+                    j * CHUNK_SIZE : (j + 1) * CHUNK_SIZE,
+                ] = grid[x, y].cells
+
+        yield cells
+        # the last row of the band is padding for the next one
+        last = rows[-1]
+        grid.discard([pos for pos in grid.chunks if pos[1] > last])
+
+
+class Writer:
+    """writes the rows of a (height, width) int8 image band by band"""
+
+    def __init__(self, file: BinaryIO, shape: tuple[int, int]) -> None:
+        self.file = file
+        self.shape = shape
+
+    def write(self, cells: np.ndarray) -> None:
+        self.file.write(cells.tobytes())
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class NpyWriter(Writer):
+    def __init__(self, file: BinaryIO, shape: tuple[int, int]) -> None:
+        super().__init__(file, shape)
+        header = {"descr": "|i1", "fortran_order": False, "shape": shape}
+        np.lib.format.write_array_header_1_0(file, header)
+
+
+class PngWriter(Writer):
+    """an 8-bit indexed PNG, the palette maps every cell byte to its colour"""
+
+    def __init__(self, file: BinaryIO, shape: tuple[int, int]) -> None:
+        super().__init__(file, shape)
+        height, width = shape
+        palette = b"".join(bytes(colors.color(raw)) for raw in range(256))
+
+        file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+        self._chunk(b"PLTE", palette)
+        self.compressor = zlib.compressobj(6)
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(kind + data)
+        self.file.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+    def write(self, cells: np.ndarray) -> None:
+        # every scanline starts with filter type 0
+        scanlines = np.zeros((cells.shape[0], cells.shape[1] + 1), dtype=np.uint8)
+        scanlines[:, 1:] = cells.view(np.uint8)
+        data = self.compressor.compress(scanlines.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self) -> None:
+        self._chunk(b"IDAT", self.compressor.flush())
+        self._chunk(b"IEND", b"")
+        super().close()
+
+
+WRITERS: dict[str, type[Writer]] = {"npy": NpyWriter, "raw": Writer, "png": PngWriter}
+
+
+def export(
+    grid: Grid,
+    path: Path,
+    x0: int,
+    y0: int,
+    width: int,
+    height: int,
+    fmt: str = "npy",
+    band: int = 1,
+    progress: bool = True,
+) -> int:
+    """writes the area to path, returns the most chunks the grid held at once"""
+    shape = (height * CHUNK_SIZE, width * CHUNK_SIZE)
+    writer = WRITERS[fmt](open(path, "wb"), shape)
+    start = time.perf_counter()
+    done = peak = 0
+    try:
+        for cells in bands(grid, x0, y0, width, height, band):
+            writer.write(cells)
+            done += cells.shape[0] // CHUNK_SIZE
+            peak = max(peak, len(grid.chunks))
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{done}/{height} chunk rows, {done * width / elapsed:.0f} chunks/s,"
+                    f" {done * width * CHUNK_SIZE**2 / elapsed / 1e6:.2f} Mcells/s,"
+                    f" {peak} chunks kept",
+                    file=sys.stderr,
+                )
+    finally:
+        writer.close()
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="export an area of the world")
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--width", type=int, required=True, help="width in chunks")
+    parser.add_argument("--height", type=int, required=True, help="height in chunks")
+    parser.add_argument("--x0", type=int, default=0, help="leftmost chunk")
+    parser.add_argument("--y0", type=int, default=0, help="bottom chunk")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--engine", type=str, default=DEFAULT_ENGINE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--band", type=int, default=1, help="chunk rows per band")
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args()
+
+    if args.width < 1 or args.height < 1 or args.band < 1:
+        parser.error("width, height and band must be at least 1")
+    fmt = args.format
+    if fmt is None:
+        suffix = args.out.suffix.lstrip(".").lower()
+        fmt = suffix if suffix in FORMATS else "raw"
+
+    grid = Grid(args.density, engine=args.engine, workers=args.workers, seed=args.seed)
+    try:
+        export(
+            grid, args.out, args.x0, args.y0, args.width, args.height,
+            fmt, args.band, not args.quiet,
+        )
+    finally:
+        grid.close()
+    print(f"seed {grid.seed}, wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
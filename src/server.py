@@ -0,0 +1,238 @@
+"""
+Serves the chunks of one world to any number of viewers.
+
+Usage:
+    python -m src.server [--host 127.0.0.1] [--port 8765] [--unix PATH]
+        [--seed S] [--density 0.5] [--engine numpy] [--max-chunks N]
+
+Clients (see client.py) ask for single chunks or rectangles of chunks over
+TCP or a Unix socket, in the format of wire.py, and may pipeline requests
+on one connection. Generated chunks never change, so they are answered from
+a bounded cache. Missing chunks are queued; whatever is queued while a
+generation runs is generated together by the next `Grid.generate_chunks`
+call, and every request waiting for one of those chunks shares its result.
+The grid is only touched by one executor thread, the event loop never
+waits for it.
+"""
+
+import argparse
+import asyncio
+import json
+import struct
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+from src import wire
+from src.backend.chunk import ChunkStates
+from src.backend.evolution import DEFAULT_ENGINE
+from src.backend.grid import Grid
+
+"""the largest rectangle one request may ask for, in chunks"""
+MAX_REGION = 64 * 64
+"""requests are REQUEST.size bytes, longer frames are not read at all"""
+MAX_REQUEST = 1024
+CACHE_SIZE = 1 << 16
+
+Cells = tuple[ChunkStates, np.ndarray]
+
+
+class ServerStats(NamedTuple):
+    requests: int
+    chunks: int
+    cache_hits: int
+    coalesced: int
+    batches: int
+    generated: int
+
+    @property
+    def chunks_per_batch(self) -> float:
+        return self.generated / self.batches if self.batches else 0.0
+
+
+class ChunkServer:
+    def __init__(self, grid: Grid, cache_size: int = CACHE_SIZE) -> None:
+        self.grid = grid
+        self.cache_size = cache_size
+        self.__ready: OrderedDict[tuple[int, int], Cells] = OrderedDict()
+        """chunks queued or being generated, with the future of their cells"""
+        self.__pending: dict[tuple[int, int], asyncio.Future] = dict()
+        self.__queue: list[tuple[int, int]] = []
+        self.__wakeup = asyncio.Event()
+        self.__executor = ThreadPoolExecutor(1)
+        self.__worker: asyncio.Task | None = None
+        self.__requests = self.__chunks = self.__hits = self.__coalesced = 0
+        self.__batches = self.__generated = 0
+
+    def stats(self) -> ServerStats:
+        return ServerStats(
+            self.__requests,
+            self.__chunks,
+            self.__hits,
+            self.__coalesced,
+            self.__batches,
+            self.__generated,
+        )
+
+    async def chunks(self, positions: list[tuple[int, int]]) -> list[Cells]:
+        """the cells of the chunks at positions, generating the missing ones"""
+        if self.__worker is None:
+            self.__worker = asyncio.create_task(self._generate_loop())
+
+        self.__chunks += len(positions)
+        # hits are taken now, the cache may drop them while this request waits
+        ready, waiting = dict(), dict()
+        for pos in positions:
+            if pos in self.__ready:
+                self.__ready.move_to_end(pos)
+                ready[pos] = self.__ready[pos]
+                self.__hits += 1
+            elif pos in self.__pending:
+                waiting[pos] = self.__pending[pos]
+                self.__coalesced += 1
+            else:
+                waiting[pos] = self.__pending[pos] = asyncio.get_running_loop().create_future()
+                self.__queue.append(pos)
+                self.__wakeup.set()
+
+        if waiting:
+            # the futures are shared with coalesced requests, a cancelled
+            # request must not cancel them
+            await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()))
+        return [
+            waiting[pos].result() if pos in waiting else ready[pos]
+            for pos in positions
+        ]
+
+    async def _generate_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.__wakeup.wait()
+            self.__wakeup.clear()
+            batch, self.__queue = self.__queue, []
+            try:
+                results = await loop.run_in_executor(self.__executor, self._generate, batch)
+            except Exception as error:
+                for pos in batch:
+                    future = self.__pending.pop(pos)
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+
+            self.__batches += 1
+            self.__generated += len(batch)
+            for pos, cells in zip(batch, results):
+                self.__ready[pos] = cells
+                future = self.__pending.pop(pos)
+                if not future.done():
+                    future.set_result(cells)
+            while len(self.__ready) > self.cache_size:
+                self.__ready.popitem(last=False)
+
+    def _generate(self, positions: list[tuple[int, int]]) -> list[Cells]:
+        """runs on the executor thread, the only one that touches the grid"""
+        self.grid.generate_chunks(positions)
+        return [(self.grid[pos].state, self.grid[pos].cells.copy()) for pos in positions]
+
+    async def respond(self, payload: bytes) -> bytes:
+        self.__requests += 1
+        try:
+            op, request, encoding, x0, y0, x1, y1 = wire.REQUEST.unpack(payload)
+        except struct.error:
+            # answer with the id if the payload holds one, the client waits for it
+            request = int.from_bytes(payload[1:5], "big") if len(payload) >= 5 else 0
+            return self._error(request, f"requests are {wire.REQUEST.size} bytes")
+        if op == wire.STATS:
+            body = json.dumps(self.stats()._asdict()).encode()
+            return wire.RESPONSE.pack(request, wire.OK) + body
+
+        if op == wire.GET_CHUNK:
+            x1, y1 = x0, y0
+        elif op != wire.GET_REGION:
+            return self._error(request, f"unknown op {op}")
+        if x1 < x0 or y1 < y0 or (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_REGION:
+            return self._error(request, f"regions hold 1 to {MAX_REGION} chunks")
+
+        positions = [(x, y) for y in range(y1, y0 - 1, -1) for x in range(x0, x1 + 1)]
+        try:
+            cells = await self.chunks(positions)
+        except Exception as error:
+            return self._error(request, f"generation failed: {error}")
+        chunks = [(pos, state, c) for pos, (state, c) in zip(positions, cells)]
+        return wire.RESPONSE.pack(request, wire.OK) + wire.pack_chunks(chunks, encoding)
+
+    @staticmethod
+    def _error(request: int, message: str) -> bytes:
+        return wire.RESPONSE.pack(request, wire.ERROR) + message.encode()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """serves one connection, its requests are answered as they finish"""
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(payload: bytes) -> None:
+            response = wire.frame(await self.respond(payload))
+            async with lock:
+                writer.write(response)
+                await writer.drain()
+
+        try:
+            while True:
+                payload = await wire.read_message(reader, MAX_REQUEST)
+                task = asyncio.create_task(answer(payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    def close(self) -> None:
+        if self.__worker is not None:
+            self.__worker.cancel()
+        self.__executor.shutdown()
+        self.grid.close()
+
+
+async def serve(server: ChunkServer, host: str, port: int, unix: str | None) -> None:
+    if unix is not None:
+        listener = await asyncio.start_unix_server(server.handle, unix)
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+    names = ", ".join(str(socket.getsockname()) for socket in listener.sockets)
+    print(f"serving seed {server.grid.seed} on {names}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="serve the chunks of a world")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", type=str, default=None, help="Unix socket path")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--engine", type=str, default=DEFAULT_ENGINE)
+    parser.add_argument("--max-chunks", type=int, default=None)
+    args = parser.parse_args()
+
+    grid = Grid(args.density, engine=args.engine, seed=args.seed, max_chunks=args.max_chunks)
+    server = ChunkServer(grid)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print(server.stats(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Растеризація чанків у QImage 16x16.
+
+Колір клітинки залежить лише від її байта, тож кольори зведено в палітру
+на 256 значень uint32 (0xAARRGGBB), а зображення чанка - це одна
+індексація палітри байтами chunk.cells.
+"""
+
+from collections.abc import Callable
+
+import numpy as np
+from PySide6 import QtGui
+
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+
+
+def build_palette(color_of: Callable[[int], QtGui.QColor]) -> np.ndarray:
+    """палітра uint32 для кожного можливого байта клітинки"""
+    return np.array([color_of(raw).rgba() for raw in range(256)], dtype=np.uint32)
+
+
+def rasterize(cells: np.ndarray, palette: np.ndarray) -> QtGui.QImage:
+    """
+    Перетворює клітинки чанка на зображення:
+    рядок зображення - друга координата cells, стовпець - перша
+    """
+    pixels = np.ascontiguousarray(palette[cells.view(np.uint8)].T)
+    image = QtGui.QImage(
+        pixels.data, CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE * 4, QtGui.QImage.Format_ARGB32
+    )
+    # QImage не володіє буфером pixels, тому робимо власну копію
+    return image.copy()
+
+
+class ChunkImages:
+    """
+    Кеш зображень чанків.
+    Зображення перебудовується, коли змінюється стан чанка чи його версія
+    (наприклад, кількість проходів біому в PREVIEW)
+    або на його місці в сітці опиняється інший об'єкт Chunk.
+    """
+
+    def __init__(self, palettes: dict[ChunkStates, np.ndarray]):
+        self.palettes = palettes
+        self._images: dict[
+            tuple[int, int], tuple[object, ChunkStates, int, QtGui.QImage]
+        ] = dict()
+
+    def get(self, pos: tuple[int, int], chunk, version: int = 0) -> QtGui.QImage | None:
+        """зображення чанка, або None, якщо для його стану немає палітри"""
+        state = chunk.state
+        palette = self.palettes.get(state)
+        if palette is None:
+            return None
+
+        cached = self._images.get(pos)
+        if (
+            cached is not None
+            and cached[0] is chunk
+            and cached[1] == state
+            and cached[2] == version
+        ):
+            return cached[3]
+        image = rasterize(chunk.cells, palette)
+        self._images[pos] = (chunk, state, version, image)
+        return image
+
+    def cached(self, pos: tuple[int, int]) -> QtGui.QImage | None:
+        """останнє побудоване зображення чанка, навіть якщо чанк відтоді змінився"""
+        cached = self._images.get(pos)
+        return None if cached is None else cached[3]
+
+    def retain(self, positions: set[tuple[int, int]]) -> None:
+        """забуває зображення всіх чанків, крім positions"""
+        self._images = {
+            pos: entry for pos, entry in self._images.items() if pos in positions
+        }
+
+    def clear(self) -> None:
+        self._images.clear()
+
+    def __len__(self) -> int:
+        return len(self._images)
@@ -1,54 +1,50 @@
-from math import floor
-import random
+import time
+from math import floor, log2
 
 from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtGui import QColor
 
-from src.backend.chunk import CHUNK_SIZE, ChunkStates, MAX_RANGE
+from src import colors
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+from src.backend.grid import Grid
+from src.ui.chunk_images import ChunkImages, build_palette
+from src.ui.loader import ChunkLoader
+from src.ui.lod import EMPTY, Overview, OverviewImages
+from src.ui.prefetch import PrefetchPlanner
 
-TERRAIN_BASE = {
-    0b00: QColor(0,   0,   128),  # WATER
-    0b10: QColor(34,  139, 34),   # LAND
-    0b11: QColor(139, 137, 137),  # MOUNTAIN
-}
-
-SUBTYPE_COLORS = {
-    0b00: {  # WATER
-        0b00: QColor(0,   0,   100),  # VERYDEEP
-        0b01: QColor(0,   0,   140),  # DEEP
-        0b10: QColor(0,   0,   180),  # MODERATE
-        0b11: QColor(0,   0,   220),  # SHALLOW
-    },
-    0b10: {  # LAND
-        0b00: QColor(194, 178, 128),  # SAND
-        0b01: QColor(34,  139, 34),   # GRASS
-        0b10: QColor(0,   100, 0),    # FOREST
-        0b11: QColor(85,  107, 47),   # HILL
-    },
-    0b11: {  # MOUNTAIN
-        0b00: QColor(160, 160, 160),  # LOW
-        0b01: QColor(130, 130, 130),  # MODERATE
-        0b10: QColor(100, 100, 100),  # HIGH
-        0b11: QColor(255, 250, 250),  # SNOWY
-    },
-}
+DEFAULT_COLOR = QColor(*colors.DEFAULT_COLOR)
 
-DEFAULT_COLOR = QColor(50, 50, 50)
 
 def get_color(raw: int) -> QColor:
-    terrain = raw & 0b11
-    subtype = (raw >> 2) & 0b11
-    return SUBTYPE_COLORS.get(terrain, {}).get(subtype, DEFAULT_COLOR)
+    return QColor(*colors.color(raw))
+
+
+def get_terrain_color(raw: int) -> QColor:
+    return QColor(*colors.terrain_color(raw))
+
+
+PALETTES = {
+    ChunkStates.GENERATED: build_palette(get_color),
+    # поки чанк генерується, показуємо лише рельєф
+    ChunkStates.PRE_GENERATED: build_palette(get_terrain_color),
+    # попередній біом до уточнення
+    ChunkStates.PREVIEW: build_palette(get_color),
+}
+OVERVIEW_PALETTE = build_palette(lambda raw: DEFAULT_COLOR if raw == EMPTY else get_color(raw))
 
 
 class GridView(QtWidgets.QWidget):
     """
     Відображає сітку та персонажа з камерою, що слідує за ним.
     Додає можливість зуму, діагональні рухи та догенерацію чанків.
+    Чанки попереду гравця передзавантажуються за оцінкою його швидкості.
     """
     PLAYER_SCALE = 4.5
     GENERATE_RADIUS = 2
-    WATER_THRESHOLD = MAX_RANGE * 0.3
+    FRAME_INTERVAL = 16  # мс
+    LOD_TEXEL = 4  # мінімальний розмір клітинки плитки огляду в пікселях
+    LAND_SEARCH_RADIUS = 10  # у клітинках
+    PREVIEW_TIERS = (8,)  # проходи біому, після яких чанк уже показується
 
     def __init__(self, grid, cells_w=50, cells_h=50, parent=None):
         super().__init__(parent)
@@ -57,6 +53,15 @@ class GridView(QtWidgets.QWidget):
         self.cells_h = cells_h
         self.player_pixmap = QtGui.QPixmap("src/ui/chelik.png")
         self.zoom = 1.0
+        self.loader = ChunkLoader(self.GENERATE_RADIUS, parent=self)
+        self.loader.generated.connect(self._on_chunks_generated)
+        self.loader.refined.connect(self._on_chunks_refined)
+        self.prefetcher = PrefetchPlanner()
+        self.images = ChunkImages(PALETTES)
+        self.overview = Overview()
+        self.overview_images = OverviewImages(self.overview, OVERVIEW_PALETTE)
+        # згенеровані потоком області, які ще треба додати в огляд
+        self._overview_pending = []
 
         self.player_position = self.find_land_position()
         self.current_chunk = (
@@ -69,18 +74,35 @@ class GridView(QtWidgets.QWidget):
         self.setMinimumSize(800, 600)
         self.setFocusPolicy(QtCore.Qt.StrongFocus)
 
+        self.frame_timer = QtCore.QTimer(self)
+        self.frame_timer.timeout.connect(self._tick)
+        self.frame_timer.start(self.FRAME_INTERVAL)
+
     def set_zoom(self, value: float):
         """Задає рівень зуму і оновлює відображення"""
         self.zoom = max(0.1, value)
         self.update()
 
     def generate_grid(self, seed: int, density: float):
-        """Генерує нову мапу за seed і density"""
-        random.seed(seed)
-        if hasattr(self.grid, 'density'):
-            self.grid.density = density
-        if hasattr(self.grid, 'clear'):
-            self.grid.clear()
+        """
+        Генерує нову мапу за seed і density.
+        Стара сітка закривається, щойно фоновий потік її відпустить;
+        нову потік ще не бачив, тож її можна генерувати тут без замка
+        """
+        self.loader.cancel()
+        self.prefetcher.reset()
+        self.images.clear()
+        self.overview.clear()
+        self.overview_images.clear()
+        self._overview_pending.clear()
+        old = self.grid
+        config = old.config()
+        # сховище зберігає чанки одного світу, тож переходить лише до того самого
+        same_world = (seed, density) == (old.seed, old.density)
+        if not same_world:
+            config["store"] = None
+        self.loader.retire(old, store=not same_world)
+        self.grid = Grid(density, seed=seed, **config)
         self.current_chunk = (0, 0)
         self._ensure_chunks()
         self.player_position = self.find_land_position()
@@ -92,37 +114,101 @@ class GridView(QtWidgets.QWidget):
         self.update()
 
     def clear_grid(self):
-        """Очищує мапу та генерує заново"""
-        if hasattr(self.grid, 'clear'):
-            self.grid.clear()
-        self.current_chunk = (0, 0)
-        self._ensure_chunks()
-        self.player_position = self.find_land_position()
-        self.current_chunk = (
-            floor(self.player_position[0] / CHUNK_SIZE),
-            floor(self.player_position[1] / CHUNK_SIZE)
-        )
-        self._ensure_chunks()
-        self.update()
-
-    def _is_water(self, gx: float, gy: float) -> bool:
-        """Повертає True, якщо вказані world-координати на воді"""
-        cx, cy = floor(gx / CHUNK_SIZE), floor(gy / CHUNK_SIZE)
-        ix, iy = int(gx - cx * CHUNK_SIZE), int(gy - cy * CHUNK_SIZE)
-        try:
-            chunk = self.grid[(cx, cy)]
-        except KeyError:
-            return True
-        if chunk.state == ChunkStates.VOID:
-            return True
-        return int(chunk.cells[ix, iy]) < self.WATER_THRESHOLD
+        """Очищує мапу та генерує заново той самий світ"""
+        self.generate_grid(self.grid.seed, self.grid.density)
 
     def _ensure_chunks(self):
-        """Генерує чанки навколо current_chunk"""
+        """Генерує чанки навколо current_chunk (синхронно)"""
         self.grid.generate_around(
             self.current_chunk,
             generated_radius=self.GENERATE_RADIUS
         )
+        self._update_overview(self.current_chunk, self.GENERATE_RADIUS)
+
+    def _update_overview(self, centre, radius):
+        """Додає в огляд згенеровані чанки навколо centre"""
+        x, y = centre
+        for cx in range(x - radius, x + radius + 1):
+            for cy in range(y - radius, y + radius + 1):
+                self.overview.add((cx, cy), self.grid[(cx, cy)])
+
+    def _request_chunks(self):
+        """Генерує чанки навколо current_chunk у фоновому потоці"""
+        self.loader.request(self.grid, self.current_chunk)
+
+    def _half_view(self) -> tuple[float, float]:
+        """Половина видимої області в клітинках"""
+        return self.cells_w / self.zoom / 2, self.cells_h / self.zoom / 2
+
+    def _visible_chunks(self, half_view) -> set[tuple[int, int]]:
+        x, y = self.player_position
+        hx, hy = half_view
+        return {
+            (cx, cy)
+            for cx in range(floor((x - hx) / CHUNK_SIZE), floor((x + hx) / CHUNK_SIZE) + 1)
+            for cy in range(floor((y - hy) / CHUNK_SIZE), floor((y + hy) / CHUNK_SIZE) + 1)
+        }
+
+    def _tick(self):
+        """
+        Кадр: оновлює швидкість гравця, огляд, передзавантажує чанки попереду
+        і уточнює PREVIEW-чанки. Поки фоновий потік тримає сітку, кадр
+        сітки не читає
+        """
+        now = time.monotonic()
+        if self.prefetcher.observe(self.player_position, now):
+            self.loader.drop_prefetch()
+        if not self.loader.grid_lock.acquire(blocking=False):
+            return
+        try:
+            self._tick_grid(now)
+        finally:
+            self.loader.grid_lock.release()
+
+    def _tick_grid(self, now):
+        if self._overview_pending:
+            pending, self._overview_pending = self._overview_pending, []
+            for centre, radius in pending:
+                self._update_overview(centre, radius)
+            self.update()
+        half_view = self._half_view()
+        visible = self._visible_chunks(half_view)
+        self.prefetcher.record_visible(self.grid, visible)
+        chunks = self.prefetcher.plan(self.grid, self.player_position, half_view, now)
+        if chunks:
+            self.loader.prefetch(self.grid, chunks)
+        if len(self.grid.refinements):
+            self.loader.refine(self.grid, self.current_chunk, visible)
+
+    def prefetch_stats(self):
+        """Статистика передзавантаження, зокрема hit_rate"""
+        return self.prefetcher.stats()
+
+    def _on_chunks_generated(self, result):
+        """
+        Викликається в GUI-потоці, коли фонова генерація завершилась.
+        Огляд оновлюється в наступному кадрі, під замком сітки
+        """
+        grid, centre = result
+        if grid is not self.grid:
+            return
+        radius = max(self.GENERATE_RADIUS, self.loader.PREFETCH_RADIUS)
+        self._overview_pending.append((centre, radius))
+        self.update()
+
+    def _on_chunks_refined(self, result):
+        """Уточнені чанки: остаточні додаються в огляд у наступному кадрі"""
+        grid, positions = result
+        if grid is not self.grid:
+            return
+        self._overview_pending += [(pos, 0) for pos in positions]
+        self.update()
+
+    def closeEvent(self, event):
+        self.frame_timer.stop()
+        self.loader.cancel()
+        self.loader.retire(self.grid)
+        super().closeEvent(event)
 
     def paintEvent(self, event):
         painter = QtGui.QPainter(self)
@@ -136,30 +222,70 @@ class GridView(QtWidgets.QWidget):
         ox = self.player_position[0] - (center_x / cw)
         oy = self.player_position[1] - (center_y / ch)
 
-        num_cols = int(w / cw) + 2
-        num_rows = int(h / ch) + 2
-        start_col = int(floor(ox))
-        start_row = int(floor(oy))
-
-        for row in range(num_rows):
-            for col in range(num_cols):
-                gx = start_col + col
-                gy = start_row + row
-                cx, cy = floor(gx / CHUNK_SIZE), floor(gy / CHUNK_SIZE)
-                ix, iy = int(gx - cx * CHUNK_SIZE), int(gy - cy * CHUNK_SIZE)
-                try:
-                    chunk = self.grid[(cx, cy)]
-                except KeyError:
-                    chunk = None
-                if not chunk or chunk.state == ChunkStates.VOID:
-                    color = DEFAULT_COLOR
+        # незгенеровані чанки лишаються кольору фону
+        painter.fillRect(QtCore.QRectF(0, 0, w, h), DEFAULT_COLOR)
+
+        level = self.lod_level(cw)
+        if level:
+            self._paint_overview(painter, level, ox, oy, w / cw, h / ch, cw, ch)
+        else:
+            # поки сітку тримає фоновий потік, малюємо збережені зображення
+            locked = self.loader.grid_lock.acquire(blocking=False)
+            try:
+                self._paint_chunks(painter, ox, oy, w / cw, h / ch, cw, ch, locked)
+            finally:
+                if locked:
+                    self.loader.grid_lock.release()
+
+        self._paint_player(painter, cw, ch, center_x, center_y)
+
+    def lod_level(self, cw: float) -> int:
+        """
+        Рівень огляду для клітинки шириною cw пікселів:
+        найгрубший, за якого клітинка плитки не менша за LOD_TEXEL
+        """
+        level = floor(log2(self.LOD_TEXEL / cw))
+        return max(0, min(level, self.overview.max_level))
+
+    def _paint_chunks(self, painter, ox, oy, cols, rows, cw, ch, locked=True):
+        """
+        Кожен видимий чанк одним зображенням 16x16.
+        Без замка сітки (locked=False) - лише вже збережені зображення
+        """
+        visible = set()
+        for cx in range(floor(ox / CHUNK_SIZE), floor((ox + cols) / CHUNK_SIZE) + 1):
+            for cy in range(floor(oy / CHUNK_SIZE), floor((oy + rows) / CHUNK_SIZE) + 1):
+                visible.add((cx, cy))
+                if locked:
+                    image = self.images.get(
+                        (cx, cy), self.grid[(cx, cy)], self.grid.biome_passes((cx, cy))
+                    )
                 else:
-                    raw = int(chunk.cells[ix, iy])
-                    color = get_color(raw)
-                px = (col * cw) - ((ox - start_col) * cw)
-                py = (row * ch) - ((oy - start_row) * ch)
-                painter.fillRect(QtCore.QRectF(px, py, cw + 1, ch + 1), color)
+                    image = self.images.cached((cx, cy))
+                if image is None:
+                    continue
+                target = QtCore.QRectF(
+                    (cx * CHUNK_SIZE - ox) * cw, (cy * CHUNK_SIZE - oy) * ch,
+                    CHUNK_SIZE * cw, CHUNK_SIZE * ch
+                )
+                painter.drawImage(target, image)
+        if len(self.images) > 4 * len(visible):
+            self.images.retain(visible)
+
+    def _paint_overview(self, painter, level, ox, oy, cols, rows, cw, ch):
+        """Плитки огляду рівня level, кожна покриває 2^level x 2^level чанків"""
+        span = CHUNK_SIZE << level
+        for qx in range(floor(ox / span), floor((ox + cols) / span) + 1):
+            for qy in range(floor(oy / span), floor((oy + rows) / span) + 1):
+                image = self.overview_images.get(level, (qx, qy))
+                if image is None:
+                    continue
+                target = QtCore.QRectF(
+                    (qx * span - ox) * cw, (qy * span - oy) * ch, span * cw, span * ch
+                )
+                painter.drawImage(target, image)
 
+    def _paint_player(self, painter, cw, ch, center_x, center_y):
         size = int(min(cw, ch) * self.PLAYER_SCALE)
         scaled = self.player_pixmap.scaled(
             size, size,
@@ -191,7 +317,7 @@ class GridView(QtWidgets.QWidget):
             )
             if new_chunk != self.current_chunk:
                 self.current_chunk = new_chunk
-                self._ensure_chunks()
+                self._request_chunks()
             self.update()
 
     def keyReleaseEvent(self, event):
@@ -199,18 +325,8 @@ class GridView(QtWidgets.QWidget):
             self.pressed_keys.remove(event.key())
 
     def find_land_position(self):
-        """Шукає найближчу до (0,0) сушу"""
-        radius = 10
-        for r in range(radius + 1):
-            for dx in range(-r, r + 1):
-                for dy in range(-r, r + 1):
-                    gx, gy = dx, dy
-                    cx, cy = floor(gx / CHUNK_SIZE), floor(gy / CHUNK_SIZE)
-                    ix, iy = int(gx - cx * CHUNK_SIZE), int(gy - cy * CHUNK_SIZE)
-                    try:
-                        chunk = self.grid[(cx, cy)]
-                    except KeyError:
-                        continue
-                    if chunk.state != ChunkStates.VOID and int(chunk.cells[ix, iy]) >= self.WATER_THRESHOLD:
-                        return [float(gx), float(gy)]
-        return [0.0, 0.0]
+        """Шукає найближчу до (0,0) сушу за зведеннями чанків"""
+        position = self.grid.nearest(0, 0, radius=self.LAND_SEARCH_RADIUS)
+        if position is None:
+            return [0.0, 0.0]
+        return [float(position[0]), float(position[1])]
@@ -0,0 +1,192 @@
+import sys
+import threading
+
+from PySide6 import QtCore
+
+from src.backend.grid import diamond
+
+
+class _Job(QtCore.QRunnable):
+    def __init__(self, loader: "ChunkLoader"):
+        super().__init__()
+        self.loader = loader
+
+    def run(self):
+        self.loader._work()
+
+
+class ChunkLoader(QtCore.QObject):
+    """
+    Генерує чанки у фоновому потоці.
+    Зберігається лише останній запит: старіші, ще не початі, замінюються новим,
+    а поточна генерація зупиняється між фазами, якщо гравець відійшов далі за radius.
+    Передзавантаження має нижчий пріоритет: його черга обробляється,
+    лише коли немає звичайного запиту, а новий запит перериває його між фазами.
+    Воно йде через generate_chunks, тож робоча область сітки (яку не чіпає
+    витіснення) лишається навколо гравця.
+    Найнижчий пріоритет має уточнення PREVIEW-чанків: воно йде партіями
+    по REFINE_BATCH, лише коли обидві черги порожні.
+
+    Потік працює з сіткою лише під grid_lock. GUI-потік читає сітку під тим самим
+    замком, але не чекає на нього: поки замок зайнятий, він малює збережені
+    зображення чанків. Сигнали передають сітку, з якою працював потік.
+    """
+    generated = QtCore.Signal(object)
+    refined = QtCore.Signal(object)
+    PREFETCH_RADIUS = 2
+    REFINE_BATCH = 8
+
+    def __init__(self, radius: int, parent=None):
+        super().__init__(parent)
+        self.radius = radius
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._lock = threading.Lock()
+        self.grid_lock = threading.Lock()
+        self._pending = None
+        self._prefetch = []
+        self._refine = None
+        self._current = None
+        self._grid = None
+        self._retired = []
+        self._stopping = False
+        self._prefetching = False
+        self._running = False
+
+    def request(self, grid, centre):
+        """Ставить у чергу генерацію навколо centre"""
+        with self._lock:
+            self._pending = (grid, centre)
+        self._start()
+
+    def prefetch(self, grid, centres):
+        """Додає чанки в чергу передзавантаження"""
+        with self._lock:
+            queued = {centre for _, centre in self._prefetch}
+            self._prefetch += [(grid, c) for c in centres if c not in queued]
+        self._start()
+
+    def refine(self, grid, centre, visible):
+        """Уточнює PREVIEW-чанки, коли немає іншої роботи: спершу видимі"""
+        with self._lock:
+            self._refine = (grid, centre, visible)
+        self._start()
+
+    def drop_prefetch(self):
+        """Скасовує ще не початі передзавантаження"""
+        with self._lock:
+            self._prefetch = []
+
+    def _start(self):
+        with self._lock:
+            if self._running or (
+                self._pending is None and not self._prefetch and not self._refinable()
+            ):
+                return
+            self._running = True
+        self._pool.start(_Job(self))
+
+    def _refinable(self) -> bool:
+        return self._refine is not None and len(self._refine[0].refinements) > 0
+
+    def busy(self) -> bool:
+        with self._lock:
+            return self._running
+
+    def cancel(self):
+        """
+        Скасовує чергу; поточна генерація зупиняється після своєї фази.
+        Не чекає на потік, тож не блокує GUI
+        """
+        with self._lock:
+            self._pending = None
+            self._prefetch = []
+            self._refine = None
+            self._stopping = self._running
+
+    def retire(self, grid, store: bool = True):
+        """Закриває сітку (див. Grid.close), щойно потік нею не користується"""
+        with self._lock:
+            if self._running and self._grid is grid:
+                self._retired.append((grid, store))
+                return
+        grid.close(store=store)
+
+    def _cancelled(self) -> bool:
+        with self._lock:
+            if self._stopping:
+                return True
+            if self._pending is None or self._current is None:
+                return False
+            if self._prefetching:
+                return True
+            grid, (x, y) = self._pending
+            cx, cy = self._current
+            return abs(x - cx) + abs(y - cy) > self.radius
+
+    def _work(self):
+        """
+        Виконує завдання, доки черги не спорожніють. Що б не сталося,
+        потік знімає прапорець _running і закриває списані сітки
+        """
+        try:
+            self._loop()
+        finally:
+            with self._lock:
+                self._running = False
+                self._current = self._grid = None
+                retired, self._retired = self._retired, []
+            for old, store in retired:
+                old.close(store=store)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                refining = False
+                if self._pending is not None:
+                    grid, centre = self._pending
+                    self._pending = None
+                    radius, self._prefetching = self.radius, False
+                elif self._prefetch:
+                    grid, centre = self._prefetch.pop(0)
+                    radius, self._prefetching = self.PREFETCH_RADIUS, True
+                elif self._refinable():
+                    grid, centre, visible = self._refine
+                    refining = True
+                else:
+                    return
+                self._current = None if refining else centre
+                prefetching = self._prefetching and not refining
+                self._grid = grid
+                self._stopping = False
+            try:
+                with self.grid_lock:
+                    if refining:
+                        grid.focus(centre, visible)
+                        positions = grid.refine(self.REFINE_BATCH)
+                    elif prefetching:
+                        grid.generate_chunks(diamond(centre, radius), cancelled=self._cancelled)
+                    else:
+                        grid.generate_around(
+                            centre, generated_radius=radius, cancelled=self._cancelled
+                        )
+            except Exception:
+                # невдале завдання не зупиняє наступні: повідомляємо і йдемо далі
+                sys.excepthook(*sys.exc_info())
+                if refining:
+                    with self._lock:
+                        self._refine = None
+                continue
+            finally:
+                with self._lock:
+                    retired, self._retired = self._retired, []
+                for old, store in retired:
+                    old.close(store=store)
+            try:
+                if refining:
+                    self.refined.emit((grid, positions))
+                else:
+                    self.generated.emit((grid, centre))
+            except RuntimeError:
+                # вікно закрили, поки потік працював: сповіщати нікого
+                return
@@ -0,0 +1,135 @@
+"""
+Огляд мапи з кількома рівнями деталізації.
+
+Рівень L - це квадродерево плиток 16x16, кожна з яких покриває
+2^L x 2^L чанків. Клітинка плитки - код рельєфу та біому (молодші 4 біти),
+що переважає у відповідному блоці. Рівні 1-4 складаються зі зменшених
+копій чанків (8x8, 4x4, 2x2, 1x1), вищі - з чвертей дочірніх плиток.
+Кожен новий GENERATED чанк оновлює лише плитки над ним.
+"""
+
+import numpy as np
+from PySide6 import QtGui
+
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+from src.ui.chunk_images import rasterize
+
+"""код клітинки плитки, під якою ще немає жодного згенерованого чанка"""
+EMPTY = 16
+CODES = EMPTY + 1
+CHUNK_LEVELS = 4  # CHUNK_SIZE == 2 ** CHUNK_LEVELS
+MAX_LEVEL = 8
+
+
+def majority(codes: np.ndarray, block: int) -> np.ndarray:
+    """
+    Найчастіший код у кожному блоці block x block.
+    EMPTY перемагає лише там, де блок порожній повністю
+    """
+    n, m = codes.shape[0] // block, codes.shape[1] // block
+    onehot = codes[..., None] == np.arange(CODES, dtype=np.uint8)
+    counts = onehot.reshape(n, block, m, block, CODES).sum(axis=(1, 3))
+    known = counts[..., :EMPTY]
+    return np.where(known.any(axis=-1), known.argmax(axis=-1), EMPTY).astype(np.uint8)
+
+
+def chunk_mips(cells: np.ndarray) -> list[np.ndarray]:
+    """зменшені копії чанка 8x8, 4x4, 2x2 і 1x1"""
+    codes = (cells & 0b1111).astype(np.uint8)
+    return [majority(codes, 2**level) for level in range(1, CHUNK_LEVELS + 1)]
+
+
+class Overview:
+    """
+    Квадродерево плиток рівнів 1..max_level.
+    Не залежить від Qt; version(level, tile) змінюється з кожним оновленням плитки
+    """
+
+    def __init__(self, max_level: int = MAX_LEVEL):
+        self.max_level = max_level
+        self._tiles: list[dict[tuple[int, int], np.ndarray]] = [
+            dict() for _ in range(max_level + 1)
+        ]
+        self._versions: dict[tuple[int, tuple[int, int]], int] = dict()
+        self._added: set[tuple[int, int]] = set()
+
+    def add(self, pos: tuple[int, int], chunk) -> bool:
+        """
+        Додає GENERATED чанк і оновлює плитки над ним.
+        Чанк на тій самій позиції додається лише раз: за тим самим seed
+        його клітинки не змінюються
+        """
+        if chunk.state != ChunkStates.GENERATED or pos in self._added:
+            return False
+        self._added.add(pos)
+
+        x, y = pos
+        for level, mip in enumerate(chunk_mips(chunk.cells), start=1):
+            if level > self.max_level:
+                return True
+            size = CHUNK_SIZE >> level
+            key = (x >> level, y >> level)
+            ox = (x - (key[0] << level)) * size
+            oy = (y - (key[1] << level)) * size
+            self._tile(level, key)[ox : ox + size, oy : oy + size] = mip
+            self._touch(level, key)
+
+        half = CHUNK_SIZE // 2
+        for level in range(CHUNK_LEVELS + 1, self.max_level + 1):
+            child = (x >> (level - 1), y >> (level - 1))
+            key = (x >> level, y >> level)
+            ox = (child[0] - 2 * key[0]) * half
+            oy = (child[1] - 2 * key[1]) * half
+            quarter = majority(self._tiles[level - 1][child], 2)
+            self._tile(level, key)[ox : ox + half, oy : oy + half] = quarter
+            self._touch(level, key)
+        return True
+
+    def _tile(self, level: int, key: tuple[int, int]) -> np.ndarray:
+        tiles = self._tiles[level]
+        if key not in tiles:
+            tiles[key] = np.full((CHUNK_SIZE, CHUNK_SIZE), EMPTY, dtype=np.uint8)
+        return tiles[key]
+
+    def _touch(self, level: int, key: tuple[int, int]) -> None:
+        self._versions[level, key] = self._versions.get((level, key), 0) + 1
+
+    def tile(self, level: int, key: tuple[int, int]) -> np.ndarray | None:
+        return self._tiles[level].get(key)
+
+    def version(self, level: int, key: tuple[int, int]) -> int:
+        return self._versions.get((level, key), 0)
+
+    def clear(self) -> None:
+        for tiles in self._tiles:
+            tiles.clear()
+        self._versions.clear()
+        self._added.clear()
+
+    def __len__(self) -> int:
+        """кількість доданих чанків"""
+        return len(self._added)
+
+
+class OverviewImages:
+    """кеш зображень плиток огляду, перебудовуються зі зміною версії"""
+
+    def __init__(self, overview: Overview, palette: np.ndarray):
+        self.overview = overview
+        self.palette = palette
+        self._images: dict[tuple[int, tuple[int, int]], tuple[int, QtGui.QImage]] = dict()
+
+    def get(self, level: int, key: tuple[int, int]) -> QtGui.QImage | None:
+        tile = self.overview.tile(level, key)
+        if tile is None:
+            return None
+        version = self.overview.version(level, key)
+        cached = self._images.get((level, key))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        image = rasterize(tile, self.palette)
+        self._images[level, key] = (version, image)
+        return image
+
+    def clear(self) -> None:
+        self._images.clear()
@@ -36,7 +36,7 @@ def main():
 
     app = QtWidgets.QApplication(sys.argv)
     initial_radius = 2
-    grid = Grid(density=0.5)
+    grid = Grid(density=0.5, preview_tiers=GridView.PREVIEW_TIERS)
     window = MainWindow(grid, radius=initial_radius)
     window.resize(1000, 700)
     window.show()
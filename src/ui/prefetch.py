@@ -0,0 +1,202 @@
+"""
+Планувальник передзавантаження чанків попереду гравця.
+
+Не залежить від Qt: GridView передає йому позицію гравця, розмір видимої
+області та множину видимих чанків, а він повертає чанки, які варто
+згенерувати наперед.
+"""
+
+import itertools
+from math import cos, floor, hypot, inf, radians
+from typing import NamedTuple
+
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+
+"""стани, у яких чанк уже можна показати"""
+SHOWN = (ChunkStates.GENERATED, ChunkStates.PREVIEW)
+
+
+class PrefetchStats(NamedTuple):
+    issued: int
+    hits: int
+    late: int
+    misses: int
+    cancelled: int
+
+    @property
+    def hit_rate(self) -> float:
+        """частка нових видимих чанків, які встигли згенеруватися завдяки передзавантаженню"""
+        seen = self.hits + self.late + self.misses
+        return self.hits / seen if seen else 0.0
+
+
+def _overlap(distance: float, speed: float, reach: float) -> tuple[float, float]:
+    """проміжок часу t, коли |distance - speed * t| <= reach, по одній осі"""
+    if speed == 0:
+        return (-inf, inf) if abs(distance) <= reach else (inf, -inf)
+    first = (distance - reach) / speed
+    second = (distance + reach) / speed
+    return min(first, second), max(first, second)
+
+
+def time_until_visible(
+    position: tuple[float, float],
+    velocity: tuple[float, float],
+    half_view: tuple[float, float],
+    chunk: tuple[int, int],
+) -> float:
+    """Через скільки секунд чанк потрапить в огляд, якщо гравець рухатиметься так само"""
+    start, end = 0.0, inf
+    for axis in (0, 1):
+        centre = chunk[axis] * CHUNK_SIZE + CHUNK_SIZE / 2
+        low, high = _overlap(
+            centre - position[axis], velocity[axis], half_view[axis] + CHUNK_SIZE / 2
+        )
+        start, end = max(start, low), min(end, high)
+    return start if start <= end else inf
+
+
+def _forget_oldest(entries: dict, limit: int) -> None:
+    """лишає в словнику не більше limit найновіших записів"""
+    for pos in list(itertools.islice(entries, max(0, len(entries) - limit))):
+        del entries[pos]
+
+
+class PrefetchPlanner:
+    """
+    Оцінює швидкість гравця за останніми переміщеннями і ранжує чанки
+    за часом, через який вони стануть видимими.
+
+    look_ahead  - на скільки секунд уперед передзавантажувати
+    budget      - скільки нових чанків можна запросити за кадр
+    smoothing   - вага останнього переміщення в оцінці швидкості
+    turn_angle  - поворот (у градусах), після якого запити в черзі скасовуються
+    memory      - скільки побачених і запитаних чанків пам'ятати для статистики
+    """
+
+    def __init__(
+        self,
+        look_ahead: float = 2.0,
+        budget: int = 2,
+        smoothing: float = 0.2,
+        turn_angle: float = 60.0,
+        memory: int = 4096,
+    ):
+        self.look_ahead = look_ahead
+        self.budget = budget
+        self.smoothing = smoothing
+        self.turn_angle = turn_angle
+        self.memory = memory
+
+        self.velocity = (0.0, 0.0)
+        self._last = None
+        self._heading = None
+        self._pending: dict[tuple[int, int], float] = dict()
+        # словники як впорядковані множини: найдавніші записи забуваються першими
+        self._prefetched: dict[tuple[int, int], None] = dict()
+        self._seen: dict[tuple[int, int], None] = dict()
+        self._counts = dict(issued=0, hits=0, late=0, misses=0, cancelled=0)
+
+    def observe(self, position: tuple[float, float], now: float) -> bool:
+        """
+        Оновлює оцінку швидкості (клітинок за секунду).
+        Повертає True, якщо гравець різко повернув і черга вже не актуальна
+        """
+        if self._last is not None:
+            (x, y), then = self._last
+            dt = now - then
+            if dt > 0:
+                a = self.smoothing
+                self.velocity = (
+                    a * (position[0] - x) / dt + (1 - a) * self.velocity[0],
+                    a * (position[1] - y) / dt + (1 - a) * self.velocity[1],
+                )
+        self._last = ((position[0], position[1]), now)
+
+        speed = hypot(*self.velocity)
+        if speed < 1e-6:
+            return False
+        heading = (self.velocity[0] / speed, self.velocity[1] / speed)
+        previous, self._heading = self._heading, heading
+        if previous is None:
+            return False
+        alignment = heading[0] * previous[0] + heading[1] * previous[1]
+        turned = alignment < cos(radians(self.turn_angle))
+        if turned:
+            self._counts["cancelled"] += len(self._pending)
+            for pos in self._pending:
+                self._prefetched.pop(pos, None)
+            self._pending.clear()
+        return turned
+
+    def plan(
+        self,
+        grid,
+        position: tuple[float, float],
+        half_view: tuple[float, float],
+        now: float,
+    ) -> list[tuple[int, int]]:
+        """
+        Повертає до budget нових чанків для передзавантаження,
+        спершу ті, що з'являться в огляді раніше.
+        Запит, який не виконався за look_ahead секунд, можна повторити
+        """
+        self._pending = {
+            pos: issued
+            for pos, issued in self._pending.items()
+            if now - issued < self.look_ahead and grid[pos].state not in SHOWN
+        }
+        speed = hypot(*self.velocity)
+        if speed < 1e-6:
+            return []
+
+        reach = speed * self.look_ahead
+        x0 = floor((position[0] - half_view[0] - reach) / CHUNK_SIZE)
+        x1 = floor((position[0] + half_view[0] + reach) / CHUNK_SIZE)
+        y0 = floor((position[1] - half_view[1] - reach) / CHUNK_SIZE)
+        y1 = floor((position[1] + half_view[1] + reach) / CHUNK_SIZE)
+
+        ranked = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                if (cx, cy) in self._pending:
+                    continue
+                t = time_until_visible(position, self.velocity, half_view, (cx, cy))
+                if 0 < t <= self.look_ahead and grid[cx, cy].state not in SHOWN:
+                    ranked.append((t, (cx, cy)))
+        ranked.sort()
+
+        chosen = [pos for _, pos in ranked[: self.budget]]
+        self._pending.update((pos, now) for pos in chosen)
+        self._prefetched.update(dict.fromkeys(chosen))
+        _forget_oldest(self._prefetched, self.memory)
+        self._counts["issued"] += len(chosen)
+        return chosen
+
+    def record_visible(self, grid, visible: set[tuple[int, int]]) -> None:
+        """Рахує влучання для чанків, що вперше з'явилися в огляді"""
+        for pos in visible:
+            if pos in self._seen:
+                # щойно бачений чанк стає наймолодшим записом
+                del self._seen[pos]
+                self._seen[pos] = None
+                continue
+            self._seen[pos] = None
+            generated = grid[pos].state in SHOWN
+            if pos in self._prefetched:
+                del self._prefetched[pos]
+                self._counts["hits" if generated else "late"] += 1
+            elif not generated:
+                self._counts["misses"] += 1
+        _forget_oldest(self._seen, self.memory)
+
+    def reset(self) -> None:
+        """Нова мапа: забуває чанки та швидкість, але не статистику"""
+        self.velocity = (0.0, 0.0)
+        self._last = self._heading = None
+        self._pending.clear()
+        self._prefetched.clear()
+        self._seen.clear()
+
+    def stats(self) -> PrefetchStats:
+        return PrefetchStats(**self._counts)
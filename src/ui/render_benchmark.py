@@ -0,0 +1,80 @@
+"""
+Час кадру GridView залежно від зуму.
+
+Usage:
+    python -m src.ui.render_benchmark [--zoom 0.1 0.5 1 2] [--frames 30] [--radius 8]
+
+Мапа генерується заздалегідь, тож вимірюється лише відмальовка.
+Без дисплея Qt запускається з платформою offscreen.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+
+def measure(
+    zooms: list[float],
+    frames: int = 30,
+    radius: int = 8,
+    seed: int = 1,
+    size: tuple[int, int] = (800, 600),
+) -> dict[float, dict]:
+    """час кожного кадру (мс) і рівень огляду для кожного зуму"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtGui, QtWidgets
+
+    from src.backend.grid import Grid
+    from src.ui.grid_view import GridView
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    grid = Grid(0.5, seed=seed)
+    grid.generate_around((0, 0), generated_radius=radius)
+    view = GridView(grid)
+    view.frame_timer.stop()
+    view.resize(*size)
+    for pos, chunk in grid.chunks.items():
+        view.overview.add(pos, chunk)
+    image = QtGui.QImage(*size, QtGui.QImage.Format_RGB32)
+
+    results = dict()
+    for zoom in zooms:
+        view.set_zoom(zoom)
+        view.images.clear()
+        view.overview_images.clear()
+        times = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            view.render(image)
+            times.append((time.perf_counter() - start) * 1000)
+        level = view.lod_level(view.width() / view.cells_w * zoom)
+        results[zoom] = {"lod": level, "times": times}
+
+    view.close()
+    app.processEvents()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="frame time of GridView per zoom level")
+    parser.add_argument("--zoom", type=float, nargs="+", default=[0.1, 0.25, 0.5, 1.0, 2.0])
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--radius", type=int, default=8, help="generated radius in chunks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--size", type=int, nargs=2, default=[800, 600])
+    args = parser.parse_args()
+
+    results = measure(args.zoom, args.frames, args.radius, args.seed, tuple(args.size))
+    print(f"{'zoom':>6} {'lod':>4} {'first ms':>9} {'mean ms':>8} {'max ms':>7}")
+    for zoom, result in results.items():
+        times = result["times"]
+        rest = times[1:] or times
+        print(
+            f"{zoom:>6} {result['lod']:>4} {times[0]:>9.2f}"
+            f" {sum(rest) / len(rest):>8.2f} {max(rest):>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+The wire format of the chunk server (see server.py and client.py).
+
+Every message is a 4-byte big-endian length followed by its payload, at
+most MAX_MESSAGE bytes; a longer frame ends the connection.
+
+Request:  op u8, id u32, encoding u8, x0 i32, y0 i32, x1 i32, y1 i32
+          (get_chunk only reads x0 and y0, stats none of them)
+Response: id u32, status u8, then
+          OK     count u32 and per chunk x i32, y i32, state u8,
+                 encoding u8, length u16 and the encoded cells,
+                 or a JSON object for stats
+          ERROR  a UTF-8 message
+
+Cells are the 16x16 int8 of a chunk, rows first. RLE stores runs as
+(length - 1, value) byte pairs; a chunk whose RLE or zlib form is not
+smaller than 256 bytes is sent RAW.
+"""
+
+import asyncio
+import struct
+import zlib
+
+import numpy as np
+
+from src.backend.chunk import CHUNK_SIZE, CODE_STATES, STATE_CODES, ChunkStates
+
+GET_CHUNK, GET_REGION, STATS = 1, 2, 3
+RAW, RLE, ZLIB = 0, 1, 2
+ENCODINGS = {"raw": RAW, "rle": RLE, "zlib": ZLIB}
+OK, ERROR = 0, 1
+
+LENGTH = struct.Struct(">I")
+REQUEST = struct.Struct(">BIBiiii")
+RESPONSE = struct.Struct(">IB")
+COUNT = struct.Struct(">I")
+CHUNK = struct.Struct(">iiBBH")
+
+CELLS = CHUNK_SIZE * CHUNK_SIZE
+
+"""the longest payload, a 64x64 region of raw chunks fits with room to spare"""
+MAX_MESSAGE = 4 << 20
+
+
+class FrameError(ConnectionError):
+    """the peer announced a message longer than the reader accepts"""
+
+
+def rle_encode(cells: np.ndarray) -> bytes:
+    flat = np.ascontiguousarray(cells).reshape(-1).view(np.uint8)
+    starts = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+    runs = np.empty((len(starts), 2), dtype=np.uint8)
+    runs[:, 0] = np.diff(np.append(starts, flat.size)) - 1
+    runs[:, 1] = flat[starts]
+    return runs.tobytes()
+
+
+def rle_decode(data: bytes) -> np.ndarray:
+    runs = np.frombuffer(data, dtype=np.uint8).reshape(-1, 2)
+    return np.repeat(runs[:, 1], runs[:, 0].astype(np.intp) + 1).view(np.int8)
+
+
+def encode_cells(cells: np.ndarray, encoding: int) -> tuple[int, bytes]:
+    """the encoding actually used and the encoded cells"""
+    raw = np.ascontiguousarray(cells, dtype=np.int8).tobytes()
+    if encoding == RLE:
+        data = rle_encode(cells)
+    elif encoding == ZLIB:
+        data = zlib.compress(raw, 1)
+    else:
+        return RAW, raw
+    return (encoding, data) if len(data) < CELLS else (RAW, raw)
+
+
+def decode_cells(encoding: int, data: bytes) -> np.ndarray:
+    if encoding == RLE:
+        flat = rle_decode(data)
+    elif encoding == ZLIB:
+        flat = np.frombuffer(zlib.decompress(data), dtype=np.int8)
+    else:
+        flat = np.frombuffer(data, dtype=np.int8)
+    return flat.reshape(CHUNK_SIZE, CHUNK_SIZE)
+
+
+def pack_chunks(
+    chunks: list[tuple[tuple[int, int], ChunkStates, np.ndarray]], encoding: int
+) -> bytes:
+    parts = [COUNT.pack(len(chunks))]
+    for (x, y), state, cells in chunks:
+        used, data = encode_cells(cells, encoding)
+        parts.append(CHUNK.pack(x, y, STATE_CODES[state], used, len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def unpack_chunks(
+    payload: bytes, offset: int = 0
+) -> dict[tuple[int, int], tuple[np.ndarray, ChunkStates]]:
+    (count,) = COUNT.unpack_from(payload, offset)
+    offset += COUNT.size
+    chunks = dict()
+    for _ in range(count):
+        x, y, state, encoding, length = CHUNK.unpack_from(payload, offset)
+        offset += CHUNK.size
+        cells = decode_cells(encoding, payload[offset : offset + length])
+        offset += length
+        chunks[x, y] = (cells, CODE_STATES[state])
+    return chunks
+
+
+async def read_message(reader: asyncio.StreamReader, limit: int = MAX_MESSAGE) -> bytes:
+    """the next payload, FrameError before reading one longer than limit"""
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    if length > limit:
+        raise FrameError(f"message of {length} bytes, at most {limit} are accepted")
+    return await reader.readexactly(length)
+
+
+def frame(payload: bytes) -> bytes:
+    return LENGTH.pack(len(payload)) + payload
@@ -0,0 +1,58 @@
+import numpy as np
+
+from src.backend.arena import FREE, ChunkArena
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+
+
+def filled(value: int) -> np.ndarray:
+    return np.full((CHUNK_SIZE, CHUNK_SIZE), value, dtype=np.int8)
+
+
+def test_allocating_past_capacity_grows_the_slab():
+    arena = ChunkArena(0.5, block_size=4)
+    chunks = [arena.allocate((i, -i)) for i in range(9)]
+    for i, chunk in enumerate(chunks):
+        chunk.cells = filled(i)
+        chunk.state = ChunkStates.PRE_GENERATED
+
+    assert arena.capacity >= 9 and arena.capacity % 4 == 0
+    assert len({chunk.slot for chunk in chunks}) == 9
+    assert len(arena) == 9
+    for i in range(9):
+        np.testing.assert_array_equal(arena[(i, -i)].cells, filled(i))
+        assert arena[(i, -i)].state == ChunkStates.PRE_GENERATED
+
+
+def test_views_taken_before_growth_see_their_data():
+    arena = ChunkArena(0.5, block_size=2)
+    first = arena.create((0, 0))
+    cells = first.cells.copy()
+    capacity = arena.capacity
+
+    for i in range(1, 2 * capacity + 1):
+        arena.create((i, 0))
+    assert arena.capacity > capacity
+
+    # the view reads through the arena, not a copy of the old slab
+    np.testing.assert_array_equal(first.cells, cells)
+    assert first.state == ChunkStates.NOT_GENERATED
+    first.cells = filled(3)
+    np.testing.assert_array_equal(arena[(0, 0)].cells, filled(3))
+
+
+def test_released_slots_are_reused_oldest_first():
+    arena = ChunkArena(0.5, block_size=4)
+    for i in range(4):
+        arena.create((i, 0))
+    capacity = arena.capacity
+    slot_one, slot_two = arena.slot((1, 0)), arena.slot((2, 0))
+
+    arena.release((2, 0))
+    arena.release((1, 0))
+    assert arena.states[slot_one] == FREE and (1, 0) not in arena
+    assert arena.slot((1, 0)) == -1
+
+    assert arena.allocate((7, 7)).slot == slot_two
+    assert arena.allocate((8, 8)).slot == slot_one
+    assert arena.capacity == capacity
+    assert sorted(arena) == [(0, 0), (3, 0), (7, 7), (8, 8)]
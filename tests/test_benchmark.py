@@ -0,0 +1,45 @@
+import json
+import subprocess
+import sys
+
+from src.benchmark import measure, run
+
+
+def test_measure_runs_setup_before_every_call():
+    events = []
+    result = measure(lambda: events.append("call"), 5, setup=lambda: events.append("setup"))
+
+    assert events == ["setup", "call"] * 6
+    assert result["repeats"] == 5
+
+
+def test_run_times_every_kernel_of_the_engine():
+    report = run(["kernels"], quick=True, engines=["numpy"])
+    results = report["results"]
+
+    assert report["engines"] == ["numpy"]
+    for case in ("pre_generate_chunk", "generate_chunk_biome", "textures"):
+        assert f"kernels.numpy.{case}[1]" in results
+        assert f"kernels.numpy.{case}[64]" in results
+    assert "kernels.evolve[18x18]" in results
+    for result in results.values():
+        assert 0 < result["min"] <= result["median"]
+        assert result["repeats"] > 0
+
+
+def test_engines_option_filters_the_per_engine_cases(tmp_path):
+    out = tmp_path / "results.json"
+    subprocess.run(
+        [
+            sys.executable, "-m", "src.benchmark", "run", "--groups", "chunk", "kernels",
+            "--engines", "memo", "--quick", "--out", str(out),
+        ],
+        check=True, capture_output=True,
+    )
+    results = json.loads(out.read_text())["results"]
+
+    engines = {name.split(".")[1] for name in results if name.count(".") > 1}
+    assert engines == {"memo"}
+    assert "kernels.memo.evolve[258x258]" in results
+    assert not any(name.startswith("chunk.") for name in results)
+    assert all(result["median"] > 0 for result in results.values())
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PySide6")
+
+from src.backend.chunk import CHUNK_SIZE, ChunkStates  # noqa: E402
+from src.ui.chunk_images import build_palette, rasterize  # noqa: E402
+from src.ui.grid_view import PALETTES, get_color, get_terrain_color  # noqa: E402
+
+
+def test_palette_holds_color_of_for_every_byte():
+    palette = build_palette(get_color)
+    assert palette.shape == (256,) and palette.dtype == np.uint32
+    for raw in range(256):
+        assert palette[raw] == get_color(raw).rgba()
+
+
+@pytest.mark.parametrize("state", list(PALETTES))
+def test_every_pixel_has_the_color_of_its_cell(state):
+    color_of = get_terrain_color if state == ChunkStates.PRE_GENERATED else get_color
+    # every byte once, so a swapped or shifted pixel shows
+    cells = np.arange(256, dtype=np.uint8).reshape(CHUNK_SIZE, CHUNK_SIZE).view(np.int8)
+    image = rasterize(cells, PALETTES[state])
+    assert (image.width(), image.height()) == (CHUNK_SIZE, CHUNK_SIZE)
+    for x in range(CHUNK_SIZE):
+        for y in range(CHUNK_SIZE):
+            raw = int(cells[x, y]) & 0xFF
+            assert image.pixel(x, y) == color_of(raw).rgba(), (x, y)
+
+
+def test_the_first_cell_coordinate_is_the_image_column():
+    cells = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.int8)
+    cells[1, 0] = 0b0111  # mountain, the pixel at x=1, y=0
+    cells[0, 1] = 0b1010  # land, the pixel at x=0, y=1
+    palette = build_palette(get_color)
+    image = rasterize(cells, palette)
+    assert get_color(0b0111).rgba() != get_color(0b1010).rgba()
+    assert image.pixel(1, 0) == get_color(0b0111).rgba()
+    assert image.pixel(0, 1) == get_color(0b1010).rgba()
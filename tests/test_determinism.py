@@ -0,0 +1,106 @@
+"""
+A chunk depends only on the world seed and its position: not on the order
+chunks are generated in, the mode, the number of workers or on whether it
+was dropped and generated again.
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.backend.chunk import ChunkStates
+from src.backend.grid import Grid
+
+SEED = 1234
+
+"""sha256 prefixes of the cells of seeded chunks, numpy engine"""
+PINNED = {
+    (0, 0): "a94899935a76b4ff",
+    (5, -3): "5e0b18892f308e6f",
+    (-7, 2): "dd0471c13bc92560",
+    (40, 40): "f39f07bff1a399fe",
+}
+
+
+def digest(cells: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(cells).tobytes()).hexdigest()[:16]
+
+
+def generated(grid: Grid) -> dict[tuple[int, int], np.ndarray]:
+    return {
+        pos: grid[pos].cells.copy()
+        for pos in grid.chunks
+        if grid[pos].state == ChunkStates.GENERATED
+    }
+
+
+@pytest.mark.parametrize("mode", ["chunk", "batch"])
+def test_pinned_hashes(mode):
+    grid = Grid(0.5, mode=mode, seed=SEED)
+    grid.generate_chunks(list(PINNED))
+    assert {pos: digest(grid[pos].cells) for pos in PINNED} == PINNED
+    grid.close()
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        dict(mode="chunk"),
+        dict(mode="batch"),
+        dict(mode="batch", workers=2),
+        dict(mode="chunk", workers=4, shared_capacity=1024),
+    ],
+)
+def test_order_does_not_matter(settings):
+    forward = Grid(0.5, seed=SEED)
+    forward.generate_around((0, 0), 4)
+    forward.generate_around((3, 2), 3)
+    expected = generated(forward)
+
+    # another mode, another order of the same areas, from the other side
+    backward = Grid(0.5, seed=SEED, **settings)
+    backward.generate_around((3, 2), 3)
+    backward.generate_around((0, 0), 4)
+    measured = generated(backward)
+    backward.close()
+
+    common = expected.keys() & measured.keys()
+    assert len(common) > 30
+    for pos in common:
+        np.testing.assert_array_equal(measured[pos], expected[pos], err_msg=str(pos))
+
+
+def test_shared_workers_race_nothing():
+    # workers write into the shared slab while the scheduler pads other chunks
+    serial = Grid(0.5, seed=SEED)
+    serial.generate_around((0, 0), 6)
+    expected = generated(serial)
+    for _ in range(3):
+        grid = Grid(0.5, seed=SEED, workers=4, shared_capacity=1024)
+        grid.generate_around((0, 0), 6)
+        measured = generated(grid)
+        grid.close()
+        assert measured.keys() == expected.keys()
+        for pos in expected:
+            np.testing.assert_array_equal(measured[pos], expected[pos], err_msg=str(pos))
+
+
+def test_discarded_chunks_come_back_identical():
+    grid = Grid(0.5, seed=SEED)
+    grid.generate_around((0, 0), 3)
+    before = generated(grid)
+    grid.discard(list(grid.chunks))
+    assert not len(grid.chunks)
+    grid.generate_around((0, 0), 3)
+    after = generated(grid)
+    assert after.keys() == before.keys()
+    for pos in before:
+        np.testing.assert_array_equal(after[pos], before[pos])
+
+
+def test_seeds_differ():
+    one, two = Grid(0.5, seed=1), Grid(0.5, seed=2)
+    one.generate_chunks([(0, 0)])
+    two.generate_chunks([(0, 0)])
+    assert digest(one[0, 0].cells) != digest(two[0, 0].cells)
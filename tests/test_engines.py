@@ -0,0 +1,77 @@
+"""
+The engines draw their random numbers differently, so only the terrain is
+bit-identical between them; the biomes have to follow the same distribution.
+"""
+
+import numpy as np
+import pytest
+
+from src.backend.evolution import ENGINES, get_engine
+
+"""a small padded field keeps the reference engine fast: 8x8 inner cells"""
+FIELD = np.random.default_rng(7).choice(np.array([0, 2, 3], dtype=np.int8), size=(12, 12))
+SEEDS = 96
+ITERATIONS = 10
+
+
+def engines() -> list[str]:
+    return [name for name in ENGINES if get_engine(name).name == name]
+
+
+def terrain(seed: int, shape: tuple[int, ...]) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.choice(np.array([0, 2, 3], dtype=np.int8), size=shape)
+
+
+def sample(name: str, seeds: range) -> tuple[np.ndarray, float]:
+    """
+    How often every inner cell ended up with every biome, (8, 8, 4), and how
+    often two neighbouring cells share their biome. By symmetry every biome
+    is about as likely in every cell, the clustering is what the passes build
+    """
+    engine = get_engine(name)
+    counts = np.zeros((8, 8, 4))
+    agreeing = 0.0
+    for seed in seeds:
+        cells = engine.generate_chunk_biome(FIELD.copy(), np.random.default_rng(seed), ITERATIONS)
+        np.testing.assert_array_equal(cells & 0b11, FIELD[2:-2, 2:-2])
+        biomes = (cells >> 2) & 0b11
+        counts += biomes[..., np.newaxis] == np.arange(4)
+        agreeing += np.mean(biomes[:, 1:] == biomes[:, :-1]) + np.mean(biomes[1:] == biomes[:-1])
+    return counts / len(seeds), agreeing / (2 * len(seeds))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_terrain_is_identical(seed):
+    single = terrain(seed, (18, 18))
+    stack = terrain(seed + 100, (5, 18, 18))
+    expected = get_engine("numpy").pre_generate_chunk(single.copy())
+    expected_stack = get_engine("numpy").pre_generate_chunk(stack.copy())
+    for name in engines():
+        engine = get_engine(name)
+        np.testing.assert_array_equal(engine.pre_generate_chunk(single.copy()), expected)
+        np.testing.assert_array_equal(engine.pre_generate_chunk(stack.copy()), expected_stack)
+
+
+@pytest.mark.parametrize("name", ENGINES)
+def test_biome_distribution_matches_numpy(name):
+    if get_engine(name).name != name:
+        pytest.skip(f"{name} engine unavailable")
+    # disjoint seeds, numpy against numpy only shows the sampling noise
+    expected, expected_agreeing = sample("numpy", range(SEEDS))
+    measured, agreeing = sample(name, range(SEEDS, 2 * SEEDS))
+    difference = np.abs(measured - expected)
+    assert difference.mean() < 0.075
+    assert difference.max() < 0.3
+    # 7 instead of 10 passes already moves this by about 0.02
+    assert abs(agreeing - expected_agreeing) < 0.012
+
+
+def test_textures_keep_terrain_and_biome():
+    rng = np.random.default_rng(3)
+    chunk = terrain(3, (16, 16)) | (rng.integers(0, 4, (16, 16), dtype=np.int8) << 2)
+    for name in engines():
+        cells = get_engine(name).textures(chunk.copy(), 0.3, np.random.default_rng(0))
+        np.testing.assert_array_equal(cells & 0b1111, chunk)
+        textured = (cells >> 4) & 0b11
+        assert 0.15 < np.count_nonzero(textured) / textured.size < 0.45
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.backend.cells import CELL_LUT
+from src.backend.evolution import ENGINES, evolve, get_engine
+
+TERRAIN = np.array([0, 2, 3], dtype=np.int8)
+
+
+def convolve(cells: np.ndarray) -> np.ndarray:
+    """one pass of the rule, the 3x3 sums written out cell by cell"""
+    result = cells.copy()
+    for i in range(1, cells.shape[0] - 1):
+        for j in range(1, cells.shape[1] - 1):
+            total = int(cells[i - 1 : i + 2, j - 1 : j + 2].sum(dtype=np.int64))
+            result[i, j] = CELL_LUT[total]
+    return result
+
+
+@pytest.mark.parametrize("shape", [(18, 18), (9, 31)])
+def test_evolve_matches_a_reference_convolution(shape):
+    cells = np.random.default_rng(5).choice(TERRAIN, size=shape)
+    for _ in range(10):
+        expected = convolve(cells)
+        evolve(cells)
+        np.testing.assert_array_equal(cells, expected)
+
+
+def test_evolve_works_on_stacks():
+    stack = np.random.default_rng(6).choice(TERRAIN, size=(4, 18, 18))
+    expected = np.stack([convolve(chunk) for chunk in stack])
+    evolve(stack)
+    np.testing.assert_array_equal(stack, expected)
+
+
+@pytest.mark.parametrize("bits", [0b0100, 0b110000, -1])
+def test_evolve_refuses_non_terrain_cells(bits):
+    cells = np.random.default_rng(7).choice(TERRAIN, size=(18, 18))
+    cells[4, 5] |= bits
+    with pytest.raises(ValueError):
+        evolve(cells.copy())
+    for name in ENGINES:
+        with pytest.raises(ValueError):
+            get_engine(name).pre_generate_chunk(cells.copy())
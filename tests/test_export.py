@@ -0,0 +1,29 @@
+import numpy as np
+
+from src.backend.chunk import CHUNK_SIZE
+from src.backend.grid import Grid
+from src.export import export
+
+
+def test_npy_export_matches_generate_chunks(tmp_path):
+    path = tmp_path / "area.npy"
+    grid = Grid(0.5, seed=21)
+    peak = export(grid, path, x0=-1, y0=3, width=2, height=2, band=1, progress=False)
+    cells = np.load(path)
+    assert cells.shape == (2 * CHUNK_SIZE, 2 * CHUNK_SIZE) and cells.dtype == np.int8
+
+    reference = Grid(0.5, seed=21)
+    reference.generate_chunks([(-1, 4), (0, 4), (-1, 3), (0, 3)])
+    # rows run from the largest y down, columns from the smallest x
+    expected = np.block(
+        [
+            [reference[-1, 4].cells, reference[0, 4].cells],
+            [reference[-1, 3].cells, reference[0, 3].cells],
+        ]
+    )
+    np.testing.assert_array_equal(cells, expected)
+
+    # the peak counts the first band with its halo, before anything is discarded
+    first = Grid(0.5, seed=21)
+    first.generate_chunks([(-1, 4), (0, 4)])
+    assert peak >= len(first.chunks)
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from src.backend.chunk import ChunkStates
+from src.backend.grid import Grid, diamond, exposed
+
+DONE = (ChunkStates.PRE_GENERATED, ChunkStates.GENERATED)
+
+
+def test_exposed_is_the_new_diamond_minus_the_old_one():
+    rng = random.Random(5)
+    for _ in range(200):
+        old = (rng.randint(-6, 6), rng.randint(-6, 6))
+        new = (rng.randint(-6, 6), rng.randint(-6, 6))
+        radius = rng.randint(1, 7)
+        brute = set(diamond(new, radius)) - set(diamond(old, radius))
+        found = list(exposed(old, new, radius))
+        assert len(found) == len(set(found))
+        assert set(found) == brute
+    assert set(exposed(None, (2, 3), 4)) == set(diamond((2, 3), 4))
+
+
+def check(grid: Grid, centre: tuple[int, int], radius: int) -> None:
+    """what a full scan of the diamonds of every phase expects after generate_around"""
+    for pos in diamond(centre, radius + 6):
+        assert pos in grid.chunks, pos
+    for pos in diamond(centre, radius + 4):
+        assert grid[pos].state in DONE, pos
+    for pos in diamond(centre, radius):
+        assert grid[pos].state == ChunkStates.GENERATED, pos
+
+
+@pytest.mark.parametrize("eviction", ["lru", "distance"])
+def test_frontiers_cover_the_diamonds_after_moves_and_evictions(eviction):
+    rng = random.Random(11)
+    grid = Grid(0.5, seed=7, max_chunks=150, eviction=eviction)
+    centre = (0, 0)
+    for step in range(14):
+        dx, dy = rng.choice([(0, 0), (1, 0), (0, -1), (3, 2), (-9, 0), (0, 12)])
+        centre = (centre[0] + dx, centre[1] + dy)
+        grid.generate_around(centre, 2)
+        check(grid, centre, 2)
+
+        if step % 3 == 1:
+            # interior chunks, the next call has to bring them back
+            grid.discard([centre, (centre[0] + 3, centre[1]), (centre[0], centre[1] - 5)])
+        elif step % 3 == 2:
+            grid.generate_chunks(diamond((centre[0] + 20, centre[1]), 2))
+    assert grid.cache_info().evictions > 0
@@ -0,0 +1,45 @@
+import pytest
+
+from src.backend.chunk import ChunkStates
+from src.backend.grid import Grid, diamond, distance
+
+
+def test_diamond_is_the_generated_area():
+    assert sorted(diamond((3, -1), 2)) == sorted(
+        [(3, -1), (4, -1), (2, -1), (3, 0), (3, -2)]
+    )
+    assert all(distance(pos, (0, 0)) < 5 for pos in diamond((0, 0), 5))
+    assert len(diamond((0, 0), 5)) == 41
+
+
+def test_generate_chunks_keeps_the_working_area():
+    grid = Grid(0.5, seed=3, max_chunks=200, eviction="distance")
+    grid.generate_around((0, 0), 2)
+    near = [pos for pos in diamond((0, 0), 2)]
+    assert all(grid[pos].state == ChunkStates.GENERATED for pos in near)
+
+    # prefetching far away must not evict what the player sees
+    for step in range(1, 8):
+        grid.generate_chunks(diamond((12 * step, 0), 2))
+    assert all(grid[pos].state == ChunkStates.GENERATED for pos in near)
+    assert len(grid.chunks) <= 200 + 60
+
+
+def test_generate_chunks_can_be_cancelled():
+    grid = Grid(0.5, seed=3)
+    grid.generate_chunks([(0, 0)], cancelled=lambda: True)
+    assert grid[0, 0].state == ChunkStates.PRE_GENERATED
+    grid.generate_chunks([(0, 0)])
+    assert grid[0, 0].state == ChunkStates.GENERATED
+
+
+def test_config_rebuilds_the_same_kind_of_grid():
+    grid = Grid(0.5, mode="chunk", seed=3, max_chunks=50, eviction="distance", preview_tiers=(8,))
+    again = Grid(0.7, seed=4, **grid.config())
+    assert again.config() == grid.config()
+    assert (again.density, again.seed) == (0.7, 4)
+
+
+def test_region_mode_refuses_workers():
+    with pytest.raises(ValueError):
+        Grid(0.5, seed=3, mode="region", workers=2)
@@ -0,0 +1,53 @@
+"""set_kernel_cache only works before the numba kernels load, checked in fresh interpreters"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("numba")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code: str) -> subprocess.CompletedProcess:
+    environment = {key: value for key, value in os.environ.items() if key != "NUMBA_CACHE_DIR"}
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=environment, capture_output=True, text=True
+    )
+
+
+def test_kernels_cache_in_the_directory_set_first(tmp_path):
+    result = run(
+        "import numpy as np\n"
+        "from src.backend.evolution import get_engine, set_kernel_cache\n"
+        f"set_kernel_cache({str(tmp_path)!r})\n"
+        "get_engine('numba').pre_generate_chunk(np.zeros((18, 18), dtype=np.int8))\n"
+    )
+    assert result.returncode == 0, result.stderr
+    cached = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert any(name.endswith(".nbi") for name in cached)
+
+
+def test_numba_imported_early_still_takes_the_directory(tmp_path):
+    result = run(
+        "import numba\n"
+        "from src.backend.evolution import set_kernel_cache\n"
+        f"set_kernel_cache({str(tmp_path)!r})\n"
+        "import os\n"
+        "print(numba.config.CACHE_DIR == os.environ['NUMBA_CACHE_DIR'])\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["True"]
+
+
+def test_setting_the_cache_after_the_kernels_load_fails(tmp_path):
+    result = run(
+        "from src.backend.evolution import get_engine, set_kernel_cache\n"
+        "get_engine('numba')\n"
+        f"set_kernel_cache({str(tmp_path)!r})\n"
+    )
+    assert result.returncode != 0
+    assert "RuntimeError" in result.stderr
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PySide6")
+
+from src.ui.loader import ChunkLoader  # noqa: E402
+
+
+class FakeGrid:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.generated = []
+        self.closed = []
+
+    def generate_around(self, centre, generated_radius, cancelled=None):
+        if self.fail:
+            raise OSError("disk full")
+        self.generated.append(centre)
+
+    def generate_chunks(self, positions, cancelled=None):
+        self.generated.append(positions[0])
+
+    def close(self, store=True):
+        self.closed.append(store)
+
+
+class DeletedSignal:
+    def emit(self, payload):
+        raise RuntimeError("Signal source has been deleted")
+
+
+def run(loader: ChunkLoader) -> None:
+    """what _start does, without the thread pool"""
+    loader._running = True
+    loader._work()
+
+
+def test_a_failing_job_does_not_stop_the_loader(monkeypatch):
+    reported = []
+    monkeypatch.setattr("sys.excepthook", lambda *info: reported.append(info[0]))
+    loader = ChunkLoader(radius=2)
+    broken, healthy = FakeGrid(fail=True), FakeGrid()
+
+    loader._pending = (broken, (0, 0))
+    loader._prefetch = [(healthy, (5, 5))]
+    run(loader)
+
+    assert reported == [OSError]
+    assert healthy.generated == [(5, 5)]
+    assert not loader.busy()
+    assert loader._grid is None
+
+
+def test_retired_grids_are_closed_when_the_worker_stops(monkeypatch):
+    loader = ChunkLoader(radius=2)
+    grid = FakeGrid()
+
+    def retire_while_running(centre, generated_radius, cancelled=None):
+        loader.retire(grid, store=False)
+
+    monkeypatch.setattr(grid, "generate_around", retire_while_running)
+    # the window is gone: emitting fails and the worker returns early
+    monkeypatch.setattr(loader, "generated", DeletedSignal())
+    loader._pending = (grid, (0, 0))
+    run(loader)
+
+    assert grid.closed == [False]
+    assert not loader.busy()
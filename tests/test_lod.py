@@ -0,0 +1,75 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PySide6")
+
+from src.backend.chunk import CHUNK_SIZE, ChunkStates  # noqa: E402
+from src.ui.lod import EMPTY, Overview, chunk_mips, majority  # noqa: E402
+
+
+def chunk(seed: int):
+    rng = np.random.default_rng(seed)
+    cells = rng.choice(np.array([0, 2, 3, 6, 11, 15], dtype=np.int8), (CHUNK_SIZE, CHUNK_SIZE))
+    return SimpleNamespace(state=ChunkStates.GENERATED, cells=cells | 0b110000)
+
+
+def test_majority_keeps_the_most_common_code_of_every_block():
+    codes = np.array(
+        [
+            [3, 3, 6, 2],
+            [3, 2, 6, 6],
+            [EMPTY, EMPTY, 7, 5],
+            [EMPTY, EMPTY, EMPTY, EMPTY],
+        ],
+        dtype=np.uint8,
+    )
+    # a tie goes to the lower code, EMPTY only wins a block without any other code
+    assert majority(codes, 2).tolist() == [[3, 6], [EMPTY, 5]]
+    assert majority(codes, 4).tolist() == [[3]]
+
+
+def test_chunk_mips_ignore_the_texture_bits():
+    cells = np.full((CHUNK_SIZE, CHUNK_SIZE), 0b110110, dtype=np.int8)
+    cells[:2, :2] = 0b11
+    cells[0, 0] = 0b10
+    mips = chunk_mips(cells)
+    assert [mip.shape for mip in mips] == [(8, 8), (4, 4), (2, 2), (1, 1)]
+    assert mips[0][0, 0] == 0b11
+    assert (mips[0].reshape(-1)[1:] == 0b0110).all()
+    assert mips[-1][0, 0] == 0b0110
+
+
+def test_adding_a_chunk_changes_only_the_tiles_above_it():
+    overview = Overview(max_level=6)
+    for seed, pos in enumerate([(0, 0), (1, 0), (-3, 5), (17, -9)]):
+        assert overview.add(pos, chunk(seed))
+    before = {
+        (level, key): (overview.version(level, key), overview.tile(level, key).copy())
+        for level in range(1, 7)
+        for key in overview._tiles[level]
+    }
+
+    x, y = 1, 1
+    assert overview.add((x, y), chunk(99))
+    assert not overview.add((x, y), chunk(98))
+    assert len(overview) == 5
+    for level in range(1, 7):
+        touched = (x >> level, y >> level)
+        for key in overview._tiles[level]:
+            if key == touched:
+                assert overview.version(level, key) == before.get((level, key), (0,))[0] + 1
+                continue
+            version, tile = before[level, key]
+            assert overview.version(level, key) == version
+            np.testing.assert_array_equal(overview.tile(level, key), tile)
+
+    # inside the level 1 tile only the quarter of the new chunk is written
+    tile, old = overview.tile(1, (0, 0)), before[1, (0, 0)][1]
+    size = CHUNK_SIZE // 2
+    np.testing.assert_array_equal(tile[:, :size], old[:, :size])
+    np.testing.assert_array_equal(tile[:size, size:], old[:size, size:])
+    np.testing.assert_array_equal(tile[size:, size:], chunk_mips(chunk(99).cells)[0])
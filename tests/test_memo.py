@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.backend import memo
+from src.backend.evolution import evolve, get_engine
+
+TERRAIN = np.array([0, 2, 3], dtype=np.int8)
+
+
+def terrain(seed: int, shape: tuple[int, ...]) -> np.ndarray:
+    return np.random.default_rng(seed).choice(TERRAIN, size=shape)
+
+
+@pytest.mark.parametrize("shape", [(18, 18), (17, 23), (6, 20, 20), (3, 5)])
+def test_evolve_matches_the_box_filter(shape):
+    # a tiny table keeps evicting, every result still has to be exact
+    cache = memo.TransitionCache(capacity=64)
+    expected = terrain(1, shape)
+    cells = expected.copy()
+    for _ in range(10):
+        evolve(expected)
+        memo.evolve(cells, cache)
+        np.testing.assert_array_equal(cells, expected)
+    if cells.size > 100:
+        assert cache.stats().evictions > 0
+
+
+def test_pre_generate_chunk_matches_numpy():
+    padded = terrain(2, (8, 18, 18))
+    expected = get_engine("numpy").pre_generate_chunk(padded.copy())
+    np.testing.assert_array_equal(get_engine("memo").pre_generate_chunk(padded.copy()), expected)
+
+
+def test_repeated_blocks_hit_the_cache():
+    cache = memo.TransitionCache(capacity=1 << 12)
+    memo.evolve(np.zeros((34, 34), dtype=np.int8), cache)
+    # the blocks of one call are looked up together, so they all miss once
+    assert (cache.stats().misses, cache.stats().hits) == (256, 0)
+    memo.evolve(np.zeros((34, 34), dtype=np.int8), cache)
+    assert (cache.stats().misses, cache.stats().hits) == (256, 256)
+    assert cache.stats().size == 1
+    cache.clear()
+    assert cache.stats().size == 0
+
+
+def test_biome_bits_are_refused():
+    cells = terrain(3, (18, 18)) | (1 << 2)
+    with pytest.raises(ValueError):
+        memo.evolve(cells, memo.TransitionCache(capacity=64))
+
+
+def test_threads_share_one_cache():
+    cache = memo.TransitionCache(capacity=256)
+    fields = [terrain(seed, (4, 34, 34)) for seed in range(8)]
+    expected = [field.copy() for field in fields]
+    for field in expected:
+        for _ in range(5):
+            evolve(field)
+
+    def run(field):
+        for _ in range(5):
+            memo.evolve(field, cache)
+
+    threads = [threading.Thread(target=run, args=(field,)) for field in fields]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for field, want in zip(fields, expected):
+        np.testing.assert_array_equal(field, want)
+    # every lookup is counted once, whatever the interleaving
+    stats = cache.stats()
+    assert stats.hits + stats.misses == 8 * 5 * 4 * 16 * 16
@@ -0,0 +1,53 @@
+import pytest
+
+from src.backend.metrics import PHASES, Metrics
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    with metrics.timer("biome", 3):
+        pass
+
+    assert metrics.snapshot() == dict()
+
+
+def test_timer_records_calls_and_counts():
+    metrics = Metrics(enabled=True)
+    with metrics.timer("biome", 3):
+        pass
+    with metrics.timer("biome") as timer:
+        timer.count = 5
+
+    stats = metrics.snapshot()["biome"]
+    assert (stats.calls, stats.count) == (2, 8)
+    assert 0.0 <= stats.min <= stats.max <= stats.total
+    assert sum(stats.histogram.values()) == 2
+
+
+def test_timed_decorates_a_function():
+    metrics = Metrics(enabled=True)
+
+    @metrics.timed("textures", 2)
+    def textures(cells):
+        """the docstring is kept"""
+        return cells + 1
+
+    assert textures(1) == 2 and textures(2) == 3
+    assert textures.__doc__ == "the docstring is kept"
+    stats = metrics.snapshot()["textures"]
+    assert (stats.calls, stats.count) == (2, 4)
+
+    metrics.enabled = False
+    textures(3)
+    assert metrics.snapshot()["textures"].calls == 2
+
+
+def test_unknown_phases_are_refused():
+    metrics = Metrics(enabled=True)
+    with pytest.raises(ValueError):
+        with metrics.timer("boime"):
+            pass
+    assert metrics.snapshot() == dict()
+    for name in PHASES:
+        metrics.record(name, 0.001)
+    assert set(metrics.snapshot()) == set(PHASES)
@@ -0,0 +1,33 @@
+from src.backend.chunk import ChunkStates, NoneChunk
+from src.ui.prefetch import PrefetchPlanner
+
+
+class Generated:
+    state = ChunkStates.GENERATED
+
+
+class FakeGrid:
+    """every chunk in `generated` is GENERATED, the rest missing"""
+
+    def __init__(self, generated=()):
+        self.generated = set(generated)
+
+    def __getitem__(self, pos):
+        return Generated() if pos in self.generated else NoneChunk()
+
+
+def test_plan_looks_ahead_of_the_player():
+    planner = PrefetchPlanner(budget=4)
+    for step in range(10):
+        planner.observe((step * 8.0, 0.0), step * 0.1)
+    chosen = planner.plan(FakeGrid(), (72.0, 0.0), (25.0, 25.0), 1.0)
+    assert chosen and all(cx * 16 > 72 for cx, _ in chosen)
+
+
+def test_memory_is_bounded():
+    planner = PrefetchPlanner(memory=100)
+    grid = FakeGrid()
+    for x in range(1000):
+        planner.record_visible(grid, {(x, 0), (x, 1)})
+    assert len(planner._seen) == 100
+    assert planner.stats().misses == 2000
@@ -0,0 +1,75 @@
+from math import floor
+
+import numpy as np
+import pytest
+
+from src.backend.cells import CellTypes
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+from src.backend.grid import LAND, Grid
+
+SUMMARISED = (ChunkStates.PREVIEW, ChunkStates.GENERATED)
+
+
+@pytest.fixture(scope="module", params=[dict(), dict(shared_capacity=4096), dict(mode="region")])
+def grid(request):
+    grid = Grid(0.5, seed=3, **request.param)
+    grid.generate_around((0, 0), 3)
+    grid.generate_around((4, 1), 2)
+    yield grid
+    grid.close()
+
+
+def brute_sample(grid: Grid, x: float, y: float, fill: int) -> int:
+    cx, cy = floor(x) // CHUNK_SIZE, floor(y) // CHUNK_SIZE
+    if (cx, cy) not in grid.chunks:
+        return fill
+    return int(grid[cx, cy].cells[floor(x) - cx * CHUNK_SIZE, floor(y) - cy * CHUNK_SIZE])
+
+
+def brute_nearest(grid: Grid, x: float, y: float, terrains, radius=None):
+    x, y = floor(x), floor(y)
+    best = None
+    for cx, cy in grid.chunks:
+        if grid[cx, cy].state not in SUMMARISED:
+            continue
+        for i, j in zip(*np.nonzero(np.isin(grid[cx, cy].cells & 0b11, list(terrains)))):
+            dx, dy = cx * CHUNK_SIZE + int(i) - x, cy * CHUNK_SIZE + int(j) - y
+            candidate = (max(abs(dx), abs(dy)), dx, dy)
+            if radius is not None and candidate[0] > radius:
+                continue
+            if best is None or candidate < best:
+                best = candidate
+    return None if best is None else (x + best[1], y + best[2])
+
+
+def test_sample_matches_cell_lookups(grid):
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(-150, 150, 2000), rng.uniform(-150, 150, 2000)
+    expected = [brute_sample(grid, x, y, -7) for x, y in zip(xs, ys)]
+    np.testing.assert_array_equal(grid.sample(xs, ys, fill=-7), expected)
+    assert grid.sample(3.5, -2.2).shape == ()
+    assert grid.sample([[0, 16]], [[0], [-1]]).shape == (2, 2)
+
+
+@pytest.mark.parametrize(
+    "terrains", [LAND, (CellTypes.WATER,), (CellTypes.MOUNTAIN,)], ids=["land", "water", "mountain"]
+)
+def test_nearest_matches_a_full_scan(grid, terrains):
+    rng = np.random.default_rng(1)
+    for x, y in rng.uniform(-120, 120, (12, 2)):
+        assert grid.nearest(x, y, terrains) == brute_nearest(grid, x, y, terrains)
+        assert grid.nearest(x, y, terrains, radius=20) == brute_nearest(
+            grid, x, y, terrains, radius=20
+        )
+
+
+def test_chunks_with_matches_the_cells(grid):
+    expected = sorted(
+        pos
+        for pos in grid.chunks
+        if grid[pos].state in SUMMARISED
+        and (grid[pos].cells & 0b11 == CellTypes.MOUNTAIN).any()
+    )
+    assert sorted(grid.chunks_with((CellTypes.MOUNTAIN,))) == expected
+    boxed = grid.chunks_with((CellTypes.MOUNTAIN,), box=(0, 0, 2, 2))
+    assert sorted(boxed) == [(x, y) for x, y in expected if 0 <= x <= 2 and 0 <= y <= 2]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.backend.chunk import ChunkStates
+from src.backend.evolution import ENGINES, get_engine
+from src.backend.grid import Grid
+
+SPLITS = [(1,), (8,), (3, 40, 77), (50, 99)]
+
+
+def generated(grid: Grid) -> dict[tuple[int, int], np.ndarray]:
+    return {
+        pos: grid[pos].cells.copy()
+        for pos in grid.chunks
+        if grid[pos].state == ChunkStates.GENERATED
+    }
+
+
+def cases():
+    for engine in ENGINES:
+        # the reference engine takes seconds per chunk: one chunk, one mode
+        modes = ["chunk"] if engine == "reference" else ["chunk", "batch"]
+        positions = [(0, 0)] if engine == "reference" else [(0, 0), (1, 0), (0, 1)]
+        for mode in modes:
+            for tiers in SPLITS:
+                yield pytest.param(engine, mode, tiers, positions, id=f"{engine}-{mode}-{tiers}")
+
+
+@pytest.mark.parametrize("engine, mode, tiers, positions", list(cases()))
+def test_refined_chunks_match_direct_generation(engine, mode, tiers, positions):
+    if get_engine(engine).name != engine:
+        pytest.skip(f"{engine} is not available")
+    direct = Grid(0.5, engine=engine, mode=mode, seed=4)
+    direct.generate_chunks(positions)
+    expected = generated(direct)
+    direct.close()
+
+    grid = Grid(0.5, engine=engine, mode=mode, seed=4, preview_tiers=tiers)
+    grid.generate_chunks(positions)
+    assert not generated(grid)
+    # refine the last chunk ahead of the others, the order must not matter
+    grid.focus(positions[-1], {positions[-1]})
+    assert grid.refine(1) == [positions[-1]]
+    while len(grid.refinements):
+        grid.refine(2)
+    measured = generated(grid)
+    grid.close()
+
+    assert sorted(measured) == sorted(expected) == sorted(positions)
+    for pos in expected:
+        np.testing.assert_array_equal(measured[pos], expected[pos], err_msg=str(pos))
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        dict(preview_tiers=(100,)),
+        dict(preview_tiers=(5, 5)),
+        dict(preview_tiers=(9, 3)),
+        dict(preview_tiers=(8,), mode="region"),
+        dict(preview_tiers=(8,), workers=2),
+    ],
+)
+def test_invalid_tiers_are_refused(settings):
+    with pytest.raises(ValueError):
+        Grid(0.5, **settings)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.backend.chunk import CHUNK_SIZE, ChunkStates
+from src.backend.grid import Grid, Region, diamond
+
+
+def created(mode: str = "chunk") -> Grid:
+    grid = Grid(0.5, seed=4, mode=mode)
+    grid._create([(x, y) for x in range(-3, 4) for y in range(-3, 4)])
+    return grid
+
+
+def pre_generated(grid: Grid) -> list:
+    chunks = [(grid[x, y], (x, y)) for x in range(-2, 3) for y in range(-2, 3)]
+    Region(grid, chunks, halo=1).pre_generate()
+    return chunks
+
+
+def test_a_lone_chunk_pre_generates_as_in_chunk_mode():
+    # without evolved neighbours there is no seam to remove
+    grid, region = created(), created("region")
+    grid[0, 0].pre_generate_self(grid, (0, 0))
+    Region(region, [(region[0, 0], (0, 0))], halo=1).pre_generate()
+    np.testing.assert_array_equal(region[0, 0].cells, grid[0, 0].cells)
+    assert region[0, 0].state == ChunkStates.PRE_GENERATED
+
+
+def test_the_result_does_not_depend_on_the_order_of_the_chunks():
+    first, second = created("region"), created("region")
+    chunks = pre_generated(first)
+    pre_generated(second)
+    inner = [pos for _, pos in chunks if max(map(abs, pos)) < 2]
+    Region(first, [(first[pos], pos) for pos in inner], halo=2).generate()
+    Region(second, [(second[pos], pos) for pos in reversed(inner)], halo=2).generate()
+    for pos in inner:
+        assert first[pos].state == ChunkStates.GENERATED
+        np.testing.assert_array_equal(first[pos].cells, second[pos].cells)
+
+
+def test_finished_chunks_around_a_region_keep_their_cells():
+    grid = Grid(0.5, seed=4, mode="region")
+    grid.generate_around((0, 0), 3)
+    finished = {
+        pos: grid[pos].cells.copy()
+        for pos in grid.chunks
+        if grid[pos].state == ChunkStates.GENERATED
+    }
+    grid.generate_around((2, 1), 3)
+    assert any(pos not in finished for pos in diamond((2, 1), 3))
+    for pos, cells in finished.items():
+        np.testing.assert_array_equal(grid[pos].cells, cells)
+
+
+def terrain_changes(mode: str) -> tuple[float, float]:
+    """how often neighbouring cells differ in terrain across chunk borders and inside chunks"""
+    grid = Grid(0.5, seed=1, mode=mode)
+    grid.generate_around((0, 0), 5)
+    field = np.block([[grid[x, y].cells & 0b11 for x in range(-2, 3)] for y in range(2, -3, -1)])
+    changes = np.concatenate([(field[:, 1:] != field[:, :-1]), (field[1:] != field[:-1]).T])
+    border = np.arange(1, field.shape[0]) % CHUNK_SIZE == 0
+    return changes[:, border].mean(), changes[:, ~border].mean()
+
+
+def test_region_mode_removes_the_seams_of_chunk_mode():
+    # region mode evolves the chunks together, so it differs from chunk mode by design:
+    # what it promises is that chunk borders look like the inside of a chunk
+    border, inside = terrain_changes("chunk")
+    assert border > 2 * inside
+    border, inside = terrain_changes("region")
+    assert border < 1.5 * inside
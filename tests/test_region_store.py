@@ -0,0 +1,95 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.backend.chunk import ChunkStates
+from src.backend.grid import Grid
+from src.backend.region_store import RegionFile, RegionStore, verify
+from src.backend.store import MemoryStore
+
+
+def test_round_trip_and_reopen(tmp_path):
+    store = RegionStore(tmp_path)
+    cells = np.arange(256, dtype=np.int8).reshape(16, 16)
+    store.save((-40, 3), cells, ChunkStates.GENERATED)
+    store.close()
+
+    store = RegionStore(tmp_path)
+    loaded, state = store.load((-40, 3))
+    np.testing.assert_array_equal(loaded, cells)
+    assert state == ChunkStates.GENERATED
+    assert store.load((0, 0)) is None
+    store.close()
+    assert verify(tmp_path)["chunks"] == 1
+
+
+def test_grid_loads_its_own_chunks(tmp_path):
+    grid = Grid(0.5, seed=1, store=RegionStore(tmp_path))
+    grid.generate_chunks([(0, 0), (3, 3)])
+    expected = grid[0, 0].cells.copy()
+    grid.close()
+
+    again = Grid(0.5, seed=1, store=RegionStore(tmp_path))
+    again.generate_chunks([(0, 0)])
+    np.testing.assert_array_equal(again[0, 0].cells, expected)
+    assert again.cache_info().loads >= 1
+    again.close()
+
+
+@pytest.mark.parametrize(
+    "other", [dict(seed=2), dict(density=0.7), dict(mode="region")]
+)
+def test_another_world_is_refused(tmp_path, other):
+    grid = Grid(0.5, seed=1, store=RegionStore(tmp_path))
+    grid.generate_chunks([(0, 0)])
+    grid.close()
+
+    settings = dict(density=0.5, seed=1) | other
+    with pytest.raises(ValueError, match="another world"):
+        Grid(settings.pop("density"), store=RegionStore(tmp_path), **settings)
+
+
+def test_chunk_and_batch_mode_share_a_store(tmp_path):
+    Grid(0.5, seed=1, mode="batch", store=RegionStore(tmp_path)).close()
+    Grid(0.5, seed=1, mode="chunk", store=RegionStore(tmp_path)).close()
+
+
+def test_memory_store_is_bound_too():
+    store = MemoryStore()
+    Grid(0.5, seed=1, store=store)
+    Grid(0.5, seed=1, store=store)
+    with pytest.raises(ValueError):
+        Grid(0.5, seed=2, store=store)
+
+
+def test_reads_do_not_wait_for_the_disk(tmp_path, monkeypatch):
+    store = RegionStore(tmp_path, flush_interval=60)
+    cells = np.full((16, 16), 2, dtype=np.int8)
+    store.save((0, 0), cells, ChunkStates.GENERATED)
+
+    # hold the writer inside its first msync
+    syncing, release = threading.Event(), threading.Event()
+
+    def slow_flush(region):
+        syncing.set()
+        release.wait(10)
+
+    monkeypatch.setattr(RegionFile, "flush", slow_flush)
+    writer = threading.Thread(target=store.flush)
+    writer.start()
+    assert syncing.wait(10)
+
+    start = time.perf_counter()
+    assert (0, 0) in store
+    np.testing.assert_array_equal(store.load((0, 0))[0], cells)
+    assert (5, 5) not in store
+    store.save((1, 1), cells, ChunkStates.GENERATED)
+    assert time.perf_counter() - start < 1
+
+    release.set()
+    writer.join()
+    monkeypatch.undo()
+    store.close()
+    assert verify(tmp_path)["chunks"] == 2
@@ -0,0 +1,45 @@
+import numpy as np
+
+from src.backend.evolution import counting, get_engine
+from src.backend.grid import Grid
+from src.backend.metrics import Metrics, Savings
+
+POSITIONS = [(0, 0), (1, 0), (0, 1)]
+
+
+def test_savings_are_kept_per_grid():
+    counted = Grid(0.5, seed=3, mode="chunk")
+    idle = Grid(0.5, seed=3, mode="chunk")
+    counted.generate_chunks(POSITIONS)
+
+    savings = counted.metrics.savings()
+    # 15 chunks are pre-generated for 3 and all of them run or skip 10 passes
+    assert savings.terrain_passes + savings.terrain_skipped == 150
+    assert savings.biome_updates == 3 * 100 * 16 * 16
+    assert idle.metrics.savings() == Savings(0, 0, 0, 0)
+    counted.close()
+    idle.close()
+
+
+def test_worker_processes_report_their_savings():
+    serial = Grid(0.5, seed=3, mode="chunk")
+    parallel = Grid(0.5, seed=3, mode="chunk", workers=2)
+    serial.generate_chunks(POSITIONS)
+    parallel.generate_chunks(POSITIONS)
+
+    assert parallel.metrics.savings() == serial.metrics.savings()
+    serial.close()
+    parallel.close()
+
+
+def test_kernels_count_only_inside_counting():
+    engine = get_engine("numpy")
+    with counting(Metrics()) as metrics:
+        engine.pre_generate_chunk(np.zeros((18, 18), dtype=np.int8))
+    assert metrics.savings().terrain_passes + metrics.savings().terrain_skipped == 10
+
+    engine.pre_generate_chunk(np.zeros((18, 18), dtype=np.int8))
+    assert sum(metrics.savings()[:2]) == 10
+
+    metrics.reset()
+    assert metrics.savings() == Savings(0, 0, 0, 0)
@@ -0,0 +1,109 @@
+import asyncio
+
+import numpy as np
+
+from src import wire
+from src.backend.chunk import ChunkStates
+from src.backend.grid import Grid
+from src.client import ChunkClient, ServerError
+from src.server import ChunkServer
+
+
+def run(test, cache_size: int = 1 << 16) -> None:
+    async def main():
+        server = ChunkServer(Grid(0.5, seed=11), cache_size)
+        try:
+            await test(server)
+        finally:
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_a_cancelled_request_leaves_the_others_waiting():
+    async def test(server):
+        first = asyncio.create_task(server.chunks([(0, 0), (1, 0)]))
+        second = asyncio.create_task(server.chunks([(0, 0)]))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        [(state, cells)] = await asyncio.wait_for(second, 30)
+        assert state == ChunkStates.GENERATED
+        # the generation loop survived and still answers new chunks
+        [(state, _)] = await asyncio.wait_for(server.chunks([(5, 5)]), 30)
+        assert state == ChunkStates.GENERATED
+        assert server.stats().coalesced == 1
+
+    run(test)
+
+
+def test_malformed_requests_get_an_error():
+    async def test(server):
+        request = wire.REQUEST.pack(wire.GET_CHUNK, 42, wire.RAW, 0, 0, 0, 0)
+        for payload in (request[:-1], request + b"\0", b"\1"):
+            response = await server.respond(payload)
+            identifier, status = wire.RESPONSE.unpack_from(response)
+            assert status == wire.ERROR
+            assert identifier == (42 if len(payload) >= 5 else 0)
+
+    run(test)
+
+
+def test_client_round_trip(tmp_path):
+    async def test(server):
+        path = str(tmp_path / "chunks.sock")
+        listener = await asyncio.start_unix_server(server.handle, path)
+        async with listener:
+            client = await ChunkClient.connect_unix(path, "rle")
+            cells, state = await asyncio.wait_for(client.get_chunk(2, 3), 30)
+            region = await asyncio.wait_for(client.get_region(1, 2, 3, 4), 30)
+            await client.close()
+
+        assert state == ChunkStates.GENERATED
+        np.testing.assert_array_equal(cells, server.grid[2, 3].cells)
+        assert sorted(region) == [(x, y) for x in range(1, 4) for y in range(2, 5)]
+        np.testing.assert_array_equal(region[2, 3][0], cells)
+
+    run(test)
+
+
+def test_server_errors_reach_the_client(tmp_path):
+    async def test(server):
+        path = str(tmp_path / "chunks.sock")
+        listener = await asyncio.start_unix_server(server.handle, path)
+        async with listener:
+            client = await ChunkClient.connect_unix(path)
+            try:
+                await asyncio.wait_for(client.get_region(0, 0, 100, 100), 30)
+            except ServerError as error:
+                assert "regions hold" in str(error)
+            else:
+                raise AssertionError("an oversized region was served")
+            await client.close()
+
+    run(test)
+
+
+def test_hits_survive_eviction_while_the_request_waits():
+    async def test(server):
+        [(_, first)] = await asyncio.wait_for(server.chunks([(0, 0)]), 30)
+        # (3, 3) pushes (0, 0) out of the one-chunk cache before the answer
+        cells = await asyncio.wait_for(server.chunks([(0, 0), (3, 3)]), 30)
+        np.testing.assert_array_equal(cells[0][1], first)
+        assert server.stats().cache_hits == 1
+
+    run(test, cache_size=1)
+
+
+def test_oversized_frames_end_the_connection(tmp_path):
+    async def test(server):
+        path = str(tmp_path / "chunks.sock")
+        listener = await asyncio.start_unix_server(server.handle, path)
+        async with listener:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(wire.LENGTH.pack(1 << 30))
+            await writer.drain()
+            assert await asyncio.wait_for(reader.read(), 10) == b""
+            writer.close()
+
+    run(test)
@@ -0,0 +1,84 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from src.backend import shared
+from src.backend.chunk import ChunkStates
+from src.backend.grid import Grid
+from src.backend.shared import SharedChunkArena
+
+
+@pytest.fixture
+def arena():
+    arena = SharedChunkArena(0.5, seed=9, capacity=64)
+    yield arena
+    arena.close()
+
+
+def test_attached_arena_reads_what_the_owner_wrote(arena):
+    cells = np.arange(256, dtype=np.int8).reshape(16, 16)
+    chunk = arena.allocate((3, -4))
+    arena.write_cells(chunk.slot, cells)
+    chunk.state = ChunkStates.PRE_GENERATED
+
+    reader = SharedChunkArena.attach(arena.name)
+    try:
+        read_cells, state = reader.read((3, -4))
+        np.testing.assert_array_equal(read_cells, cells)
+        assert state == ChunkStates.PRE_GENERATED
+        assert reader.read((0, 0)) is None
+        assert (reader.seed, reader.density) == (9, 0.5)
+
+        arena.release((3, -4))
+        assert reader.read((3, -4)) is None
+        assert (3, -4) not in reader
+    finally:
+        reader.close()
+
+
+def test_read_gives_up_on_a_slot_left_mid_write(arena):
+    chunk = arena.allocate((1, 1))
+    # a writer that died between its two version increments
+    arena.versions[chunk.slot] += 1
+    with pytest.raises(TimeoutError):
+        arena.read((1, 1), timeout=0.05)
+
+
+def test_fences_on_weakly_ordered_cpus(monkeypatch):
+    pytest.importorskip("numba")
+    monkeypatch.setattr(shared, "ORDERED", False)
+    shared.memory_fence.cache_clear()
+    try:
+        assert shared.memory_fence() is not shared._no_fence
+        arena = SharedChunkArena(0.5, capacity=8)
+        chunk = arena.allocate((0, 0))
+        arena.write_cells(chunk.slot, np.full((16, 16), 3, dtype=np.int8))
+        chunk.state = ChunkStates.PRE_GENERATED
+        assert arena.read((0, 0))[0].sum() == 3 * 256
+        arena.close()
+    finally:
+        shared.memory_fence.cache_clear()
+
+
+def test_other_processes_see_the_generated_chunks():
+    grid = Grid(0.5, seed=5, workers=2, shared_capacity=1024)
+    reference = Grid(0.5, seed=5)
+    try:
+        grid.generate_around((0, 0), 3)
+        reference.generate_around((0, 0), 3)
+        code = (
+            "from src.backend.shared import SharedChunkArena\n"
+            f"arena = SharedChunkArena.attach({grid.chunks.name!r})\n"
+            "cells, state = arena.read((1, 1))\n"
+            "print(state.name, cells.astype(int).sum())\n"
+            "arena.close()\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert out.stdout.split() == ["GENERATED", str(reference[1, 1].cells.astype(int).sum())]
+    finally:
+        grid.close()
+        reference.close()
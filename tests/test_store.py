@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from src.backend.chunk import ChunkStates
+from src.backend.store import ChunkStore, MemoryStore
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ChunkStore()
+
+    class Partial(ChunkStore):
+        def save(self, pos, cells, state):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_memory_store_round_trip():
+    store = MemoryStore()
+    cells = np.arange(256, dtype=np.int8).reshape(16, 16)
+    store.save((1, -2), cells, ChunkStates.GENERATED)
+    cells[0, 0] = 99
+    loaded, state = store.load((1, -2))
+    assert state == ChunkStates.GENERATED
+    assert loaded[0, 0] == 0
+    assert (1, -2) in store and (0, 0) not in store
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from src import wire
+from src.backend.chunk import ChunkStates
+
+RNG = np.random.default_rng(3)
+CHUNKS = {
+    "uniform": np.full((16, 16), 2, dtype=np.int8),
+    "stripes": np.repeat(np.array([0, 2, 3, 14], dtype=np.int8), 64).reshape(16, 16),
+    "noise": RNG.integers(-128, 128, (16, 16), dtype=np.int8),
+    "terrain": RNG.choice(np.array([0, 2, 3], dtype=np.int8), (16, 16)),
+}
+
+
+@pytest.mark.parametrize("encoding", [wire.RAW, wire.RLE, wire.ZLIB])
+@pytest.mark.parametrize("name", CHUNKS)
+def test_cells_round_trip(name, encoding):
+    cells = CHUNKS[name]
+    used, data = wire.encode_cells(cells, encoding)
+    np.testing.assert_array_equal(wire.decode_cells(used, data), cells)
+    assert len(data) <= wire.CELLS
+
+
+def test_incompressible_chunks_are_sent_raw():
+    assert wire.encode_cells(CHUNKS["noise"], wire.RLE)[0] == wire.RAW
+    assert wire.encode_cells(CHUNKS["uniform"], wire.RLE) == (wire.RLE, bytes([255, 2]))
+
+
+def test_chunks_round_trip():
+    chunks = [
+        ((x, -x), ChunkStates.GENERATED, cells)
+        for x, cells in enumerate(CHUNKS.values())
+    ]
+    payload = b"header" + wire.pack_chunks(chunks, wire.ZLIB)
+    unpacked = wire.unpack_chunks(payload, len(b"header"))
+    assert list(unpacked) == [pos for pos, _, _ in chunks]
+    for pos, state, cells in chunks:
+        np.testing.assert_array_equal(unpacked[pos][0], cells)
+        assert unpacked[pos][1] == state